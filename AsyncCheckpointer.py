@@ -0,0 +1,279 @@
+import io
+import os
+import json
+import time
+import pickle
+import random
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import neat
+from neat.reporting import BaseReporter, ReporterSet
+from neat.species import Species
+
+FORMAT_VERSION = 1
+
+
+def _gene_columns(genes, gene_type, strings):
+    """ Turns a list of genes into one array per gene attribute; strings become indices into strings. """
+    columns = {}
+    for attribute in gene_type._gene_attributes:
+        values = [getattr(gene, attribute.name) for gene in genes]
+        if isinstance(attribute, neat.attributes.FloatAttribute):
+            columns[attribute.name] = np.array(values, dtype=np.float64)
+        elif isinstance(attribute, neat.attributes.BoolAttribute):
+            columns[attribute.name] = np.array(values, dtype=bool)
+        else:
+            for value in values:
+                strings.setdefault(value, len(strings))
+            columns[attribute.name] = np.array([strings[value] for value in values], dtype=np.int32)
+    return columns
+
+
+def _encode_genomes(genomes, genome_config):
+    """ Flattens genomes into arrays; gene order is kept, it decides the order networks sum in. """
+    strings = {}
+    node_owner, node_keys, node_genes = [], [], []
+    conn_owner, conn_keys, conn_genes = [], [], []
+    for i, genome in enumerate(genomes):
+        for key, ng in genome.nodes.items():
+            node_owner.append(i)
+            node_keys.append(key)
+            node_genes.append(ng)
+        for key, cg in genome.connections.items():
+            conn_owner.append(i)
+            conn_keys.append(key)
+            conn_genes.append(cg)
+
+    arrays = {
+        'genome_keys': np.array([genome.key for genome in genomes], dtype=np.int64),
+        'node_owner': np.array(node_owner, dtype=np.int32),
+        'node_keys': np.array(node_keys, dtype=np.int64),
+        'conn_owner': np.array(conn_owner, dtype=np.int32),
+        'conn_keys': np.array(conn_keys, dtype=np.int64).reshape(-1, 2),
+    }
+    for name, column in _gene_columns(node_genes, genome_config.node_gene_type, strings).items():
+        arrays['node_' + name] = column
+    for name, column in _gene_columns(conn_genes, genome_config.connection_gene_type, strings).items():
+        arrays['conn_' + name] = column
+    return arrays, sorted(strings, key=strings.get)
+
+
+def _decode_genomes(arrays, strings, config):
+    genome_config = config.genome_config
+    genomes = [config.genome_type(int(key)) for key in arrays['genome_keys']]
+
+    def attributes(prefix, gene_type):
+        result = []
+        for attribute in gene_type._gene_attributes:
+            column = arrays[prefix + attribute.name]
+            if isinstance(attribute, neat.attributes.StringAttribute):
+                column = [strings[i] for i in column]
+            else:
+                column = column.tolist()
+            result.append((attribute.name, column))
+        return result
+
+    node_attributes = attributes('node_', genome_config.node_gene_type)
+    for row, (owner, key) in enumerate(zip(arrays['node_owner'].tolist(), arrays['node_keys'].tolist())):
+        ng = genome_config.node_gene_type(key)
+        for name, column in node_attributes:
+            setattr(ng, name, column[row])
+        genomes[owner].nodes[key] = ng
+
+    conn_attributes = attributes('conn_', genome_config.connection_gene_type)
+    for row, (owner, key) in enumerate(zip(arrays['conn_owner'].tolist(), arrays['conn_keys'].tolist())):
+        cg = genome_config.connection_gene_type(tuple(key))
+        for name, column in conn_attributes:
+            setattr(cg, name, column[row])
+        genomes[owner].connections[cg.key] = cg
+
+    return dict((genome.key, genome) for genome in genomes)
+
+
+def _optional(value):
+    return float('nan') if value is None else value
+
+
+def _from_optional(value):
+    return None if value != value else value
+
+
+class AsyncCheckpointer(BaseReporter):
+    """
+    Drop-in replacement for neat.Checkpointer that keeps the generation loop from waiting on disk.
+
+    At the end of a generation only the cheap, mutable parts of the state (fitness values,
+    species bookkeeping, RNG state) are copied; encoding the genomes into flat arrays,
+    compressing and writing happen on a background thread. Genomes are never modified once
+    they are part of a population, so reading them later is safe.
+
+    Every full_interval-th checkpoint is a full snapshot, the ones in between only store the
+    genomes that are not in the last full snapshot and refer to it by file name.
+    """
+
+    def __init__(self, generation_interval=100, time_interval_seconds=300,
+                 filename_prefix='neat-checkpoint-', full_interval=10):
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+        self.full_interval = full_interval
+
+        self.current_generation = None
+        self.last_generation_checkpoint = -1
+        self.last_time_checkpoint = time.time()
+
+        self.checkpoints_since_full = None
+        self.full_snapshot = None
+        self.full_snapshot_keys = frozenset()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def end_generation(self, config, population, species_set):
+        checkpoint_due = False
+
+        if self.time_interval_seconds is not None:
+            dt = time.time() - self.last_time_checkpoint
+            if dt >= self.time_interval_seconds:
+                checkpoint_due = True
+
+        if (checkpoint_due is False) and (self.generation_interval is not None):
+            dg = self.current_generation - self.last_generation_checkpoint
+            if dg >= self.generation_interval:
+                checkpoint_due = True
+
+        if checkpoint_due:
+            self.save_checkpoint(config, population, species_set, self.current_generation)
+            self.last_generation_checkpoint = self.current_generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """ Captures the state and queues it for writing, returns the checkpoint's file name. """
+        filename = '{0}{1}'.format(self.filename_prefix, generation)
+        print("Saving checkpoint to {0}".format(filename))
+
+        full = self.checkpoints_since_full is None or self.checkpoints_since_full + 1 >= self.full_interval
+        genomes = list(population.values())
+        if full:
+            new_genomes = genomes
+            self.full_snapshot = filename
+            self.full_snapshot_keys = frozenset(population)
+            self.checkpoints_since_full = 0
+        else:
+            new_genomes = [genome for genome in genomes if genome.key not in self.full_snapshot_keys]
+            self.checkpoints_since_full += 1
+
+        species = list(species_set.species.values())
+        meta = {
+            'format': FORMAT_VERSION,
+            'generation': generation,
+            'base': None if full else os.path.basename(self.full_snapshot),
+            'random_state': random.getstate(),
+            'species_history': [s.fitness_history for s in species],
+        }
+        arrays = {
+            'population_keys': np.array(list(population), dtype=np.int64),
+            'population_fitness': np.array([_optional(genome.fitness) for genome in genomes]),
+            'species_keys': np.array([s.key for s in species], dtype=np.int64),
+            'species_created': np.array([s.created for s in species], dtype=np.int64),
+            'species_last_improved': np.array([s.last_improved for s in species], dtype=np.int64),
+            'species_representative': np.array([s.representative.key for s in species], dtype=np.int64),
+            'species_fitness': np.array([_optional(s.fitness) for s in species]),
+            'species_adjusted_fitness': np.array([_optional(s.adjusted_fitness) for s in species]),
+            'species_sizes': np.array([len(s.members) for s in species], dtype=np.int64),
+            'species_members': np.array([key for s in species for key in s.members], dtype=np.int64),
+        }
+        if full:
+            arrays['config'] = np.frombuffer(pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+        # A write that failed is raised here, at the latest with the next checkpoint
+        for job in self.pending:
+            if job.done():
+                job.result()
+        self.pending = [job for job in self.pending if not job.done()]
+        self.pending.append(self.executor.submit(self._write, filename, meta, arrays, new_genomes, config))
+        return filename
+
+    @staticmethod
+    def _write(filename, meta, arrays, genomes, config):
+        genome_arrays, strings = _encode_genomes(genomes, config.genome_config)
+        arrays.update(genome_arrays)
+        meta['strings'] = strings
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        # Written under a temporary name first, a crash never leaves a truncated checkpoint behind
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(filename + '.tmp', filename)
+
+    def wait(self):
+        """ Blocks until every queued checkpoint is on disk, re-raising any error from writing. """
+        for job in self.pending:
+            job.result()
+        self.pending = []
+
+    @staticmethod
+    def _load(filename):
+        with np.load(filename) as data:
+            arrays = dict((name, data[name]) for name in data.files)
+        meta = json.loads(arrays.pop('meta').tobytes().decode())
+        return meta, arrays
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        """ Resumes the simulation from a previous saved point; also reads neat.Checkpointer files. """
+        with open(filename, 'rb') as f:
+            is_npz = f.read(2) == b'PK'
+        if not is_npz:
+            return neat.Checkpointer.restore_checkpoint(filename)
+
+        meta, arrays = AsyncCheckpointer._load(filename)
+        if meta['base'] is None:
+            base_meta, base_arrays = meta, arrays
+        else:
+            base_meta, base_arrays = AsyncCheckpointer._load(os.path.join(os.path.dirname(filename), meta['base']))
+        config = pickle.loads(base_arrays['config'].tobytes())
+
+        genomes = _decode_genomes(base_arrays, base_meta['strings'], config)
+        if meta['base'] is not None:
+            genomes.update(_decode_genomes(arrays, meta['strings'], config))
+
+        population = {}
+        for key, fitness in zip(arrays['population_keys'].tolist(), arrays['population_fitness'].tolist()):
+            genome = genomes[key]
+            genome.fitness = _from_optional(fitness)
+            population[key] = genome
+
+        # The real reporters are attached below, once the Population exists
+        species_set = config.species_set_type(config.species_set_config, ReporterSet())
+        species_set.indexer = count(max(arrays['species_keys'].tolist(), default=0) + 1)
+        members = iter(arrays['species_members'].tolist())
+        for i, key in enumerate(arrays['species_keys'].tolist()):
+            s = Species(key, int(arrays['species_created'][i]))
+            s.last_improved = int(arrays['species_last_improved'][i])
+            s.fitness = _from_optional(float(arrays['species_fitness'][i]))
+            s.adjusted_fitness = _from_optional(float(arrays['species_adjusted_fitness'][i]))
+            s.fitness_history = meta['species_history'][i]
+            s.update(population[int(arrays['species_representative'][i])],
+                     dict((gid, population[gid]) for gid in (next(members) for _ in range(arrays['species_sizes'][i]))))
+            species_set.species[key] = s
+            for gid in s.members:
+                species_set.genome_to_species[gid] = key
+
+        # Like the genome keys below, new nodes and species are numbered on from the highest in use
+        config.genome_config.node_indexer = count(max(key for genome in genomes.values() for key in genome.nodes) + 1)
+
+        version, state, gauss = meta['random_state']
+        random.setstate((version, tuple(state), gauss))
+
+        restored = neat.Population(config, (population, species_set, meta['generation']))
+        species_set.reporters = restored.reporters
+        # neat.Checkpointer restarts genome keys at 1, which collides with the restored genomes
+        restored.reproduction.genome_indexer = count(max(population) + 1)
+        return restored
@@ -0,0 +1,32 @@
+from multiprocessing import Pool
+
+from PhaseTimingReporter import phase_timing_initializer
+
+
+class ChunkedEvaluator:
+    def __init__(self, num_workers, eval_function, chunk_size=16, timeout=None):
+        """
+        Like neat.ParallelEvaluator, but every task carries chunk_size genomes.
+        eval_function should take a list of genomes and the config object
+        and return a list with one fitness per genome.
+        """
+        self.num_workers = num_workers
+        self.eval_function = eval_function
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.pool = Pool(num_workers, *phase_timing_initializer())
+
+    def __del__(self):
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, genomes, config):
+        chunks = [genomes[i:i + self.chunk_size] for i in range(0, len(genomes), self.chunk_size)]
+
+        jobs = []
+        for chunk in chunks:
+            jobs.append(self.pool.apply_async(self.eval_function, ([genome for genome_id, genome in chunk], config)))
+
+        for job, chunk in zip(jobs, chunks):
+            for (genome_id, genome), fitness in zip(chunk, job.get(timeout=self.timeout)):
+                genome.fitness = fitness
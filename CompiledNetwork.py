@@ -0,0 +1,132 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+from FitnessCache import genome_digest
+
+
+class CompiledNetwork:
+    """ A genome's feed-forward network as one generated straight-line Python function.
+
+    Only what neat.nn.FeedForwardNetwork would evaluate is compiled: disabled connections
+    are dropped, and so are the nodes that can't reach an output or that depend on a node
+    no input reaches. Weights, biases and responses are inlined as literals and sigmoid is
+    written out, so there are no lists, dicts or calls per node. The operations run in the
+    same order as in FeedForwardNetwork, the outputs are bit-identical.
+    """
+
+    def __init__(self, function, source, num_nodes):
+        self.function = function
+        self.source = source
+        self.num_nodes = num_nodes
+
+    def activate(self, inputs):
+        return self.function(inputs)
+
+    @staticmethod
+    def create(genome, config):
+        nodes, outputs = flatten_network(genome, config)
+        return CompiledNetwork.compile(nodes, outputs, config, '<genome {0}>'.format(genome.key))
+
+    @staticmethod
+    def compile(nodes, outputs, config, filename='<network>'):
+        """ Compiles a network in the form flatten_network() returns. """
+        genome_config = config.genome_config
+        names = ['i{0}'.format(i) for i in range(len(genome_config.input_keys))]
+        namespace = {'exp': math.exp, 'ndarray': np.ndarray}
+        lines = ['def activate(inputs):',
+                 '    if type(inputs) is ndarray:',
+                 '        inputs = inputs.tolist()',
+                 '    {0}, = inputs'.format(', '.join(names))]
+
+        for activation, aggregation, bias, response, links in nodes:
+            terms = ['{0} * {1!r}'.format(names[source], weight) for source, weight in links]
+            name = 'v{0}'.format(len(names) - len(genome_config.input_keys))
+            names.append(name)
+
+            # sum() starts from 0, so does the expression
+            if aggregation == 'sum':
+                s = '(0 + {0})'.format(' + '.join(terms)) if terms else '0'
+            else:
+                namespace['g' + name] = genome_config.aggregation_function_defs.get(aggregation)
+                s = 'g{0}([{1}])'.format(name, ', '.join(terms))
+            z = '{0!r} + {1!r} * {2}'.format(bias, response, s)
+
+            if activation == 'sigmoid':
+                lines.append('    {0} = 1.0 / (1.0 + exp(-max(-60.0, min(60.0, 5.0 * ({1})))))'.format(name, z))
+            else:
+                namespace['f' + name] = genome_config.activation_defs.get(activation)
+                lines.append('    {0} = f{0}({1})'.format(name, z))
+
+        # Outputs FeedForwardNetwork never evaluates stay at 0.0
+        lines.append('    return [{0}]'.format(', '.join('0.0' if slot is None else names[slot] for slot in outputs)))
+        source = '\n'.join(lines)
+        exec(compile(source, filename, 'exec'), namespace)
+        return CompiledNetwork(namespace['activate'], source, len(nodes))
+
+
+def flatten_network(genome, config):
+    """ Lists what FeedForwardNetwork would evaluate, in its order, without the genome's keys.
+
+    Values live in slots: the inputs come first, then every evaluated node in order.
+    Returns the nodes as (activation, aggregation, bias, response, [(source slot, weight)])
+    and the slot of every output, None for outputs that are never evaluated.
+    """
+    input_keys = config.genome_config.input_keys
+    output_keys = config.genome_config.output_keys
+
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    slots = dict((key, i) for i, key in enumerate(input_keys))
+    nodes = []
+    for layer in feed_forward_layers(input_keys, output_keys, connections):
+        for node in layer:
+            ng = genome.nodes[node]
+            links = [(slots[inode], genome.connections[inode, onode].weight)
+                     for inode, onode in connections if onode == node]
+            slots[node] = len(slots)
+            nodes.append((ng.activation, ng.aggregation, ng.bias, ng.response, links))
+
+    return nodes, [slots.get(key) for key in output_keys]
+
+
+class NetworkCache:
+    """ Keeps the compiled networks of the most recently used genomes, max_size at most.
+
+    Entries are found by the genome's key and a hash of everything its network is built
+    from, so a genome that mutated since it was compiled is compiled again.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, genome, config):
+        key = (genome.key, genome_digest(genome))
+        network = self.entries.get(key)
+        if network is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return network
+
+        self.misses += 1
+        network = self.entries[key] = CompiledNetwork.create(genome, config)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return network
+
+
+_network_cache = None
+
+def compiled_network(genome, config, max_size=1000):
+    """ Returns the genome's CompiledNetwork from this process' cache, compiling it if needed. """
+    global _network_cache
+    if _network_cache is None:
+        _network_cache = NetworkCache(max_size)
+    return _network_cache.get(genome, config)
@@ -0,0 +1,243 @@
+import heapq
+import time
+import traceback
+from collections import deque
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from PhaseTimingReporter import phase_timing_target
+
+# Seconds per step, and per step and gene, until the first generation is measured
+DEFAULT_COST_MODEL = (1e-4, 2e-6)
+
+
+class RemoteTraceback(Exception):
+    """ The traceback of an exception raised in a worker, as the cause of the re-raised one. """
+
+    def __str__(self):
+        return self.args[0]
+
+
+def send_error(connection, task_id, exception):
+    """ Sends the exception being handled and its traceback to the parent, see RemoteTraceback. """
+    text = traceback.format_exc()
+    try:
+        connection.send(('error', task_id, exception, text))
+    except Exception:
+        # Not every exception pickles
+        connection.send(('error', task_id, RuntimeError(repr(exception)), text))
+
+
+def _worker_loop(connection, eval_function):
+    config = None
+    while True:
+        message = connection.recv()
+        if message[0] == 'stop':
+            return
+        elif message[0] == 'config':
+            config = message[1]
+        elif message[0] == 'task':
+            results = []
+            try:
+                for genome in message[2]:
+                    start = time.perf_counter()
+                    fitness, steps = eval_function(genome, config)
+                    results.append((fitness, steps, time.perf_counter() - start))
+            except Exception as exception:
+                send_error(connection, message[1], exception)
+                continue
+            connection.send(('result', message[1], results))
+
+
+def genome_size(genome):
+    return len(genome.nodes) + sum(1 for cg in genome.connections.values() if cg.enabled)
+
+
+class CostAwareEvaluator:
+    """
+    Like neat.ParallelEvaluator, but schedules the genomes by their predicted cost.
+
+    A genome's episode is expected to last as long as its parents' did (ancestors is
+    DefaultReproduction.ancestors), or as long as the last generation's on average, or the
+    full max_steps when nothing was measured yet, as in the first generation; a step is
+    expected to cost more the bigger the network is, and the seconds per step are fitted
+    to the measured episodes after every generation. Genomes are spread over per-worker
+    queues longest first, a worker takes from the front of its own queue and, once it is
+    empty, steals the shortest genomes from the back of the most loaded one. Every task
+    holds as many genomes as that worker is expected to finish in target_task_seconds, so
+    cheap genomes don't pay one round trip each, but no more than max_task_genomes, so
+    there is always something left to steal when the predictions are off.
+
+    eval_function(genome, config) returns the fitness and the number of steps simulated.
+    Every worker has up to prefetch tasks in flight. An exception eval_function raises in a
+    worker is raised again by evaluate(), once the tasks still in flight are back.
+    The idle share of the workers' time is printed after every generation when report is set.
+    """
+
+    def __init__(self, num_workers, eval_function, ancestors=None, max_steps=1500, target_task_seconds=0.05,
+                 max_task_genomes=8, prefetch=2, report=True):
+        self.num_workers = num_workers
+        self.ancestors = ancestors if ancestors is not None else {}
+        self.max_steps = max_steps
+        self.target_task_seconds = target_task_seconds
+        self.max_task_genomes = max_task_genomes
+        self.prefetch = prefetch
+        self.report = report
+
+        self.connections = []
+        self.processes = []
+        for _ in range(num_workers):
+            parent, child = mp.Pipe()
+            process = mp.Process(target=phase_timing_target(_worker_loop), args=(child, eval_function), daemon=True)
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.config = None
+        self.cost_model = DEFAULT_COST_MODEL
+        # Measured seconds over predicted seconds, per worker
+        self.worker_speed = [1.0] * num_workers
+        self.episode_steps = {}
+        self.history = []
+        self.last_predictions = []
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        for connection, process in zip(self.connections, self.processes):
+            try:
+                connection.send(('stop',))
+            except OSError:
+                pass
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def predicted_steps(self, genome):
+        if genome.key in self.episode_steps:
+            return self.episode_steps[genome.key]
+        known = [self.episode_steps[parent] for parent in self.ancestors.get(genome.key, ())
+                 if parent in self.episode_steps]
+        if known:
+            return sum(known) / len(known)
+        if self.episode_steps:
+            return sum(self.episode_steps.values()) / len(self.episode_steps)
+        return self.max_steps
+
+    def predicted_seconds(self, genome):
+        per_step, per_gene_step = self.cost_model
+        return self.predicted_steps(genome) * (per_step + per_gene_step * genome_size(genome))
+
+    def _fit_cost_model(self, measured):
+        """ Least squares fit of seconds = steps * (a + b * size), kept if both are positive. """
+        if len(measured) < 2:
+            return
+        steps, sizes, seconds = np.array(measured, dtype=np.float64).T
+        x = np.stack([steps, steps * sizes], axis=1)
+        (a, b), *_ = np.linalg.lstsq(x, seconds, rcond=None)
+        if a > 0 and b >= 0:
+            self.cost_model = (a, b)
+
+    def _next_task(self, worker, queues, loads):
+        """ Takes a task's worth of genomes for worker from its own queue, or steals one. """
+        victim = worker
+        if not queues[worker]:
+            victim = max(range(self.num_workers), key=lambda w: loads[w])
+            if not queues[victim]:
+                return None, False
+
+        task = []
+        budget = self.target_task_seconds / self.worker_speed[worker]
+        while queues[victim] and (not task or budget > 0) and len(task) < self.max_task_genomes:
+            cost, item = queues[victim].popleft() if victim == worker else queues[victim].pop()
+            loads[victim] -= cost
+            budget -= cost
+            task.append((cost, item))
+        return task, victim != worker
+
+    def evaluate(self, genomes, config):
+        start = time.perf_counter()
+        if config is not self.config:
+            for connection in self.connections:
+                connection.send(('config', config))
+            self.config = config
+
+        # Longest first, each to the worker expected to be free first
+        costs = sorted(((self.predicted_seconds(genome), (genome_id, genome)) for genome_id, genome in genomes),
+                       key=lambda item: item[0], reverse=True)
+        queues = [deque() for _ in range(self.num_workers)]
+        loads = [0.0] * self.num_workers
+        heap = [(0.0, w) for w in range(self.num_workers)]
+        for cost, item in costs:
+            load, w = heapq.heappop(heap)
+            queues[w].append((cost, item))
+            loads[w] += cost
+            heapq.heappush(heap, (load + cost * self.worker_speed[w], w))
+
+        tasks = {}
+        in_flight = [0] * self.num_workers
+        next_task_id = 0
+        stolen = 0
+        busy = 0.0
+        measured = []
+        predictions = []
+        episode_steps = {}
+
+        def dispatch(worker):
+            nonlocal next_task_id, stolen
+            while in_flight[worker] < self.prefetch:
+                task, was_stolen = self._next_task(worker, queues, loads)
+                if task is None:
+                    return
+                stolen += was_stolen
+                tasks[next_task_id] = (worker, task)
+                self.connections[worker].send(('task', next_task_id, [genome for cost, (genome_id, genome) in task]))
+                in_flight[worker] += 1
+                next_task_id += 1
+
+        for worker in range(self.num_workers):
+            dispatch(worker)
+
+        error = None
+        while tasks:
+            for connection in wait(self.connections):
+                message = connection.recv()
+                worker = self.connections.index(connection)
+                task_id, results = message[1], message[2]
+                _, task = tasks.pop(task_id)
+                in_flight[worker] -= 1
+                if message[0] == 'error':
+                    # The other tasks still come back, so the next evaluate() starts clean
+                    error = error or message
+                if error is not None:
+                    continue
+
+                predicted = actual = 0.0
+                for (cost, (genome_id, genome)), (fitness, steps, seconds) in zip(task, results):
+                    genome.fitness = fitness
+                    episode_steps[genome.key] = steps
+                    measured.append((steps, genome_size(genome), seconds))
+                    predictions.append((cost, seconds))
+                    predicted += cost
+                    actual += seconds
+                busy += actual
+                if predicted > 0:
+                    self.worker_speed[worker] = 0.8 * self.worker_speed[worker] + 0.2 * actual / predicted
+                dispatch(worker)
+
+        if error is not None:
+            raise error[2] from RemoteTraceback(error[3])
+
+        self.episode_steps = episode_steps
+        self._fit_cost_model(measured)
+        self.last_predictions = predictions
+
+        wall = time.perf_counter() - start
+        idle = max(0.0, 1.0 - busy / (wall * self.num_workers))
+        self.history.append((wall, idle, next_task_id, stolen))
+        if self.report:
+            print("Evaluation: {0:.2f} sec, workers idle {1:.1f}% of the time, {2} tasks, {3} stolen".format(
+                wall, 100 * idle, next_task_id, stolen))
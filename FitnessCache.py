@@ -0,0 +1,104 @@
+import random
+import struct
+import hashlib
+from collections import OrderedDict
+
+
+def genome_digest(genome, salt=b''):
+    """ Hashes the enabled connections in the order the network sums them, and every
+    node's bias, response, activation and aggregation: all the network is built from. """
+    digest = hashlib.blake2b(salt, digest_size=16)
+    for cg in genome.connections.values():
+        if cg.enabled:
+            digest.update(struct.pack('<qqd', cg.key[0], cg.key[1], cg.weight))
+    for key in sorted(genome.nodes):
+        ng = genome.nodes[key]
+        digest.update(struct.pack('<qdd', key, ng.bias, ng.response))
+        digest.update(ng.activation.encode() + b'/' + ng.aggregation.encode() + b';')
+    return digest.digest()
+
+
+class FitnessCache:
+    """ Remembers the fitness of genomes that were already simulated (elites, clones).
+
+    The simulation is deterministic, so a genome whose network is unchanged gets the same
+    fitness again. The key is the genome_digest() of its network, salted with the episode
+    settings.
+
+    settings: anything describing the episode (steps, time step, termination policy...);
+              its repr() goes into the key, so changing it invalidates the cache
+    check_rate: fraction of cache hits that are re-simulated anyway and must match exactly
+    """
+
+    def __init__(self, max_size=10000, settings=(), check_rate=0.0, seed=0):
+        self.max_size = max_size
+        self.settings = repr(settings).encode()
+        self.check_rate = check_rate
+        # A private RNG, drawing from the global one would change the course of evolution
+        self.rng = random.Random(seed)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def genome_key(self, genome):
+        return genome_digest(genome, self.settings)
+
+    def get(self, key):
+        """ Returns the cached fitness or None, and marks the entry as recently used. """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def wrap(self, evaluate):
+        """ Returns a fitness function for Population.run that only passes cache misses
+        (and the sampled determinism checks) on to evaluate(genomes, config). """
+        return CachedFitness(self, evaluate)
+
+
+class CachedFitness:
+    """ The fitness function FitnessCache.wrap() returns. A class rather than a closure, so
+    it pickles together with its cache, e.g. into processes started with spawn. """
+
+    def __init__(self, cache, evaluate):
+        self.cache = cache
+        self.evaluate = evaluate
+
+    def __call__(self, genomes, config):
+        cache = self.cache
+        pending = []
+        checks = []
+        for genome_id, genome in genomes:
+            key = cache.genome_key(genome)
+            fitness = cache.get(key)
+            if fitness is None:
+                cache.misses += 1
+                pending.append((genome_id, genome, key))
+                continue
+
+            cache.hits += 1
+            genome.fitness = fitness
+            if cache.check_rate > 0 and cache.rng.random() < cache.check_rate:
+                checks.append((genome_id, genome, fitness))
+
+        if pending or checks:
+            self.evaluate([(genome_id, genome) for genome_id, genome, key in pending] +
+                          [(genome_id, genome) for genome_id, genome, fitness in checks], config)
+
+        for genome_id, genome, key in pending:
+            cache.put(key, genome.fitness)
+
+        for genome_id, genome, fitness in checks:
+            if genome.fitness != fitness:
+                raise AssertionError("Genome {0} re-simulated to fitness {1!r}, the cache had {2!r}".format(
+                    genome_id, genome.fitness, fitness))
+
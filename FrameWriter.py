@@ -0,0 +1,52 @@
+import os
+import shutil
+import subprocess
+
+import pygame
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.avi', '.mov', '.gif')
+
+
+class FrameWriter:
+    """ Saves rendered frames as a video file (through ffmpeg) or as an image sequence.
+
+    path: a video file ('winner.mp4'), a numbered file pattern ('frames/frame-{:05d}.bmp')
+          or a directory, which gets PNG files
+    """
+
+    def __init__(self, path, size, fps):
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.frame_count = 0
+        self.process = None
+
+        if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+            ffmpeg = shutil.which('ffmpeg')
+            if ffmpeg is None:
+                raise RuntimeError("Writing {0} needs ffmpeg on the PATH, an image sequence path works without it".format(path))
+            self.process = subprocess.Popen([
+                ffmpeg, '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '{0}x{1}'.format(*size), '-r', str(fps), '-i', '-',
+                '-pix_fmt', 'yuv420p', path,
+            ], stdin=subprocess.PIPE)
+        else:
+            if '{' not in path:
+                path = os.path.join(path, 'frame-{:05d}.png')
+            self.pattern = path
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def write(self, surface):
+        if self.process is not None:
+            self.process.stdin.write(pygame.image.tobytes(surface, 'RGB'))
+        else:
+            pygame.image.save(surface, self.pattern.format(self.frame_count))
+        self.frame_count += 1
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
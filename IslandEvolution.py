@@ -0,0 +1,199 @@
+import copy
+import time
+import random
+import itertools
+import statistics
+import multiprocessing as mp
+
+import neat
+from neat.reporting import BaseReporter
+
+from PhaseTimingReporter import phase_timing_target
+
+
+class _IslandReporter(BaseReporter):
+    """ Collects what the main process needs from an island's generations. """
+
+    def __init__(self, migrants):
+        self.migrants = migrants
+        self.generations = []
+        self.emigrants = []
+        self.solved = False
+
+    def post_evaluate(self, config, population, species, best_genome):
+        # The same per-species fitness dicts StatisticsReporter keeps
+        species_stats = dict((sid, dict((k, v.fitness) for k, v in s.members.items()))
+                             for sid, s in species.species.items())
+        self.generations.append((species_stats, copy.deepcopy(best_genome)))
+        self.emigrants = sorted(population.values(), key=lambda g: g.fitness, reverse=True)[:self.migrants]
+
+    def found_solution(self, config, generation, best):
+        self.solved = True
+
+
+class _Island:
+    """ The process side: one neat.Population evolving on its own. """
+
+    def __init__(self, index, num_islands, config, fitness_function, migrants, seed):
+        random.seed(seed + index)
+        # Islands draw new node keys from disjoint strides. Connection genes are keyed by
+        # their node pairs, so an immigrant's genes never collide with genes grown here,
+        # and the genes it shares with its relatives here still line up in crossover
+        genome_config = config.genome_config
+        genome_config.node_indexer = itertools.count(len(genome_config.output_keys) + index, num_islands)
+
+        self.population = neat.Population(config)
+        self.reporter = _IslandReporter(migrants)
+        self.population.add_reporter(self.reporter)
+        self.fitness_function = fitness_function
+
+    def run(self, generations):
+        """ Evolves for the given generations, returns their statistics and the emigrants. """
+        self.reporter.generations = []
+        start = time.process_time()
+        self.population.run(self.fitness_function, generations)
+        return (self.reporter.generations, self.reporter.emigrants, self.reporter.solved,
+                time.process_time() - start)
+
+    def immigrate(self, genomes):
+        """ Puts the genomes in place of offspring that were not evaluated yet, the elites stay. """
+        population = self.population
+        room = [gid for gid, g in population.population.items() if g.fitness is None]
+        for genome, gid in zip(genomes, random.sample(room, min(len(genomes), len(room)))):
+            del population.population[gid]
+            # Genome keys are only unique within an island
+            genome.key = next(population.reproduction.genome_indexer)
+            genome.fitness = None
+            population.reproduction.ancestors[genome.key] = tuple()
+            population.population[genome.key] = genome
+        population.species.speciate(population.config, population.population, population.generation)
+
+
+def _island_loop(connection, index, num_islands, config, fitness_function, migrants, seed):
+    island = _Island(index, num_islands, config, fitness_function, migrants, seed)
+    while True:
+        message = connection.recv()
+        if message[0] == 'stop':
+            return
+        elif message[0] == 'run':
+            connection.send(island.run(message[1]))
+        elif message[0] == 'immigrate':
+            island.immigrate(message[1])
+
+
+class IslandEvolution:
+    """
+    Evolves num_islands independent neat.Populations, one per process, with migration.
+
+    Each island evolves its own population of config.pop_size genomes, evaluating them
+    with fitness_function(genomes, config) in its own process, like Population.run does,
+    so reproduction and speciation run in parallel as well. Every migration_interval
+    generations each island sends copies of its best migrants genomes to another island:
+    the next one for the 'ring' topology, one picked at random every time for 'random'.
+    They replace offspring the receiving island has not evaluated yet, under new genome
+    keys; new node keys never collide between islands in the first place.
+
+    The islands' generations are combined into statistics, a neat.StatisticsReporter
+    that visualize.plot_stats and plot_species accept, with every island's species
+    numbered separately. A summary of every migration round is printed when report is set.
+    """
+
+    def __init__(self, config, num_islands, fitness_function, migration_interval=10, migrants=2, topology='ring',
+                 seed=1000, report=True):
+        if topology not in ('ring', 'random'):
+            raise ValueError("topology must be 'ring' or 'random', got {0!r}".format(topology))
+
+        self.config = config
+        self.migration_interval = migration_interval
+        self.topology = topology
+        self.random = random.Random(seed)
+        self.report = report
+
+        self.connections = []
+        self.processes = []
+        for index in range(num_islands):
+            parent, child = mp.Pipe()
+            process = mp.Process(target=phase_timing_target(_island_loop), daemon=True,
+                                 args=(child, index, num_islands, config, fitness_function, migrants, seed))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.statistics = neat.StatisticsReporter()
+        self.species_ids = {}
+        self.best_genome = None
+        self.generation = 0
+        self.history = []
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        for connection, process in zip(self.connections, self.processes):
+            try:
+                connection.send(('stop',))
+            except OSError:
+                pass
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def _destinations(self):
+        n = len(self.connections)
+        if self.topology == 'ring':
+            return [(i + 1) % n for i in range(n)]
+        return [self.random.choice([j for j in range(n) if j != i]) for i in range(n)]
+
+    def _combine(self, generations):
+        """ Adds a round of every island's generations to the combined statistics. """
+        for islands in itertools.zip_longest(*generations):
+            species_stats = {}
+            best = None
+            for index, generation in enumerate(islands):
+                if generation is None:
+                    continue
+                island_species, island_best = generation
+                for sid, fitnesses in island_species.items():
+                    combined = self.species_ids.setdefault((index, sid), len(self.species_ids) + 1)
+                    species_stats[combined] = dict(((index, k), v) for k, v in fitnesses.items())
+                if best is None or island_best.fitness > best.fitness:
+                    best = island_best
+
+            self.statistics.most_fit_genomes.append(best)
+            self.statistics.generation_statistics.append(species_stats)
+            if self.best_genome is None or best.fitness > self.best_genome.fitness:
+                self.best_genome = best
+
+    def run(self, n=None):
+        """ Runs for at most n generations, returns the best genome of all islands. """
+        if self.config.no_fitness_termination and n is None:
+            raise RuntimeError("Cannot have no generational limit with no fitness termination")
+
+        generations = 0
+        while n is None or generations < n:
+            start = time.perf_counter()
+            count = self.migration_interval if n is None else min(self.migration_interval, n - generations)
+            for connection in self.connections:
+                connection.send(('run', count))
+            results = [connection.recv() for connection in self.connections]
+            self._combine([result[0] for result in results])
+            generations += count
+            self.generation += count
+
+            wall = time.perf_counter() - start
+            busy = sum(result[3] for result in results)
+            self.history.append((wall, busy))
+            if self.report:
+                fitnesses = [f for s in self.statistics.generation_statistics[-1].values() for f in s.values()]
+                print("Islands at generation {0}: best fitness {1:.3f}, mean {2:.3f}, {3} species, "
+                      "{4:.1f} sec, {5:.1f} island CPU sec".format(
+                          self.generation, self.best_genome.fitness, statistics.mean(fitnesses),
+                          len(self.statistics.generation_statistics[-1]), wall, busy))
+
+            if any(result[2] for result in results):
+                break
+            if len(self.connections) > 1 and (n is None or generations < n):
+                for result, destination in zip(results, self._destinations()):
+                    self.connections[destination].send(('immigrate', result[1]))
+
+        return self.best_genome
@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+import types
+import threading
+from functools import partial
+import multiprocessing as mp
+from multiprocessing import util
+from multiprocessing.reduction import ForkingPickler
+
+import neat
+from neat.reporting import BaseReporter
+
+PHASES = (
+    'activate',
+    'motors',
+    'physics',
+    'sensors',
+    'draw',
+    'pickling',
+    'reproduction',
+    'speciation',
+)
+
+_enabled = False
+_draw = False
+_patches = []
+_totals = [0.0] * len(PHASES)
+_calls = [0] * len(PHASES)
+# The pool's result handler thread unpickles results while the main thread is timed too
+_lock = threading.Lock()
+_local = threading.local()
+_shared = None
+
+
+def _timed(phase, function):
+    index = PHASES.index(phase)
+
+    # Time spent in nested timed calls is subtracted, so every phase is exclusive
+    def timed(*args, **kwargs):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            with _lock:
+                _totals[index] += elapsed - nested
+                _calls[index] += 1
+            if stack:
+                stack[-1] += elapsed
+    return timed
+
+
+def _patch(owner, name, phase):
+    original = owner.__dict__[name]
+    if isinstance(original, classmethod):
+        replacement = classmethod(_timed(phase, original.__func__))
+    elif isinstance(original, staticmethod):
+        replacement = staticmethod(_timed(phase, original.__func__))
+    elif isinstance(original, types.BuiltinFunctionType):
+        replacement = staticmethod(_timed(phase, original))
+    else:
+        replacement = _timed(phase, getattr(owner, name))
+    setattr(owner, name, replacement)
+    _patches.append((owner, name, original))
+
+
+def _take_local():
+    """ Returns this process' counters and sets them to zero, in one step. """
+    with _lock:
+        totals, calls = _totals[:], _calls[:]
+        for i in range(len(PHASES)):
+            _totals[i] = 0.0
+            _calls[i] = 0
+    return totals, calls
+
+
+def _after_fork():
+    # Another thread of the parent may have held the lock while forking
+    global _lock
+    _lock = threading.Lock()
+    _take_local()
+
+
+def _install_patches(draw):
+    from Box2D import b2World
+    from Walker import Walker
+    from PopulationNetwork import PopulationNetwork
+    from CompiledNetwork import CompiledNetwork
+    from VectorizedSpeciesSet import VectorizedSpeciesSet
+
+    _patch(neat.nn.FeedForwardNetwork, 'activate', 'activate')
+    _patch(PopulationNetwork, 'activate', 'activate')
+    _patch(CompiledNetwork, 'activate', 'activate')
+    _patch(Walker, 'update', 'motors')
+    _patch(b2World, 'Step', 'physics')
+    _patch(Walker, 'refresh_state', 'sensors')
+    _patch(ForkingPickler, 'dumps', 'pickling')
+    _patch(ForkingPickler, 'loads', 'pickling')
+    _patch(neat.DefaultReproduction, 'reproduce', 'reproduction')
+    _patch(neat.DefaultSpeciesSet, 'speciate', 'speciation')
+    _patch(VectorizedSpeciesSet, 'speciate', 'speciation')
+    if draw:
+        from Simulation import Simulation
+        _patch(Simulation, 'draw', 'draw')
+
+
+def enable_phase_timing():
+    """ Wraps the hot paths in timers. Call it before any worker pool is created, and start
+    the pools with phase_timing_initializer() so their workers time their share as well. """
+    global _enabled, _draw, _shared
+    if _enabled:
+        return
+
+    # Only instrument drawing if the rendered simulation is in use anyway
+    _draw = 'Simulation' in sys.modules
+    _install_patches(_draw)
+    _shared = mp.Array('d', 2 * len(PHASES))
+    _take_local()
+    _enabled = True
+
+
+def _start_worker(shared, draw, initializer, initargs):
+    global _enabled, _shared
+    # A forked worker inherited the timers, a spawned one starts without them
+    if not _enabled:
+        _install_patches(draw)
+        _enabled = True
+    _shared = shared
+    _take_local()
+    # What the worker timed after its last flush, such as pickling its last result;
+    # pool workers leave through os._exit, which skips atexit but runs these
+    util.Finalize(None, flush_phase_timings, exitpriority=10)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_worker(shared, draw, target, *args):
+    _start_worker(shared, draw, None, ())
+    return target(*args)
+
+
+def phase_timing_target(target):
+    """ Returns the target to start a multiprocessing.Process with, like
+    phase_timing_initializer() for a pool. Returns it unchanged while timing is off. """
+    if not _enabled:
+        return target
+    return partial(_run_worker, _shared, _draw, target)
+
+
+def phase_timing_initializer(initializer=None, initargs=()):
+    """ Returns the initializer and its arguments to start a worker pool with, so that its
+    workers time their phases under any start method; the pool's own initializer, if any,
+    runs after. Returns them unchanged while timing is off. """
+    if not _enabled:
+        return initializer, initargs
+    return _start_worker, (_shared, _draw, initializer, initargs)
+
+
+def disable_phase_timing():
+    global _enabled, _shared
+    while _patches:
+        owner, name, original = _patches.pop()
+        setattr(owner, name, original)
+    _shared = None
+    _enabled = False
+
+
+def flush_phase_timings():
+    """ Moves this process' counters into the array shared with the parent, call it
+    at the end of every worker task. Does nothing unless timing is enabled. """
+    if not _enabled or mp.parent_process() is None:
+        return
+    totals, calls = _take_local()
+    with _shared.get_lock():
+        for i in range(len(PHASES)):
+            _shared[i] += totals[i]
+            _shared[len(PHASES) + i] += calls[i]
+
+
+def collect_phase_timings():
+    """ Returns {phase: (seconds, calls)} summed over this process and all workers since the last call. """
+    totals, calls = _take_local()
+    with _shared.get_lock():
+        result = dict((phase, (totals[i] + _shared[i], calls[i] + int(_shared[len(PHASES) + i])))
+                      for i, phase in enumerate(PHASES))
+        for i in range(len(_shared)):
+            _shared[i] = 0.0
+    return result
+
+
+# A forked worker starts with a copy of the parent's counters, which the parent reports itself
+os.register_at_fork(after_in_child=_after_fork)
+
+
+class PhaseTimingReporter(BaseReporter):
+    """ Prints where each generation's time went and appends the breakdown to a CSV file.
+
+    Timing has to be switched on with enable_phase_timing() before the evaluator's workers
+    are started with phase_timing_initializer(); they report their share through
+    flush_phase_timings().
+    """
+
+    def __init__(self, filename='phase-timings.csv'):
+        self.filename = filename
+        self.generation = None
+        self.generation_start = None
+        self.evaluation_time = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.generation_start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluation_time = time.perf_counter() - self.generation_start
+
+    def end_generation(self, config, population, species_set):
+        if not _enabled or self.generation_start is None:
+            return
+
+        generation_time = time.perf_counter() - self.generation_start
+        phases = collect_phase_timings()
+
+        print(" ****** Phase timings for generation {0} ({1:.3f} sec, evaluation {2:.3f} sec) ******".format(
+            self.generation, generation_time, self.evaluation_time))
+        measured = sum(seconds for seconds, calls in phases.values()) or 1.0
+        for phase, (seconds, calls) in phases.items():
+            print("   {0:>12}  {1:9.3f} sec  {2:5.1f}%  {3:9d} calls".format(
+                phase, seconds, 100.0 * seconds / measured, calls))
+
+        new_file = not os.path.exists(self.filename)
+        with open(self.filename, 'a') as f:
+            if new_file:
+                columns = ['generation', 'generation_time', 'evaluation_time']
+                columns += [phase + suffix for phase in PHASES for suffix in ('_time', '_calls')]
+                f.write(','.join(columns) + '\n')
+            row = [str(self.generation), repr(generation_time), repr(self.evaluation_time)]
+            for seconds, calls in phases.values():
+                row += [repr(seconds), str(calls)]
+            f.write(','.join(row) + '\n')
@@ -0,0 +1,160 @@
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+
+def _sigmoid(z):
+    z = np.clip(5.0 * z, -60.0, 60.0)
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _tanh(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def _sin(z):
+    return np.sin(np.clip(5.0 * z, -60.0, 60.0))
+
+
+def _gauss(z):
+    z = np.clip(z, -3.4, 3.4)
+    return np.exp(-5.0 * z ** 2)
+
+
+def _relu(z):
+    return np.where(z > 0.0, z, 0.0)
+
+
+def _softplus(z):
+    z = np.clip(5.0 * z, -60.0, 60.0)
+    return 0.2 * np.log(1 + np.exp(z))
+
+
+def _identity(z):
+    return z
+
+
+def _clamped(z):
+    return np.clip(z, -1.0, 1.0)
+
+
+def _abs(z):
+    return np.abs(z)
+
+
+# Vectorized twins of the activation functions shipped with neat
+ACTIVATIONS = {
+    'sigmoid': _sigmoid,
+    'tanh': _tanh,
+    'sin': _sin,
+    'gauss': _gauss,
+    'relu': _relu,
+    'softplus': _softplus,
+    'identity': _identity,
+    'clamped': _clamped,
+    'abs': _abs,
+}
+
+
+class PopulationNetwork:
+    """ Evaluates the feed-forward networks of a whole population in one vectorized pass.
+
+    Every genome is compiled into the same column layout: the inputs come first, then each
+    feed-forward layer gets a block of columns as wide as the widest genome's layer at that
+    depth, and the last column is a constant zero that stands in for outputs which are not
+    connected to anything (neat leaves those at 0.0 as well).
+    """
+
+    def __init__(self, num_inputs, layers, output_columns, num_columns):
+        self.num_inputs = num_inputs
+        self.layers = layers
+        self.output_columns = output_columns
+        self.num_columns = num_columns
+        self.values = np.zeros((len(output_columns), num_columns))
+
+    def __len__(self):
+        return len(self.output_columns)
+
+    def activate(self, inputs):
+        """ Takes a (num_genomes, num_inputs) observation matrix, returns (num_genomes, num_outputs). """
+        values = self.values
+        values[:, :self.num_inputs] = inputs
+
+        for start, width, weights, bias, response, activations in self.layers:
+            s = np.einsum('nkc,nc->nk', weights, values[:, :start])
+            z = bias + response * s
+            if len(activations) == 1:
+                values[:, start:start + width] = activations[0][0](z)
+            else:
+                out = values[:, start:start + width]
+                for function, mask in activations:
+                    out[mask] = function(z[mask])
+
+        return np.take_along_axis(values, self.output_columns, axis=1)
+
+    @staticmethod
+    def create(genomes, config):
+        """ Receives a list of genomes and returns their batched phenotype. """
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+        num_inputs = len(input_keys)
+
+        compiled = []
+        layer_widths = []
+        for genome in genomes:
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            layers = [sorted(layer) for layer in feed_forward_layers(input_keys, output_keys, connections)]
+            for depth, layer in enumerate(layers):
+                if depth == len(layer_widths):
+                    layer_widths.append(0)
+                layer_widths[depth] = max(layer_widths[depth], len(layer))
+            compiled.append((connections, layers))
+
+        layer_starts = []
+        num_columns = num_inputs
+        for width in layer_widths:
+            layer_starts.append(num_columns)
+            num_columns += width
+        zero_column = num_columns
+        num_columns += 1
+
+        num_genomes = len(genomes)
+        weights = [np.zeros((num_genomes, width, start)) for start, width in zip(layer_starts, layer_widths)]
+        biases = [np.zeros((num_genomes, width)) for width in layer_widths]
+        responses = [np.ones((num_genomes, width)) for width in layer_widths]
+        activation_names = [np.full((num_genomes, width), 'sigmoid', dtype=object) for width in layer_widths]
+        output_columns = np.full((num_genomes, len(output_keys)), zero_column, dtype=np.intp)
+
+        for g, (genome, (connections, layers)) in enumerate(zip(genomes, compiled)):
+            columns = dict((key, i) for i, key in enumerate(input_keys))
+            placement = {}
+            for depth, layer in enumerate(layers):
+                for slot, node in enumerate(layer):
+                    ng = genome.nodes[node]
+                    if ng.aggregation != 'sum':
+                        raise ValueError("PopulationNetwork only supports sum aggregation, got {0!r}".format(ng.aggregation))
+                    if ng.activation not in ACTIVATIONS:
+                        raise ValueError("No vectorized activation for {0!r}".format(ng.activation))
+
+                    columns[node] = layer_starts[depth] + slot
+                    placement[node] = (depth, slot)
+                    biases[depth][g, slot] = ng.bias
+                    responses[depth][g, slot] = ng.response
+                    activation_names[depth][g, slot] = ng.activation
+
+            for inode, onode in connections:
+                if onode in placement:
+                    depth, slot = placement[onode]
+                    weights[depth][g, slot, columns[inode]] = genome.connections[(inode, onode)].weight
+
+            for i, key in enumerate(output_keys):
+                if key in columns:
+                    output_columns[g, i] = columns[key]
+
+        layers = []
+        for d, (start, width) in enumerate(zip(layer_starts, layer_widths)):
+            names = activation_names[d]
+            activations = [(ACTIVATIONS[name], names == name) for name in sorted(set(names.flat))]
+            layers.append((start, width, weights[d], biases[d], responses[d], activations))
+
+        return PopulationNetwork(num_inputs, layers, output_columns, num_columns)
@@ -0,0 +1,107 @@
+import numpy as np
+import pygame
+
+from ReplayRecorder import load_replay, POSE_COLUMNS, TORSO_X
+from Simulation import Simulation, TARGET_FPS, CULL_MARGIN
+from WalkerInfo import WalkerInfo, H_DISTANCE, HEAD_ALTITUDE
+
+SEEK_STEPS = 100
+
+
+class ReplayPlayer:
+    """ Plays recorded replays with Simulation's drawing code, no physics involved.
+
+    Several replays play side by side in one view; the shorter ones hold their last step.
+    Keys: space pauses, left/right seek, up/down double or halve the speed, home restarts.
+    """
+
+    def __init__(self, filenames, simulation, speed=1.0):
+        self.simulation = simulation
+        self.replays = [load_replay(filename) for filename in filenames]
+        self.num_steps = max(header['num_steps'] for header, data in self.replays)
+        if self.num_steps == 0:
+            raise ValueError("The replays contain no steps")
+        self.speed = speed
+        self.position = 0.0
+        self.paused = False
+
+    @property
+    def step(self):
+        return int(self.position)
+
+    def seek(self, step):
+        self.position = float(min(max(step, 0), self.num_steps - 1))
+
+    def frame(self, step):
+        """ The frame of the given step, in the form Simulation.capture_frame() returns, with
+        the same choice of walkers drawn in full and as ghosts. """
+        sim = self.simulation
+        bodies = list(self.replays[0][0]['static_bodies'])
+        walker_shapes = []
+        poses = []
+        states = []
+        for header, data in self.replays:
+            if header['num_steps'] == 0:
+                continue
+            i = min(step, header['num_steps'] - 1)
+            poses.append(np.asarray(data[:len(POSE_COLUMNS), i, :]).T)
+            states.append(np.asarray(data[len(POSE_COLUMNS):, i, :]).T)
+            walker_shapes.extend([header['walker_shapes']] * header['num_walkers'])
+
+        poses = np.concatenate(poses).astype(np.float64)
+        states = np.concatenate(states).astype(np.float64)
+        leader = int(np.argmax(states[:, H_DISTANCE]))
+        camera_x = float(poses[leader, TORSO_X])
+
+        # The rearmost point of every walker, the x columns come first in every body's triple
+        ghost_x = poses[:, 0::3].min(axis=1)
+        detail, ghosts = sim.walker_detail(states[:, H_DISTANCE], ghost_x, camera_x)
+        left, right, bottom, top = sim.view(camera_x, sim.cameraY, CULL_MARGIN)
+        for i in detail.tolist():
+            pose = poses[i].tolist()
+            for b, shapes in enumerate(walker_shapes[i]):
+                x, y, angle = pose[3 * b:3 * b + 3]
+                if left < x < right and bottom < y < top:
+                    bodies.append((shapes, (x, y), angle))
+
+        texts = Simulation.info_texts(WalkerInfo(states[leader]))
+        texts.append("Replay step {0}/{1}, {2:g}x{3}".format(
+            step + 1, self.num_steps, self.speed, " (paused)" if self.paused else ""))
+        ghosts = np.stack([ghost_x[ghosts], states[ghosts, HEAD_ALTITUDE]], axis=1)
+        return (camera_x, sim.cameraY, bodies, texts, ghosts)
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.simulation.running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    self.paused = not self.paused
+                elif event.key == pygame.K_RIGHT:
+                    self.seek(self.step + SEEK_STEPS)
+                elif event.key == pygame.K_LEFT:
+                    self.seek(self.step - SEEK_STEPS)
+                elif event.key == pygame.K_UP:
+                    self.speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    self.speed /= 2
+                elif event.key == pygame.K_HOME:
+                    self.seek(0)
+
+    def play(self, loop=True):
+        """ Plays until the window is closed, or to the end once when loop is off. """
+        sim = self.simulation
+        # Like Simulation.draw, frame_skip renders every Nth step at the same playback speed
+        while sim.running:
+            self.handle_events()
+            if sim.real_time:
+                sim.clock.tick(TARGET_FPS / sim.frame_skip)
+            sim.show_frame(self.frame(self.step))
+
+            if self.paused:
+                continue
+            self.position += self.speed * sim.frame_skip
+            if not 0 <= self.position < self.num_steps:
+                if not loop:
+                    return
+                self.position %= self.num_steps
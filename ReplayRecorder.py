@@ -0,0 +1,110 @@
+import json
+import struct
+
+import numpy as np
+from Box2D import b2_staticBody
+
+from Simulation import Simulation, TIME_STEP
+from WalkerInfo import FIELDS
+
+# File layout: MAGIC, the JSON header's length (uint32), the header, padding to a multiple
+# of 64 bytes, then float32 data of shape (num_columns, num_steps, num_walkers). Every
+# column is contiguous, so reading one channel of a long replay touches only its own pages.
+MAGIC = b'WALKRPLY'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+BODY_NAMES = ('left_upper', 'right_upper', 'left_lower', 'right_lower', 'torso')
+POSE_COLUMNS = tuple('{0}_{1}'.format(body, value) for body in BODY_NAMES for value in ('x', 'y', 'angle'))
+COLUMNS = POSE_COLUMNS + FIELDS
+TORSO_X = POSE_COLUMNS.index('torso_x')
+
+
+def _shapes_from_json(shapes):
+    color, parts = shapes
+    return (tuple(color), tuple((part[0], tuple(tuple(v) for v in part[1])) if part[0] == 'polygon'
+                                else (part[0], tuple(part[1]), part[2]) for part in parts))
+
+
+def load_replay(filename):
+    """ Returns (header, data); data is a read-only memory map of shape (num_columns, num_steps, num_walkers). """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{0} is not a replay file".format(filename))
+        header_size, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_size).decode())
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError("Unsupported replay version {0}".format(header['version']))
+
+    header['walker_shapes'] = [_shapes_from_json(shapes) for shapes in header['walker_shapes']]
+    header['static_bodies'] = [(_shapes_from_json(shapes), tuple(position), angle)
+                               for shapes, position, angle in header['static_bodies']]
+    shape = (len(header['columns']), header['num_steps'], header['num_walkers'])
+    if header['num_steps'] == 0:
+        return header, np.zeros(shape, dtype=np.float32)
+    return header, np.memmap(filename, dtype='<f4', mode='r', offset=header['data_offset'], shape=shape)
+
+
+class ReplayRecorder:
+    """ Records the pose of every walker body and the WalkerInfo channels once per step.
+
+    Call record() after every simulation update and save() at the end. The world is not
+    needed to play the file back, see ReplayPlayer. Streamed ground segments are kept from
+    the step they first show up in, so the replay has all the ground the walkers crossed.
+    """
+
+    def __init__(self, simulation, walkers=None, time_step=TIME_STEP):
+        self.walkers = list(simulation.walkers if walkers is None else walkers)
+        self.time_step = time_step
+        self.rows = []
+        self.walker_shapes = [Simulation.body_shapes(body) for body in self.walkers[0]._bodies()]
+        self.static_bodies = [(Simulation.body_shapes(body), tuple(body.position), body.angle)
+                              for body in simulation.world.bodies
+                              if body.type == b2_staticBody and 'terrain' not in (body.userData or {})]
+        self.terrain = getattr(simulation, 'terrain', None)
+        self.segments = {}
+        self.record_segments()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record_segments(self):
+        if self.terrain is None:
+            return
+        for index, (shapes, position, radius) in self.terrain.outlines.items():
+            if index not in self.segments:
+                self.segments[index] = (shapes, position, 0.0)
+
+    def record(self):
+        self.record_segments()
+        row = np.empty((len(COLUMNS), len(self.walkers)), dtype=np.float32)
+        for i, walker in enumerate(self.walkers):
+            row[:len(POSE_COLUMNS), i] = [value for body in walker._bodies()
+                                          for value in (body.position[0], body.position[1], body.angle)]
+            row[len(POSE_COLUMNS):, i] = walker.state
+        self.rows.append(row)
+
+    def save(self, filename):
+        data = np.stack(self.rows, axis=1) if self.rows else np.zeros((len(COLUMNS), 0, len(self.walkers)), dtype=np.float32)
+        header = {
+            'version': FORMAT_VERSION,
+            'columns': COLUMNS,
+            'num_steps': data.shape[1],
+            'num_walkers': data.shape[2],
+            'time_step': self.time_step,
+            'walker_shapes': self.walker_shapes,
+            'static_bodies': self.static_bodies + [self.segments[index] for index in sorted(self.segments)],
+        }
+        # The offset is part of the header, so its length is settled before the final encoding
+        prefix = len(MAGIC) + 4
+        header['data_offset'] = 0
+        encoded = json.dumps(header).encode()
+        header['data_offset'] = -(-(prefix + len(encoded) + 16) // ALIGNMENT) * ALIGNMENT
+        encoded = json.dumps(header).encode()
+        encoded += b' ' * (header['data_offset'] - prefix - len(encoded))
+
+        with open(filename, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(encoded)))
+            f.write(encoded)
+            f.write(data.astype('<f4').tobytes())
@@ -0,0 +1,181 @@
+import math
+from multiprocessing import Pool, shared_memory, resource_tracker
+
+import numpy as np
+
+from CompiledNetwork import CompiledNetwork, flatten_network
+from PhaseTimingReporter import phase_timing_initializer
+
+
+def _layout(num_genomes, num_nodes, num_links, num_outputs):
+    """ Byte offset, dtype and length of every array in the block, and the block's size. """
+    fields = (
+        ('node_offsets', np.int64, num_genomes + 1),
+        ('genome_keys', np.int64, num_genomes),
+        ('outputs', np.int64, num_genomes * num_outputs),
+        ('fitness', np.float64, num_genomes),
+        ('link_offsets', np.int64, num_nodes + 1),
+        ('bias', np.float64, num_nodes),
+        ('response', np.float64, num_nodes),
+        ('activation', np.int32, num_nodes),
+        ('aggregation', np.int32, num_nodes),
+        ('link_source', np.int32, num_links),
+        ('link_weight', np.float64, num_links),
+    )
+    layout = {}
+    size = 0
+    for name, dtype, length in fields:
+        layout[name] = (size, dtype, length)
+        # Keep every array 8-byte aligned
+        size += -(-length * np.dtype(dtype).itemsize // 8) * 8
+    return layout, size
+
+
+def _arrays(buffer, sizes):
+    layout = _layout(*sizes)[0]
+    return dict((name, np.ndarray((length,), dtype, buffer, offset)) for name, (offset, dtype, length) in layout.items())
+
+
+def _decode(arrays, i, activations, aggregations):
+    """ Network i of the block, in the form flatten_network() returns. """
+    n0, n1 = arrays['node_offsets'][i:i + 2].tolist()
+    link_offsets = arrays['link_offsets'][n0:n1 + 1].tolist()
+    nodes = []
+    for j, (activation, aggregation, bias, response) in enumerate(zip(
+            arrays['activation'][n0:n1].tolist(), arrays['aggregation'][n0:n1].tolist(),
+            arrays['bias'][n0:n1].tolist(), arrays['response'][n0:n1].tolist())):
+        l0, l1 = link_offsets[j], link_offsets[j + 1]
+        links = list(zip(arrays['link_source'][l0:l1].tolist(), arrays['link_weight'][l0:l1].tolist()))
+        nodes.append((activations[activation], aggregations[aggregation], bias, response, links))
+
+    num_outputs = len(arrays['outputs']) // (len(arrays['node_offsets']) - 1)
+    outputs = arrays['outputs'][i * num_outputs:(i + 1) * num_outputs].tolist()
+    return nodes, [None if slot < 0 else slot for slot in outputs]
+
+
+_config = None
+_episode_function = None
+_block = None
+
+def _init_worker(config, episode_function):
+    global _config, _episode_function
+    _config = config
+    _episode_function = episode_function
+
+
+def _evaluate_range(block_name, sizes, activations, aggregations, start, stop):
+    global _block
+    if _block is None or _block.name != block_name:
+        if _block is not None:
+            _block.close()
+        _block = shared_memory.SharedMemory(block_name)
+
+    arrays = _arrays(_block.buf, sizes)
+    fitness = arrays['fitness']
+    for i in range(start, stop):
+        nodes, outputs = _decode(arrays, i, activations, aggregations)
+        net = CompiledNetwork.compile(nodes, outputs, _config, '<network {0}>'.format(i))
+        fitness[i] = _episode_function(net, int(arrays['genome_keys'][i]))[0]
+
+
+class SharedNetworkEvaluator:
+    """
+    Like neat.ParallelEvaluator, but the genomes never travel to the workers.
+
+    Every generation's networks are flattened once (see flatten_network) into arrays in a
+    multiprocessing.shared_memory block: per genome its range of nodes and output slots,
+    per node its bias, response, functions and range of links, per link its source slot
+    and weight. A task only names a range of genome indices; the worker reads those
+    networks in place, compiles them and writes the fitness into an array of the same
+    block. The block is reused while the generation fits into it.
+
+    episode_function(net, genome_key) runs the episode for a CompiledNetwork and returns
+    the fitness first (main.run_episode). The config is sent once, when the pool starts.
+    """
+
+    def __init__(self, num_workers, episode_function, tasks_per_worker=4):
+        self.num_workers = num_workers
+        self.episode_function = episode_function
+        self.tasks_per_worker = tasks_per_worker
+        self.pool = None
+        self.config = None
+        self.block = None
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def _encode(self, genomes, config):
+        activations = []
+        aggregations = []
+        node_offsets = [0]
+        outputs = []
+        link_offsets = [0]
+        nodes = []
+        links = []
+        for genome_id, genome in genomes:
+            genome_nodes, genome_outputs = flatten_network(genome, config)
+            for activation, aggregation, bias, response, node_links in genome_nodes:
+                if activation not in activations:
+                    activations.append(activation)
+                if aggregation not in aggregations:
+                    aggregations.append(aggregation)
+                nodes.append((bias, response, activations.index(activation), aggregations.index(aggregation)))
+                links.extend(node_links)
+                link_offsets.append(len(links))
+            node_offsets.append(len(nodes))
+            outputs.extend(-1 if slot is None else slot for slot in genome_outputs)
+
+        sizes = (len(genomes), len(nodes), len(links), len(config.genome_config.output_keys))
+        size = _layout(*sizes)[1]
+        if self.block is None or self.block.size < size:
+            if self.block is not None:
+                self.block.close()
+                self.block.unlink()
+            self.block = shared_memory.SharedMemory(create=True, size=max(size, 2 * (self.block.size if self.block else 0)))
+
+        arrays = _arrays(self.block.buf, sizes)
+        arrays['node_offsets'][:] = node_offsets
+        arrays['genome_keys'][:] = [genome.key for genome_id, genome in genomes]
+        arrays['outputs'][:] = outputs
+        arrays['fitness'][:] = np.nan
+        arrays['link_offsets'][:] = link_offsets
+        if nodes:
+            arrays['bias'][:], arrays['response'][:], arrays['activation'][:], arrays['aggregation'][:] = zip(*nodes)
+        if links:
+            arrays['link_source'][:], arrays['link_weight'][:] = zip(*links)
+        return sizes, tuple(activations), tuple(aggregations)
+
+    def evaluate(self, genomes, config):
+        if not genomes:
+            return
+        if config is not self.config:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+            # Workers started before the resource tracker would each start their own, which
+            # unlinks the blocks they attached to when the worker exits
+            resource_tracker.ensure_running()
+            self.pool = Pool(self.num_workers, *phase_timing_initializer(_init_worker, (config, self.episode_function)))
+            self.config = config
+
+        sizes, activations, aggregations = self._encode(genomes, config)
+        task_size = max(1, math.ceil(len(genomes) / (self.num_workers * self.tasks_per_worker)))
+        jobs = [self.pool.apply_async(_evaluate_range, (self.block.name, sizes, activations, aggregations,
+                                                        start, min(start + task_size, len(genomes))))
+                for start in range(0, len(genomes), task_size)]
+        for job in jobs:
+            job.get()
+
+        fitness = _arrays(self.block.buf, sizes)['fitness'].tolist()
+        for (genome_id, genome), value in zip(genomes, fitness):
+            genome.fitness = value
@@ -1,3 +1,7 @@
+import os
+import atexit
+import queue
+import threading
 import pygame
 from Box2D import (
     b2World, b2PolygonShape, b2CircleShape, b2_staticBody, b2_dynamicBody
@@ -5,7 +9,9 @@ from Box2D import (
 import math
 from Walker import Walker
 import numpy as np
-from WalkerInfo import WalkerInfo
+from WalkerInfo import STATE_SIZE, OBSERVATION_SIZE, H_DISTANCE, HEAD_ALTITUDE
+from FrameWriter import FrameWriter
+from Terrain import Terrain
 
 
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
@@ -14,13 +20,53 @@ TARGET_FPS = 100
 TIME_STEP = 1.0 / TARGET_FPS
 VELOCITY_ITERATIONS = 8
 POSITION_ITERATIONS = 3
+DEFAULT_COLOR = (0, 150, 255)
+GRID_COLOR = (200, 200, 200)
+GRID_LINES = 100
+# No part of a walker body reaches further than this from the body's origin
+CULL_MARGIN = 1.0
+GHOST_COLOR = (170, 170, 170)
+GHOST_RADIUS = 0.1
+SPAWN_POSITION = (2, 1.5)
 
 
 class Simulation:
-    def __init__(self):
+    """ Rendered simulation of a group of walkers.
+
+    frame_skip: only every Nth draw() call renders a frame, physics runs at full speed in between
+    real_time: paces draw() to TARGET_FPS, off means as fast as the machine allows
+    threaded: frames are rendered on a background thread from snapshots of the body transforms
+    output: video file or image sequence every rendered frame is written to, see FrameWriter
+    headless: renders offscreen through the SDL dummy driver, no window is opened
+    detail_walkers: only the walkers this far ahead are drawn body by body, None draws all
+    ghost_walkers: how many of the other walkers in view are drawn as markers, the furthest ahead
+    terrain: TerrainProfile streamed in segments around the walkers, None keeps the 100 m ground box
+    """
+
+    def __init__(self, frame_skip=1, real_time=True, threaded=False, output=None, headless=False,
+                 detail_walkers=10, ghost_walkers=200, terrain=None):
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.clock = pygame.time.Clock()
+        self.font = pygame.font.Font(None, 24)
+
+        self.frame_skip = frame_skip
+        self.detail_walkers = detail_walkers
+        self.ghost_walkers = ghost_walkers
+        self.real_time = real_time
+        self.headless = headless
+        self.draw_calls = 0
+        self.writer = None if output is None else FrameWriter(output, (SCREEN_WIDTH, SCREEN_HEIGHT), TARGET_FPS / frame_skip)
+
+        self.frames = None
+        self.render_thread = None
+        if threaded:
+            self.frames = queue.Queue(maxsize=2)
+            self.render_thread = threading.Thread(target=self._render_loop, daemon=True)
+            self.render_thread.start()
+        atexit.register(self.close)
 
         self.world = b2World(gravity=(0, -9.81), doSleep=True)
 
@@ -30,25 +76,46 @@ class Simulation:
 
         self.cameraX, self.cameraY = 0, 4.5
 
+        # One grid spacing wider than the screen on both sides, shifted by the camera offset
+        grid_step = round(self.PPM)
+        self.grid_tile = pygame.Surface((SCREEN_WIDTH + 2 * grid_step, SCREEN_HEIGHT))
+        self.grid_tile.fill((255, 255, 255))
+        for x in range(0, self.grid_tile.get_width(), grid_step):
+            pygame.draw.line(self.grid_tile, GRID_COLOR, (x, 0), (x, SCREEN_HEIGHT))
+
         self.walkers = []
+        self.states = np.zeros((0, STATE_SIZE))
+        self.start_x = np.zeros(0)
+        self.leader = 0
+        self.static_bodies = []
 
-        self.create_static_box((50, -0.25), (100, 0.5))
+        self.terrain = None
+        if terrain is None:
+            self.create_static_box((50, -0.25), (100, 0.5))
+        else:
+            self.terrain = Terrain(self.world, terrain)
 
         self.reset()
 
     def make_walkers(self, num_walkers):
-        self.walkers = [Walker((2, 1.5), self) for _ in range(num_walkers)]
+        self.states = np.zeros((num_walkers, STATE_SIZE))
+        self.walkers = [Walker(SPAWN_POSITION, self, self.states[i]) for i in range(num_walkers)]
+        self.start_x = np.array([walker.startX for walker in self.walkers])
+        self.leader = 0
 
-    def create_static_box(self, position, size, friction=0.5, restitution=0.8, angle=0):
+    def create_static_box(self, position, size, friction=0.5, restitution=0.8, angle=0, color=DEFAULT_COLOR):
         body = self.world.CreateStaticBody(
             position=position,
             angle=angle,
+            # Nothing of the box is further from its position than this, for culling
+            userData={'color': color, 'radius': math.hypot(*size) / 2}
         )
         body.CreateFixture(
             shape=b2PolygonShape(box=(size[0] / 2, size[1] / 2)),
             friction=friction,
             restitution=restitution
         )
+        self.static_bodies.append(body)
         return body
     
     def world_to_screen(self, world_coords):
@@ -66,21 +133,11 @@ class Simulation:
         world_y = (-(y - SCREEN_HEIGHT // 2)) / self.PPM + self.cameraY
         return (world_x, world_y)
     
-    def draw_polygon(self, fixture, color=(0, 150, 255), border_width=1):
-        # if not fixture.shape:
-        #     return
-        shape = fixture.shape
-        transform = fixture.body.transform
-        vertices = [self.world_to_screen(transform * v) for v in shape.vertices]
+    def draw_polygon(self, vertices, color=DEFAULT_COLOR, border_width=1):
         pygame.draw.polygon(self.screen, color, vertices)
         pygame.draw.polygon(self.screen, (0, 0, 0), vertices, border_width)
-    
-    def draw_circle(self, fixture, color=(0, 150, 255), border_width=1):
-        if not fixture.shape:
-            return
-        shape = fixture.shape
-        center = self.world_to_screen(fixture.body.position)
-        radius = int(shape.radius * self.PPM)
+
+    def draw_circle(self, center, radius, color=DEFAULT_COLOR, border_width=1):
         pygame.draw.circle(self.screen, color, center, radius)
         pygame.draw.circle(self.screen, (0, 0, 0), center, radius, border_width)
 
@@ -89,55 +146,250 @@ class Simulation:
             if event.type == pygame.QUIT:
                 self.running = False
 
-    def update(self, efforts):    
+    def update(self, efforts, substeps=1):
+        self.control(efforts, substeps)
+        self.step(substeps)
+
+    def control(self, efforts, substeps=1):
+        """ Sets the motor targets the walkers hold for the next substeps physics steps;
+        step() them one by one to draw every physics step. """
         for walker, effort in zip(self.walkers, efforts):
-            walker.update(TIME_STEP, effort)
+            # Motor writes would wake the bodies of terminated walkers
+            if not walker.terminated:
+                walker.update(TIME_STEP * substeps, effort)
 
-        self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+    def step(self, substeps=1):
+        for _ in range(substeps):
+            self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+        self.refresh_states()
+        if self.terrain is not None:
+            self.stream_terrain()
 
-        self.cameraX = max(walker.torso.position[0] for walker in self.walkers)
+    def follow_leader(self):
+        """ Points the camera at the torso of the walker furthest ahead, found in the state
+        buffer instead of asking every walker's bodies. Only frames need it, so it runs once
+        per captured frame rather than every physics step. """
+        self.leader = int(np.argmax(self.states[:len(self.walkers), H_DISTANCE]))
+        self.cameraX = self.walkers[self.leader].torso.position[0]
+
+    def stream_terrain(self):
+        """ Moves the ground segments along with the running walkers. """
+        running = [not walker.terminated for walker in self.walkers]
+        if not any(running):
+            return
+        x = self.start_x + self.states[:, H_DISTANCE]
+        if self.terrain.update(x[running].min(), x[running].max()):
+            # Losing the ground under them woke the terminated walkers
+            for walker in self.walkers:
+                if walker.terminated:
+                    for body in walker._bodies():
+                        body.awake = False
 
     def draw(self, strings=[]):
-        self.clock.tick(TARGET_FPS)
+        self.draw_calls += 1
+        if self.draw_calls % self.frame_skip:
+            return
+        if self.real_time:
+            self.clock.tick(TARGET_FPS / self.frame_skip)
 
-        self.screen.fill((255, 255, 255))
+        self.show_frame(self.capture_frame(strings))
+
+    def show_frame(self, frame):
+        """ Renders a frame from capture_frame() to the window and the output, or hands it to the render thread. """
+        if self.render_thread is None:
+            self.render_frame(frame)
+            self.present()
+        elif self.writer is not None:
+            # Every frame has to reach the file, so the simulation waits for the renderer
+            self.frames.put(frame)
+        else:
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                pass
+
+    @staticmethod
+    def body_shapes(body):
+        """ The color and the shapes of a body in its own coordinates, cached in its userData. """
+        data = body.userData
+        if data is not None and 'shapes' in data:
+            return data['shapes']
+
+        shapes = []
+        for fixture in body.fixtures:
+            shape = fixture.shape
+            if isinstance(shape, b2PolygonShape):
+                shapes.append(('polygon', tuple(tuple(v) for v in shape.vertices)))
+            elif isinstance(shape, b2CircleShape):
+                shapes.append(('circle', tuple(shape.pos), shape.radius))
+
+        color = data.get('color', DEFAULT_COLOR) if data is not None else DEFAULT_COLOR
+        result = (color, tuple(shapes))
+        if data is not None:
+            data['shapes'] = result
+        return result
+
+    def view(self, camera_x, camera_y, margin=0.0):
+        """ The world rectangle on screen, widened by margin: (left, right, bottom, top). """
+        half_width = SCREEN_WIDTH / 2 / self.PPM + margin
+        half_height = SCREEN_HEIGHT / 2 / self.PPM + margin
+        return camera_x - half_width, camera_x + half_width, camera_y - half_height, camera_y + half_height
+
+    def walker_detail(self, distances, ghost_x, camera_x):
+        """ Which walkers capture_frame() draws in full and which as ghosts, as sorted indices.
+
+        The detail_walkers furthest ahead are drawn in full. Of the others whose marker at
+        ghost_x is in view, the ghost_walkers furthest ahead become ghosts. Costs a few numpy
+        passes over the walkers, none of their bodies is looked at.
+        """
+        num_walkers = len(distances)
+        if self.detail_walkers is None or self.detail_walkers >= num_walkers:
+            return np.arange(num_walkers), np.zeros(0, dtype=np.intp)
+
+        order = np.argpartition(-distances, self.detail_walkers)
+        detail, rest = np.sort(order[:self.detail_walkers]), order[self.detail_walkers:]
+        left, right = self.view(camera_x, self.cameraY, CULL_MARGIN)[:2]
+        rest = rest[(ghost_x[rest] > left) & (ghost_x[rest] < right)]
+        if len(rest) > self.ghost_walkers:
+            rest = rest[np.argpartition(-distances[rest], self.ghost_walkers)[:self.ghost_walkers]]
+        return detail, np.sort(rest)
+
+    def capture_frame(self, strings=()):
+        """ Snapshot of everything draw() shows: (cameraX, cameraY, [(shapes, position, angle)], texts, ghosts).
+
+        Bodies out of view are left out, and only the walkers walker_detail() picks are looked
+        at: the ones drawn in full body by body, the ghosts as (x, y) rows of the rearmost
+        point and torso height, from the state buffer.
+        """
+        self.follow_leader()
+        left, right, bottom, top = self.view(self.cameraX, self.cameraY)
+        bodies = []
+        for body in self.static_bodies:
+            (x, y), radius = body.position, body.userData['radius']
+            if left - radius < x < right + radius and bottom - radius < y < top + radius:
+                bodies.append((self.body_shapes(body), (x, y), body.angle))
+        if self.terrain is not None:
+            for shapes, (x, y), radius in self.terrain.outlines.values():
+                if left - radius < x < right + radius and bottom - radius < y < top + radius:
+                    bodies.append((shapes, (x, y), 0.0))
 
-        for i in range(100):
-            screenx = self.world_to_screen((i, 0))[0]
-            pygame.draw.line(self.screen, (200, 200, 200), (screenx, 0), (screenx, SCREEN_HEIGHT))
-
-        for body in self.world.bodies:
-            color = body.userData['color'] if body.userData and 'color' in body.userData else (0, 150, 255)
-            for fixture in body.fixtures:
-                if not fixture.shape:
-                    continue
-                elif isinstance(fixture.shape, b2PolygonShape):
-                    self.draw_polygon(fixture, color)
-                elif isinstance(fixture.shape, b2CircleShape):
-                    self.draw_circle(fixture, color)        # Find the walker that has traveled the furthest
-        
-        leader_idx = max(range(len(self.walkers)), key=lambda i: self.walkers[i].info().hDistance)
-        walker_info = self.walkers[leader_idx].info()
-        
-        walker_info_texts = [
+        states = self.states[:len(self.walkers)]
+        ghost_x = self.start_x + states[:, H_DISTANCE]
+        detail, ghosts = self.walker_detail(states[:, H_DISTANCE], ghost_x, self.cameraX)
+        left, right, bottom, top = self.view(self.cameraX, self.cameraY, CULL_MARGIN)
+        for i in detail.tolist():
+            for body in self.walkers[i]._bodies():
+                x, y = body.position
+                if left < x < right and bottom < y < top:
+                    bodies.append((self.body_shapes(body), (x, y), body.angle))
+
+        walker_info_texts = self.info_texts(self.walkers[self.leader].info())
+        ghosts = np.stack([ghost_x[ghosts], states[ghosts, HEAD_ALTITUDE]], axis=1)
+        return (self.cameraX, self.cameraY, bodies, walker_info_texts + list(strings), ghosts)
+
+    @staticmethod
+    def info_texts(walker_info):
+        return [
             f"Altitude: {walker_info.headAltitude:.2f}",
             f"Energy spent: {walker_info.energySpent:.2f}",
             f"Distance walked: {walker_info.hDistance:.2f}",
             # f"Time of left leg lead: {walker_info.leftLegLead:.2f}",
         ]
-        font = pygame.font.Font(None, 24)
+
+    def draw_background(self, camera_x):
+        grid_step = round(self.PPM)
+
+        def line_x(i):
+            return math.floor((i - camera_x) * self.PPM) + SCREEN_WIDTH // 2
+
+        # The tile has a line one grid step before the first visible one
+        first_visible = math.ceil(camera_x - (SCREEN_WIDTH // 2) / self.PPM)
+        grid_start, grid_end = line_x(0), line_x(GRID_LINES - 1)
+
+        self.screen.fill((255, 255, 255))
+        self.screen.set_clip(pygame.Rect(grid_start, 0, grid_end - grid_start + 1, SCREEN_HEIGHT))
+        self.screen.blit(self.grid_tile, (line_x(first_visible) - grid_step, 0))
+        self.screen.set_clip(None)
+
+    def render_frame(self, frame):
+        camera_x, camera_y, bodies, texts, ghosts = frame
+        ppm = self.PPM
+        half_width, half_height = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
+
+        self.draw_background(camera_x)
+
+        ghost_radius = max(1, int(GHOST_RADIUS * ppm))
+        for x, y in ghosts.tolist():
+            pygame.draw.circle(self.screen, GHOST_COLOR, (int((x - camera_x) * ppm) + half_width,
+                                                          int(-(y - camera_y) * ppm) + half_height), ghost_radius)
+
+        # Same rounding as world_to_screen, but with the camera of the snapshot
+        for (color, shapes), (x, y), angle in bodies:
+            c, s = math.cos(angle), math.sin(angle)
+            for shape in shapes:
+                if shape[0] == 'polygon':
+                    vertices = [(int((x + c * vx - s * vy - camera_x) * ppm) + half_width,
+                                 int(-(y + s * vx + c * vy - camera_y) * ppm) + half_height)
+                                for vx, vy in shape[1]]
+                    self.draw_polygon(vertices, color)
+                else:
+                    (px, py), radius = shape[1], shape[2]
+                    center = (int((x + c * px - s * py - camera_x) * ppm) + half_width,
+                              int(-(y + s * px + c * py - camera_y) * ppm) + half_height)
+                    self.draw_circle(center, int(radius * ppm), color)
+
         y_offset = 10
-        for text in walker_info_texts:
-            text_surface = font.render(text, True, (0, 0, 0))
+        for text in texts:
+            text_surface = self.font.render(text, True, (0, 0, 0))
             self.screen.blit(text_surface, (10, y_offset))
             y_offset += text_surface.get_height()
-            
-        pygame.display.flip()
-    
+
+    def present(self):
+        if self.writer is not None:
+            self.writer.write(self.screen)
+        if not self.headless:
+            pygame.display.flip()
+
+    def _render_loop(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            self.render_frame(frame)
+            self.present()
+
+    def close(self):
+        """ Waits for the frames still being rendered and finishes the output file. """
+        if self.render_thread is not None:
+            self.frames.put(None)
+            self.render_thread.join()
+            self.render_thread = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
     def reset(self):
         self.world.ClearForces()
         for walker in self.walkers:
             walker.destroy()
+        if self.terrain is not None:
+            self.terrain.reset(SPAWN_POSITION[0])
+
+    def terminate_walkers(self, policy, steps=1):
+        """ Terminates the walkers the policy gives up on, returns True once none is left running. """
+        done = True
+        for walker in self.walkers:
+            if policy.should_terminate(walker, steps):
+                walker.terminate()
+            else:
+                done = False
+        return done
+
+    def refresh_states(self):
+        for walker in self.walkers:
+            if not walker.terminated:
+                walker.refresh_state()
 
     def infos_array(self):
-        return [walker.info().as_array() for walker in self.walkers]
\ No newline at end of file
+        """ The (n_walkers, OBSERVATION_SIZE) network inputs, a view into the state buffer. """
+        return self.states[:, :OBSERVATION_SIZE]
@@ -2,19 +2,50 @@ from Box2D import (
     b2World, b2PolygonShape
 )
 from Walker import Walker
+from WalkerInfo import STATE_SIZE, OBSERVATION_SIZE, H_DISTANCE
+from Terrain import Terrain, terrain_profile
+import numpy as np
 
 TARGET_FPS = 100
 TIME_STEP = 1.0 / TARGET_FPS
 VELOCITY_ITERATIONS = 8
 POSITION_ITERATIONS = 3
+SPAWN_POSITION = (2, 1.5)
 
 class SimulationForParallel:
-    def __init__(self):
+    """ Headless world the workers walk genomes in.
+
+    terrain: TerrainProfile streamed in segments around the walkers (see Terrain), None
+    keeps the ground a single 100 m box
+    """
+
+    def __init__(self, terrain=None):
         self.world = b2World(gravity=(0, -9.81), doSleep=True)
-        self.create_static_box((50, -0.25), (100, 0.5))
+        self.profile = terrain
+        self.terrain = None
+        self.ground = None
+        if terrain is None:
+            self.ground = self.create_ground()
+        else:
+            self.terrain = Terrain(self.world, terrain)
+            self.terrain.reset(SPAWN_POSITION[0])
+        self.cold_start = False
+        self.walkers = []
+        self.parked_walkers = []
+        self.states = np.zeros((0, STATE_SIZE))
+
+    @property
+    def walker(self):
+        return self.walkers[0]
 
     def make_walker(self):
-        self.walker = Walker((2, 1.5), self)
+        self.make_walkers(1)
+
+    # Walkers never collide with each other (groupIndex=-1), so any number
+    # of them can share the world without changing each other's episode
+    def make_walkers(self, num_walkers):
+        self.states = np.zeros((num_walkers, STATE_SIZE))
+        self.walkers = [Walker(SPAWN_POSITION, self, self.states[i]) for i in range(num_walkers)]
 
     def create_static_box(self, position, size, friction=0.5, restitution=0.8, angle=0):
         body = self.world.CreateStaticBody(
@@ -28,13 +59,133 @@ class SimulationForParallel:
         )
         return body
 
-    def update(self, effort):    
-        self.walker.update(TIME_STEP, effort)
-        self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+    def create_ground(self):
+        return self.create_static_box((50, -0.25), (100, 0.5))
+
+    # The network runs once every substeps physics steps, the motor targets
+    # set by Walker.update are held until then and the walkers only read
+    # their sensors at the end
+    def update(self, effort, substeps=1):
+        self.walker.update(TIME_STEP * substeps, effort)
+        self.step(substeps)
+
+    def update_walkers(self, efforts, substeps=1):
+        self.control(efforts, substeps)
+        self.step(substeps)
+
+    def control(self, efforts, substeps=1):
+        """ Sets the motor targets the walkers hold for the next substeps physics steps. """
+        for walker, effort in zip(self.walkers, efforts):
+            # Motor writes would wake the bodies of terminated walkers
+            if not walker.terminated:
+                walker.update(TIME_STEP * substeps, effort)
+
+    def terminate_walkers(self, policy, steps=1):
+        """ Terminates the walkers the policy gives up on, returns True once none is left running. """
+        done = True
+        for walker in self.walkers:
+            if policy.should_terminate(walker, steps):
+                walker.terminate()
+            else:
+                done = False
+        return done
+
+    def step(self, substeps=1):
+        for _ in range(substeps):
+            if self.cold_start:
+                # Joints keep their impulses from the last episode, a fresh world has none
+                self.world.warmStarting = False
+                self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+                self.world.warmStarting = True
+                self.cold_start = False
+            else:
+                self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+
+        for walker in self.walkers:
+            if not walker.terminated:
+                walker.refresh_state()
+        if self.terrain is not None:
+            self.stream_terrain()
+
+    def stream_terrain(self):
+        """ Moves the ground segments along with the running walkers. """
+        # The rearmost point of every running walker, from the state buffer
+        distances = [walker.state[H_DISTANCE] for walker in self.walkers if not walker.terminated]
+        if not distances:
+            return
+        if self.terrain.update(SPAWN_POSITION[0] + min(distances), SPAWN_POSITION[0] + max(distances)):
+            # Losing the ground under them woke the terminated walkers
+            for walker in self.walkers:
+                if walker.terminated:
+                    for body in walker._bodies():
+                        body.awake = False
+
+    def infos_array(self):
+        """ The (n_walkers, OBSERVATION_SIZE) network inputs, a view into the state buffer. """
+        return self.states[:len(self.walkers), :OBSERVATION_SIZE]
     
     def reset(self):
         self.world.ClearForces()
-        self.walker.destroy()
+        for walker in self.walkers + self.parked_walkers:
+            walker.destroy()
+        self.walkers = []
+        self.parked_walkers = []
+
+    def reset_walkers(self, num_walkers=1):
+        """ Puts num_walkers walkers back into the spawn pose, building more if needed, and parks the rest. """
+        if self.terrain is not None and self.terrain.streamed:
+            # Segments created and destroyed on the way took and freed broadphase proxies in
+            # an order no reset can undo, and the proxy ids decide the order contacts are
+            # found in. Building the world anew costs about a few steps per walker
+            self.world = b2World(gravity=(0, -9.81), doSleep=True)
+            self.terrain = Terrain(self.world, self.profile)
+            self.walkers = []
+            self.parked_walkers = []
+            self.states = np.zeros((0, STATE_SIZE))
+        self.world.ClearForces()
+        # The ground takes the contacts of the last episode along, which would
+        # otherwise keep their place in the contact list, and its rebuilt proxy
+        # finds the walkers' contacts in the same order as in a new world.
+        # Without it, episodes depend slightly on the ones evaluated before
+        if self.terrain is None:
+            self.world.DestroyBody(self.ground)
+        else:
+            self.terrain.clear()
+        walkers = self.walkers + self.parked_walkers
+        for walker in walkers[:num_walkers]:
+            walker.reset()
+        for walker in walkers[num_walkers:]:
+            walker.park()
+        if self.terrain is None:
+            self.ground = self.create_ground()
+        else:
+            self.terrain.reset(SPAWN_POSITION[0])
+        walkers.extend(Walker(SPAWN_POSITION, self) for _ in range(num_walkers - len(walkers)))
+
+        # Rows follow the walkers' order, which only ever grows at the end
+        if len(walkers) != len(self.states):
+            self.states = np.zeros((len(walkers), STATE_SIZE))
+            for walker, state in zip(walkers, self.states):
+                walker.bind_state(state)
+
+        self.walkers = walkers[:num_walkers]
+        self.parked_walkers = walkers[num_walkers:]
+        self.cold_start = True
 
     def run_step(self, efforts):
-        self.update(efforts)
\ No newline at end of file
+        self.update(efforts)
+
+
+_pooled_simulation = None
+
+def pooled_simulation(num_walkers=1, terrain=None):
+    """ Returns this process' long-lived simulation with num_walkers walkers in the spawn pose.
+
+    terrain: keyword arguments of terrain_profile() for streamed ground, None for the ground box
+    """
+    global _pooled_simulation
+    profile = None if terrain is None else terrain_profile(**terrain)
+    if _pooled_simulation is None or _pooled_simulation.profile is not profile:
+        _pooled_simulation = SimulationForParallel(profile)
+    _pooled_simulation.reset_walkers(num_walkers)
+    return _pooled_simulation
@@ -0,0 +1,111 @@
+import os
+import copy
+import json
+
+from neat.math_util import mean, stdev
+from neat.reporting import BaseReporter
+
+
+class StatisticsLogReporter(BaseReporter):
+    """ Appends one JSON line per generation to a log file: the generation, the best, mean and
+    standard deviation of the fitness, and every species' size.
+
+    Unlike neat.StatisticsReporter nothing grows with the number of generations: only the
+    best genome so far is kept. The file is only open while a line is appended, so
+    StatisticsLog can follow a running job. A restored job appends to the same log; if it went back to an
+    earlier generation, StatisticsLog keeps the lines written after the restore.
+    """
+
+    def __init__(self, filename='statistics.jsonl'):
+        self.filename = filename
+        self.generation = None
+        self.best = None
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        # Species by species, summed in the same order as StatisticsReporter's
+        fitnesses = [genome.fitness for s in species.species.values() for genome in s.members.values()]
+        entry = {
+            'generation': self.generation,
+            'best': best_genome.fitness,
+            'mean': mean(fitnesses),
+            'stdev': stdev(fitnesses),
+            'species': dict((str(sid), len(s.members)) for sid, s in species.species.items()),
+        }
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        if self.best is None or best_genome.fitness > self.best.fitness:
+            self.best = copy.deepcopy(best_genome)
+
+    def best_genome(self):
+        return self.best
+
+
+class StatisticsLog:
+    """ Reads the log StatisticsLogReporter writes, picking up where the last update() stopped.
+
+    Offers what visualize.plot_stats and plot_species use of neat.StatisticsReporter.
+    A generation that shows up again (a job restored from an older checkpoint) cuts the
+    history back to before it.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0
+        self.generations = []
+        self.best = []
+        self.means = []
+        self.stdevs = []
+        self.species = []
+        self.update()
+
+    def __len__(self):
+        return len(self.generations)
+
+    def update(self):
+        """ Reads the lines appended since the last call, returns how many generations they had. """
+        if not os.path.exists(self.filename):
+            return 0
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        # A line still being written waits for the next update
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+
+        read = 0
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            generation = entry['generation']
+            if self.generations and generation <= self.generations[-1]:
+                keep = next(i for i, g in enumerate(self.generations) if g >= generation)
+                for values in (self.generations, self.best, self.means, self.stdevs, self.species):
+                    del values[keep:]
+            self.generations.append(generation)
+            self.best.append(entry['best'])
+            self.means.append(entry['mean'])
+            self.stdevs.append(entry['stdev'])
+            self.species.append(dict((int(sid), size) for sid, size in entry['species'].items()))
+            read += 1
+        return read
+
+    def get_best_fitness(self):
+        return list(self.best)
+
+    def get_fitness_mean(self):
+        return list(self.means)
+
+    def get_fitness_stdev(self):
+        return list(self.stdevs)
+
+    def get_species_sizes(self):
+        """ Sizes of species 1 to the highest species id, per generation, like StatisticsReporter's. """
+        max_species = max((max(sizes) for sizes in self.species if sizes), default=0)
+        return [[sizes.get(sid, 0) for sid in range(1, max_species + 1)] for sizes in self.species]
@@ -0,0 +1,236 @@
+import math
+import random
+import queue
+from multiprocessing import Pool
+
+import neat
+from neat.species import Species
+
+from PhaseTimingReporter import phase_timing_initializer
+
+
+class SteadyStateEvolution:
+    """
+    Evolves a neat.Population without a generation barrier, in the spirit of rtNEAT.
+
+    The workers always have evaluations queued. Whenever one returns, the genome joins the
+    population and a species, the genome with the worst fitness relative to its species'
+    size leaves it, and a new offspring of a fit species is sent off in its place, so no
+    worker waits for the slowest walker of a generation.
+
+    Every pop_size finished evaluations count as one generation for the reporters: the
+    population is re-speciated, stagnant species are removed, and start_generation,
+    post_evaluate and end_generation are called with the population as it is at that
+    moment, so StatisticsReporter, StdOutReporter and the checkpointers work unchanged.
+
+    eval_function(genome, config) returns the fitness, like for neat.ParallelEvaluator.
+    Evaluations still running when run() returns are picked up by the next run(); close()
+    (or leaving a with block) drops them and shuts the workers down.
+    """
+
+    def __init__(self, population, num_workers, eval_function, queued_per_worker=2, timeout=None):
+        self.population = population
+        self.config = population.config
+        self.reporters = population.reporters
+        self.reproduction = population.reproduction
+        self.species_set = population.species
+        self.eval_function = eval_function
+        self.timeout = timeout
+
+        self.num_in_flight = num_workers * queued_per_worker
+        self.pool = Pool(num_workers, *phase_timing_initializer())
+        self.results = queue.Queue()
+        self.evaluated = {}
+        self.evaluations = 0
+        self.in_flight = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # No __del__: the pool's callbacks hold on to self, so the last reference can go away on
+    # the pool's result handler thread, which cannot join the pool it belongs to
+    def close(self):
+        """ Stops the evaluations still running and waits for the workers to exit. """
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+        self.in_flight = 0
+        self.results = queue.Queue()
+
+    def _submit(self, genome):
+        self.pool.apply_async(self.eval_function, (genome, self.config),
+                              callback=lambda fitness: self.results.put((genome, fitness, None)),
+                              error_callback=lambda error: self.results.put((genome, None, error)))
+
+    def _add(self, genome):
+        """ Puts an evaluated genome into the population and into the closest species. """
+        genome_config = self.config.genome_config
+        threshold = self.species_set.species_set_config.compatibility_threshold
+
+        closest, closest_distance = None, None
+        for s in self.species_set.species.values():
+            distance = genome.distance(s.representative, genome_config)
+            if distance < threshold and (closest is None or distance < closest_distance):
+                closest, closest_distance = s, distance
+
+        if closest is None:
+            closest = Species(next(self.species_set.indexer), self.population.generation)
+            closest.update(genome, {})
+            self.species_set.species[closest.key] = closest
+        closest.members[genome.key] = genome
+        self.species_set.genome_to_species[genome.key] = closest.key
+        self.evaluated[genome.key] = genome
+
+    def _remove(self, genome_id):
+        del self.evaluated[genome_id]
+        sid = self.species_set.genome_to_species.pop(genome_id)
+        members = self.species_set.species[sid].members
+        del members[genome_id]
+        if not members:
+            del self.species_set.species[sid]
+
+    def _remove_worst(self):
+        """ Drops the genome with the lowest fitness shared with its species, sparing every species' elites. """
+        elitism = self.reproduction.reproduction_config.elitism
+        min_fitness = min(genome.fitness for genome in self.evaluated.values())
+        species = [s for s in self.species_set.species.values() if len(s.members) > elitism]
+        if not species:
+            species = [s for s in self.species_set.species.values() if s.members]
+
+        worst, worst_score = None, None
+        for s in species:
+            genome = min(s.members.values(), key=lambda g: g.fitness)
+            score = (genome.fitness - min_fitness) / len(s.members)
+            if worst is None or score < worst_score:
+                worst, worst_score = genome, score
+        self._remove(worst.key)
+
+    def _offspring(self):
+        """ Breeds a child of two parents from the better part of a species picked by its mean fitness. """
+        min_fitness = min(genome.fitness for genome in self.evaluated.values())
+        species = [s for s in self.species_set.species.values() if s.members]
+        weights = [sum(g.fitness - min_fitness for g in s.members.values()) / len(s.members) + 1e-6
+                   for s in species]
+        s = random.choices(species, weights)[0]
+
+        members = sorted(s.members.values(), key=lambda g: g.fitness, reverse=True)
+        cutoff = max(2, int(math.ceil(self.reproduction.reproduction_config.survival_threshold * len(members))))
+        parents = members[:cutoff]
+        parent1, parent2 = random.choice(parents), random.choice(parents)
+
+        gid = next(self.reproduction.genome_indexer)
+        child = self.config.genome_type(gid)
+        child.configure_crossover(parent1, parent2, self.config.genome_config)
+        child.mutate(self.config.genome_config)
+        self.reproduction.ancestors[gid] = (parent1.key, parent2.key)
+        return child
+
+    def _update_adjusted_fitness(self):
+        # The same normalization DefaultReproduction uses, StdOutReporter prints it
+        fitnesses = [genome.fitness for genome in self.evaluated.values()]
+        min_fitness = min(fitnesses)
+        fitness_range = max(1.0, max(fitnesses) - min_fitness)
+        for s in self.species_set.species.values():
+            mean_fitness = sum(g.fitness for g in s.members.values()) / len(s.members)
+            s.adjusted_fitness = (mean_fitness - min_fitness) / fitness_range
+
+    def _end_generation(self):
+        """ Reports a finished generation, returns True if the fitness threshold was reached. """
+        config = self.config
+        population = self.population
+        self.species_set.speciate(config, self.evaluated, population.generation)
+
+        best = max(self.evaluated.values(), key=lambda g: g.fitness)
+        self.reporters.post_evaluate(config, self.evaluated, self.species_set, best)
+        if population.best_genome is None or best.fitness > population.best_genome.fitness:
+            population.best_genome = best
+
+        if not config.no_fitness_termination:
+            if population.fitness_criterion(g.fitness for g in self.evaluated.values()) >= config.fitness_threshold:
+                self.reporters.found_solution(config, population.generation, best)
+                return True
+
+        for sid, s, stagnant in self.reproduction.stagnation.update(self.species_set, population.generation):
+            if stagnant:
+                self.reporters.species_stagnant(sid, s)
+                for genome_id in list(s.members):
+                    self._remove(genome_id)
+
+        if not self.evaluated:
+            self.reporters.complete_extinction()
+            if not config.reset_on_extinction:
+                raise neat.CompleteExtinctionException()
+        else:
+            self._update_adjusted_fitness()
+
+        population.population = self.evaluated
+        self.reporters.end_generation(config, self.evaluated, self.species_set)
+        population.generation += 1
+        return False
+
+    def run(self, n=None):
+        """ Runs for at most n generations' worth of evaluations, returns the best genome found. """
+        config = self.config
+        population = self.population
+        if config.no_fitness_termination and n is None:
+            raise RuntimeError("Cannot have no generational limit with no fitness termination")
+
+        # A new or restored population still has to be evaluated, one left by an earlier run not
+        for s in self.species_set.species.values():
+            s.members = {}
+        self.species_set.genome_to_species = {}
+        self.evaluated = {}
+        unevaluated = []
+        for genome in population.population.values():
+            if genome.fitness is None:
+                unevaluated.append(genome)
+            else:
+                self._add(genome)
+
+        generations = 0
+        finished_in_generation = 0
+        self.reporters.start_generation(population.generation)
+        while True:
+            while self.in_flight < self.num_in_flight:
+                if unevaluated:
+                    self._submit(unevaluated.pop(0))
+                elif self.evaluated:
+                    self._submit(self._offspring())
+                elif self.in_flight == 0:
+                    unevaluated = list(self.reproduction.create_new(config.genome_type, config.genome_config,
+                                                                    config.pop_size).values())
+                    continue
+                else:
+                    break
+                self.in_flight += 1
+
+            genome, fitness, error = self.results.get(timeout=self.timeout)
+            self.in_flight -= 1
+            if error is not None:
+                raise error
+            genome.fitness = fitness
+            self._add(genome)
+            if len(self.evaluated) > config.pop_size:
+                self._remove_worst()
+
+            self.evaluations += 1
+            finished_in_generation += 1
+            if finished_in_generation < config.pop_size:
+                continue
+
+            finished_in_generation = 0
+            generations += 1
+            if self._end_generation() or (n is not None and generations >= n):
+                break
+            self.reporters.start_generation(population.generation)
+
+        # Evaluations still running are picked up by the next run()
+        population.population = self.evaluated
+        if config.no_fitness_termination:
+            self.reporters.found_solution(config, population.generation, population.best_genome)
+        return population.best_genome
@@ -0,0 +1,233 @@
+import math
+import time
+import multiprocessing as mp
+
+from SimulationForParallel import SimulationForParallel
+from Terrain import terrain_profile
+from PopulationNetwork import PopulationNetwork
+from TerminationPolicy import TerminationPolicy
+from PhaseTimingReporter import flush_phase_timings, phase_timing_target
+from CostAwareEvaluator import RemoteTraceback, send_error
+
+# How far below the genomes that got further the dropped ones end up, in meters
+DROP_MARGIN = 1e-6
+
+
+class _Cohort:
+    """ The worker side: one chunk of genomes walking in a world of the worker, kept alive
+    between the rungs so the survivors carry on from where they stopped. """
+
+    def __init__(self, sim, genomes, config, policy, substeps, episode_steps):
+        self.sim = sim
+        self.sim.reset_walkers(len(genomes))
+        self.net = PopulationNetwork.create(genomes, config)
+        self.policy = policy
+        self.substeps = substeps
+        self.episode_steps = episode_steps
+        self.alive = list(range(len(genomes)))
+        self.steps = 0
+
+    def promote(self, survivors):
+        """ Ends the episodes of everyone not in survivors; their bodies fall asleep and cost nothing. """
+        survivors = set(survivors)
+        for i, walker in enumerate(self.sim.walkers):
+            if i not in survivors:
+                walker.terminate()
+        self.alive = [i for i in self.alive if i in survivors]
+
+    def run(self, horizon):
+        """ Continues the episode up to horizon steps, returns the fitnesses and walker steps taken. """
+        walker_steps = 0
+        while self.steps < horizon:
+            # A horizon can fall between two control steps, the motor targets are then
+            # held on into the next rung just like in one uninterrupted episode
+            held = self.steps % self.substeps
+            if held == 0:
+                substeps = min(self.substeps, self.episode_steps - self.steps)
+                for i in self.alive:
+                    walker = self.sim.walkers[i]
+                    if self.policy.should_terminate(walker, substeps):
+                        walker.terminate()
+
+                self.alive = [i for i in self.alive if not self.sim.walkers[i].terminated]
+                if not self.alive:
+                    break
+                self.sim.control(self.net.activate(self.sim.infos_array()), substeps)
+
+            steps = min(self.substeps - held, horizon - self.steps)
+            self.sim.step(steps)
+            walker_steps += len(self.alive) * steps
+            self.steps += steps
+
+        return [walker.fitness() for walker in self.sim.walkers], walker_steps
+
+
+def _worker_loop(connection, policy, substeps, terrain):
+    profile = None if terrain is None else terrain_profile(**terrain)
+    # One world per cohort, kept for the next generations like the pooled simulation
+    simulations = []
+    config = None
+    cohorts = []
+    while True:
+        message = connection.recv()
+        if message[0] == 'stop':
+            return
+        elif message[0] == 'config':
+            config = message[1]
+        elif message[0] in ('start', 'continue'):
+            try:
+                if message[0] == 'start':
+                    while len(simulations) < len(message[1]):
+                        simulations.append(SimulationForParallel(profile))
+                    cohorts = [_Cohort(sim, genomes, config, policy, substeps, message[3])
+                               for sim, genomes in zip(simulations, message[1])]
+                else:
+                    for cohort, survivors in zip(cohorts, message[1]):
+                        cohort.promote(survivors)
+                results = [cohort.run(message[2]) for cohort in cohorts]
+                flush_phase_timings()
+                connection.send(('result', [fitnesses for fitnesses, steps in results],
+                                 sum(steps for fitnesses, steps in results)))
+            except Exception as exception:
+                send_error(connection, None, exception)
+
+
+class SuccessiveHalvingEvaluator:
+    """
+    Evaluates every genome over a short episode and only lets the best continue.
+
+    All genomes walk for horizons[0] steps, then the best keep_fraction of them walk on
+    to horizons[1] and so on, until the last survivors reach horizons[-1]. The genomes are
+    split into cohorts of at most cohort_size walkers, one world each, dealt out to the
+    workers in turn; a worker keeps its cohorts between the rungs, so the survivors resume
+    from their physics state instead of starting over, and the dropped ones are put to
+    sleep.
+
+    Fitness stays in the walker's units (meters walked) so DefaultReproduction can
+    compare it across rungs: a survivor gets the fitness of its longest episode, and the
+    genomes dropped after a rung keep theirs, shifted down to DROP_MARGIN below every
+    genome that got further. The order within a rung is kept, so selection sees the same
+    ranking a full-length evaluation would have given at that horizon.
+
+    The network runs once every substeps physics steps (see SimulationForParallel.update).
+    terrain holds the keyword arguments of terrain_profile(), None walks on the ground box. An exception
+    raised in a worker is raised again by evaluate(), with the worker's traceback as cause.
+    The physics steps saved against full episodes are printed after every generation
+    when report is set.
+    """
+
+    def __init__(self, num_workers, horizons=(150, 500, 1500), keep_fraction=1 / 3, policy=None, substeps=1,
+                 terrain=None, cohort_size=250, report=True):
+        if list(horizons) != sorted(set(horizons)):
+            raise ValueError("horizons must be increasing, got {0!r}".format(horizons))
+        if not 0 < keep_fraction <= 1:
+            raise ValueError("keep_fraction must be in (0, 1], got {0!r}".format(keep_fraction))
+
+        self.num_workers = num_workers
+        self.horizons = tuple(horizons)
+        self.keep_fraction = keep_fraction
+        # Box2D crashes somewhere above 2000 walkers in one world
+        self.cohort_size = cohort_size
+        self.report = report
+
+        policy = policy if policy is not None else TerminationPolicy()
+        self.connections = []
+        self.processes = []
+        for _ in range(num_workers):
+            parent, child = mp.Pipe()
+            process = mp.Process(target=phase_timing_target(_worker_loop), args=(child, policy, substeps, terrain), daemon=True)
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.config = None
+        self.history = []
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        for connection, process in zip(self.connections, self.processes):
+            try:
+                connection.send(('stop',))
+            except OSError:
+                pass
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def evaluate(self, genomes, config):
+        if not genomes:
+            return
+        start = time.perf_counter()
+        if config is not self.config:
+            for connection in self.connections:
+                connection.send(('config', config))
+            self.config = config
+
+        # Every worker gets the same number of walkers, in as few cohorts as cohort_size allows
+        chunk_size = min(self.cohort_size, math.ceil(len(genomes) / self.num_workers))
+        chunks = [genomes[i:i + chunk_size] for i in range(0, len(genomes), chunk_size)]
+        connections = self.connections[:len(chunks)]
+        # The chunks of every worker, they stay there for all the rungs
+        assigned = [list(range(w, len(chunks), len(connections))) for w in range(len(connections))]
+        for connection, own in zip(connections, assigned):
+            connection.send(('start', [[genome for genome_id, genome in chunks[c]] for c in own],
+                             self.horizons[0], self.horizons[-1]))
+
+        # (chunk, index in chunk) of the genomes still walking
+        running = [(c, i) for c, chunk in enumerate(chunks) for i in range(len(chunk))]
+        scores = {}
+        dropped = []
+        walker_steps = 0
+
+        for rung, horizon in enumerate(self.horizons):
+            if rung > 0:
+                survivors = [[] for _ in chunks]
+                for c, i in running:
+                    survivors[c].append(i)
+                for connection, own in zip(connections, assigned):
+                    connection.send(('continue', [survivors[c] for c in own], horizon))
+
+            error = None
+            for connection, own in zip(connections, assigned):
+                message = connection.recv()
+                if message[0] == 'error':
+                    # Every worker answers first, so the next evaluate() starts clean
+                    error = error or message
+                    continue
+                cohort_fitnesses, steps = message[1:]
+                walker_steps += steps
+                for c, fitnesses in zip(own, cohort_fitnesses):
+                    for i in range(len(chunks[c])):
+                        scores[c, i] = fitnesses[i]
+
+            if error is not None:
+                raise error[2] from RemoteTraceback(error[3])
+            if rung == len(self.horizons) - 1:
+                break
+            ranked = sorted(running, key=lambda item: scores[item], reverse=True)
+            keep = max(1, math.ceil(len(ranked) * self.keep_fraction))
+            running = ranked[:keep]
+            dropped.append(ranked[keep:])
+
+        # Going back down the rungs, each group ends up below everything that outlasted it
+        floor = min(scores[item] for item in running)
+        for group in reversed(dropped):
+            if not group:
+                continue
+            shift = max(0.0, max(scores[item] for item in group) - floor + DROP_MARGIN)
+            for item in group:
+                scores[item] -= shift
+            floor = min(floor, min(scores[item] for item in group))
+
+        for c, chunk in enumerate(chunks):
+            for i, (genome_id, genome) in enumerate(chunk):
+                genome.fitness = scores[c, i]
+
+        wall = time.perf_counter() - start
+        full_steps = len(genomes) * self.horizons[-1]
+        self.history.append((wall, walker_steps, full_steps, len(running)))
+        if self.report:
+            print("Evaluation: {0:.2f} sec, {1} walker steps, {2:.1f}x fewer than full-length episodes, {3} reached {4} steps".format(
+                wall, walker_steps, full_steps / max(1, walker_steps), len(running), self.horizons[-1]))
@@ -0,0 +1,329 @@
+""" Genome evaluation spread over several machines through plain TCP connections.
+
+The coordinator is the TcpEvaluator in the training process; every machine starts workers with
+    python TcpEvaluator.py COORDINATOR_HOST:PORT --processes 4
+
+Messages are pickled, so only use it on a network where every peer is trusted.
+"""
+import argparse
+import importlib
+import os
+import pickle
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+from collections import deque, Counter
+from itertools import count
+import multiprocessing as mp
+
+from CostAwareEvaluator import RemoteTraceback
+
+HEARTBEAT_INTERVAL = 1.0
+HEADER = struct.Struct('!I')
+
+
+def _send(sock, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _receive(sock):
+    size, = HEADER.unpack(_receive_exactly(sock, HEADER.size))
+    return pickle.loads(_receive_exactly(sock, size))
+
+
+class _Worker:
+    """ The coordinator's side of one worker connection. """
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.name = '{0}:{1}'.format(*address)
+        self.buffer = bytearray()
+        self.tasks = {}
+        self.config_id = None
+        self.last_seen = time.monotonic()
+
+    def read_messages(self):
+        """ Returns the complete messages that arrived, raises ConnectionError once the worker is gone. """
+        data = self.sock.recv(1 << 16)
+        if not data:
+            raise ConnectionError("Connection closed")
+        self.buffer += data
+        self.last_seen = time.monotonic()
+
+        messages = []
+        while len(self.buffer) >= HEADER.size:
+            size, = HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < HEADER.size + size:
+                break
+            messages.append(pickle.loads(self.buffer[HEADER.size:HEADER.size + size]))
+            del self.buffer[:HEADER.size + size]
+        return messages
+
+
+class TcpEvaluator:
+    """
+    Drop-in replacement for neat.ParallelEvaluator whose workers connect over TCP.
+
+    Genomes are sent in tasks of chunk_size, every worker has up to prefetch tasks in flight
+    so it never waits for the next one, and fitness values are assigned as results stream in.
+    Workers send a heartbeat every second even while evaluating; a worker that is silent for
+    heartbeat_timeout seconds, or whose connection drops, is dropped and its tasks go back
+    into the queue. Workers may join or leave at any time.
+
+    An exception raised by the evaluation in a worker is raised again by evaluate(), with the
+    worker's traceback as cause. A task that was requeued more than max_requeues times, such
+    as a genome that crashes every worker it is sent to, makes evaluate() raise a RuntimeError.
+    """
+
+    def __init__(self, address=('0.0.0.0', 5555), chunk_size=4, prefetch=2, heartbeat_timeout=10.0,
+                 max_requeues=3):
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_requeues = max_requeues
+        self.workers = {}
+        self.server = None
+
+        self.server = socket.create_server(address)
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+        self.config = None
+        self.config_id = 0
+        self.requeued_tasks = 0
+        # Task ids are never reused, results of an aborted evaluate() that arrive later are ignored
+        self.task_ids = count()
+        self.pending = set()
+        self.requeues = Counter()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """ Tells the connected workers to exit and stops listening. """
+        for worker in list(self.workers.values()):
+            try:
+                _send(worker.sock, ('stop',))
+            except OSError:
+                pass
+            self._drop(worker, None)
+        if self.server is not None:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+
+    def _accept(self):
+        sock, address = self.server.accept()
+        sock.settimeout(self.heartbeat_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        worker = _Worker(sock, address)
+        self.workers[sock] = worker
+        self.selector.register(sock, selectors.EVENT_READ, worker)
+
+    def _drop(self, worker, queue):
+        lost = [(task_id, chunk) for task_id, chunk in worker.tasks.items() if task_id in self.pending]
+        worker.tasks.clear()
+        self.selector.unregister(worker.sock)
+        worker.sock.close()
+        del self.workers[worker.sock]
+        if not lost or queue is None:
+            return
+
+        print("Lost worker {0}, requeueing {1} tasks".format(worker.name, len(lost)))
+        queue.extendleft(lost)
+        self.requeued_tasks += len(lost)
+        self.requeues.update(task_id for task_id, chunk in lost)
+        for task_id, chunk in lost:
+            if self.requeues[task_id] > self.max_requeues:
+                self.pending.clear()
+                raise RuntimeError("Gave up on genomes {0} after losing {1} workers evaluating them".format(
+                    [genome_id for genome_id, genome in chunk], self.requeues[task_id]))
+
+    def _dispatch(self, queue):
+        for worker in list(self.workers.values()):
+            try:
+                if queue and worker.config_id != self.config_id:
+                    _send(worker.sock, ('config', self.config))
+                    worker.config_id = self.config_id
+                while queue and len(worker.tasks) < self.prefetch:
+                    task_id, chunk = queue.popleft()
+                    worker.tasks[task_id] = chunk
+                    _send(worker.sock, ('task', task_id, [genome for genome_id, genome in chunk]))
+            except OSError:
+                self._drop(worker, queue)
+
+    def evaluate(self, genomes, config):
+        if config is not self.config:
+            self.config = config
+            self.config_id += 1
+
+        chunks = [genomes[i:i + self.chunk_size] for i in range(0, len(genomes), self.chunk_size)]
+        queue = deque((next(self.task_ids), chunk) for chunk in chunks)
+        self.pending = set(task_id for task_id, chunk in queue)
+        self.requeues.clear()
+
+        # Heartbeats that arrived between generations were not read yet
+        now = time.monotonic()
+        for worker in self.workers.values():
+            worker.last_seen = now
+
+        announced = False
+        while self.pending:
+            self._dispatch(queue)
+            if not self.workers and not announced:
+                print("Waiting for workers to connect to {0}:{1}".format(*self.address))
+                announced = True
+
+            for key, _ in self.selector.select(timeout=HEARTBEAT_INTERVAL):
+                if key.data is None:
+                    self._accept()
+                    continue
+
+                worker = key.data
+                if worker.sock not in self.workers:
+                    continue
+                try:
+                    messages = worker.read_messages()
+                except OSError:
+                    self._drop(worker, queue)
+                    continue
+
+                for message in messages:
+                    if message[0] not in ('result', 'error'):
+                        continue
+                    task_id = message[1]
+                    chunk = worker.tasks.pop(task_id, None)
+                    if chunk is None or task_id not in self.pending:
+                        continue
+                    if message[0] == 'error':
+                        # The tasks still out are ignored when they come back
+                        self.pending.clear()
+                        raise message[2] from RemoteTraceback(message[3])
+                    for (genome_id, genome), fitness in zip(chunk, message[2]):
+                        genome.fitness = fitness
+                    self.pending.discard(task_id)
+
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if now - worker.last_seen > self.heartbeat_timeout:
+                    self._drop(worker, queue)
+
+
+def _heartbeat(sock, lock, stopped):
+    while not stopped.wait(HEARTBEAT_INTERVAL):
+        try:
+            with lock:
+                _send(sock, ('heartbeat',))
+        except OSError:
+            return
+
+
+def connect(address, retry_seconds=60.0):
+    """ Connects to the coordinator, retrying while it is not up yet. """
+    deadline = time.monotonic() + retry_seconds
+    while True:
+        try:
+            return socket.create_connection(address)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _send_error(sock, task_id, exception):
+    """ Sends the exception being handled and its traceback to the coordinator. """
+    text = traceback.format_exc()
+    try:
+        pickle.dumps(exception)
+    except Exception:
+        # Not every exception pickles
+        exception = RuntimeError(repr(exception))
+    _send(sock, ('error', task_id, exception, text))
+
+
+def run_worker(address, eval_function, batched=False, retry_seconds=60.0):
+    """ Evaluates tasks from the coordinator at address until it says stop or goes away.
+
+    eval_function(genome, config) returns one fitness, or with batched
+    eval_function(genomes, config) returns a list of them, like for ChunkedEvaluator.
+    An exception it raises is sent to the coordinator, the worker carries on.
+    """
+    sock = connect(address, retry_seconds)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    lock = threading.Lock()
+    stopped = threading.Event()
+    threading.Thread(target=_heartbeat, args=(sock, lock, stopped), daemon=True).start()
+
+    config = None
+    try:
+        while True:
+            message = _receive(sock)
+            if message[0] == 'stop':
+                return
+            elif message[0] == 'config':
+                config = message[1]
+            elif message[0] == 'task':
+                task_id, genomes = message[1], message[2]
+                try:
+                    if batched:
+                        fitnesses = list(eval_function(genomes, config))
+                    else:
+                        fitnesses = [eval_function(genome, config) for genome in genomes]
+                except Exception as exception:
+                    with lock:
+                        _send_error(sock, task_id, exception)
+                    continue
+                with lock:
+                    _send(sock, ('result', task_id, fitnesses))
+    except ConnectionError:
+        pass
+    finally:
+        stopped.set()
+        sock.close()
+
+
+def load_function(spec):
+    """ 'module:function' to the function. """
+    module_name, function_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _worker_process(address, spec, batched, retry_seconds):
+    run_worker(address, load_function(spec), batched, retry_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Starts TcpEvaluator workers on this machine.")
+    parser.add_argument('coordinator', help="HOST:PORT of the training process")
+    parser.add_argument('--processes', type=int, default=mp.cpu_count())
+    parser.add_argument('--function', default='main:eval_genome', help="module:function evaluating one genome")
+    parser.add_argument('--batched', action='store_true', help="the function takes a list of genomes instead")
+    parser.add_argument('--retry', type=float, default=60.0, help="seconds to keep trying to reach the coordinator")
+    args = parser.parse_args()
+
+    host, port = args.coordinator.rsplit(':', 1)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    processes = [mp.Process(target=_worker_process, args=((host, int(port)), args.function, args.batched, args.retry))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -0,0 +1,209 @@
+import os
+import json
+import queue
+import threading
+from multiprocessing import util
+
+import numpy as np
+
+from WalkerInfo import FIELDS, H_DISTANCE
+
+EFFORT_FIELDS = ('lHipEffort', 'rHipEffort', 'lKneeEffort', 'rKneeEffort')
+# Every row is one walker at one control step. The keys are exact integers: the process that
+# recorded the row, its episode number in that process, the step, the walker's index in its
+# world and its genome's key (-1 if not known). The values are float32, with the efforts
+# clamped like Walker.update does
+KEY_COLUMNS = ('pid', 'episode', 'step', 'walker', 'genome_key')
+VALUE_COLUMNS = FIELDS + EFFORT_FIELDS
+PID, EPISODE, STEP, WALKER, GENOME_KEY = range(len(KEY_COLUMNS))
+EFFORT_START = len(FIELDS)
+
+
+def telemetry_files(directory):
+    """ The chunk files in the directory, in the order load_telemetry() reads them. """
+    return sorted(name for name in os.listdir(directory) if name.startswith('telemetry-') and name.endswith('.npz'))
+
+
+def load_telemetry(directory):
+    """ Returns {column: array} with the rows of every chunk in the directory, chunk by chunk.
+
+    The 'file' column holds the index of the row's chunk in telemetry_files(directory).
+    """
+    with open(os.path.join(directory, 'columns.json')) as f:
+        columns = json.load(f)
+    keys, values, files = [], [], []
+    for i, name in enumerate(telemetry_files(directory)):
+        with np.load(os.path.join(directory, name)) as chunk:
+            keys.append(chunk['keys'])
+            values.append(chunk['values'])
+        files.append(np.full(keys[-1].shape[1], i, dtype=np.int32))
+    if not files:
+        keys = [np.zeros((len(columns['keys']), 0), dtype=np.int64)]
+        values = [np.zeros((len(columns['values']), 0), dtype=np.float32)]
+        files = [np.zeros(0, dtype=np.int32)]
+    data = dict(zip(columns['keys'], np.concatenate(keys, axis=1)))
+    data.update(zip(columns['values'], np.concatenate(values, axis=1)))
+    data['file'] = np.concatenate(files)
+    return data
+
+
+class TelemetryRecorder:
+    """ Copies per-step walker state into a preallocated ring of chunks, which a background
+    thread writes out as .npz files holding the keys and the values as (columns, rows)
+    arrays, one contiguous array per column.
+
+    record() only copies rows into memory; turning them into columns and clamping the
+    efforts is left to the writer thread. When the writer falls so far behind that all
+    num_chunks chunks are waiting for the disk, rows are dropped and counted in
+    self.dropped instead of blocking the simulation.
+
+    every: record only every Nth step of an episode
+    top_k: record only the top_k walkers furthest ahead at each recorded step, None records all
+
+    Chunk files are named after the process, so the workers of one run can share a directory.
+    """
+
+    def __init__(self, directory, every=1, top_k=None, chunk_rows=16384, num_chunks=4):
+        self.directory = directory
+        self.every = every
+        self.top_k = top_k
+        self.chunk_rows = chunk_rows
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'columns.json'), 'w') as f:
+            json.dump({'keys': KEY_COLUMNS, 'values': VALUE_COLUMNS}, f)
+
+        self.keys = np.empty((num_chunks, chunk_rows, len(KEY_COLUMNS)), dtype=np.int64)
+        self.chunks = np.empty((num_chunks, chunk_rows, len(VALUE_COLUMNS)), dtype=np.float32)
+        self.free = queue.Queue()
+        for c in range(num_chunks):
+            self.free.put(c)
+        self.filled = queue.Queue()
+        self.current = self.free.get()
+        self.position = 0
+        self.pid = os.getpid()
+        self.episode = -1
+        self.genome_keys = np.zeros(0, dtype=np.int64)
+        self.chunks_written = 0
+        self.rows = 0
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def _write_loop(self):
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            c, rows = item
+            keys = self.keys[c, :rows].T.copy()
+            columns = self.chunks[c, :rows].T.copy()
+            self.free.put(c)
+            # The networks' outputs, clamped like Walker.update does
+            columns[EFFORT_START:] = np.clip(columns[EFFORT_START:] * 2 - 1, -1, 1)
+            filename = 'telemetry-{0}-{1:05d}.npz'.format(self.pid, self.chunks_written)
+            np.savez(os.path.join(self.directory, filename), keys=keys, values=columns)
+            self.chunks_written += 1
+
+    def _make_room(self):
+        """ Queues a full chunk for writing and takes a free one; False if there is none. """
+        if self.current is not None:
+            if self.position < self.chunk_rows:
+                return True
+            self.filled.put((self.current, self.position))
+            self.current = None
+        try:
+            self.current = self.free.get_nowait()
+        except queue.Empty:
+            return False
+        self.position = 0
+        return True
+
+    def begin_episode(self, genome_keys, episode=None):
+        """ Starts numbering the steps of a new episode, returns its number.
+
+        genome_keys: the key of every walker's genome, by index in the state buffer
+        """
+        self.episode = self.episode + 1 if episode is None else episode
+        self.genome_keys = np.asarray(genome_keys, dtype=np.int64)
+        return self.episode
+
+    def record(self, step, states, efforts, walkers=None):
+        """ Records the walkers (indices into states, all by default) at the given step.
+
+        states: the (num_walkers, STATE_SIZE) state buffer, efforts the network outputs
+        for the same walkers, one row each, as applied from this step on
+        """
+        if step % self.every:
+            return
+
+        if walkers is None and len(states) == 1:
+            # A single walker, as in the ParallelEvaluator workers: one row, no temporaries
+            if not self._make_room():
+                self.dropped += 1
+                return
+            self.keys[self.current, self.position] = (self.pid, self.episode, step, 0, self.genome_keys[0])
+            row = self.chunks[self.current, self.position]
+            row[:EFFORT_START] = states[0]
+            row[EFFORT_START:] = efforts
+            self.position += 1
+            self.rows += 1
+            return
+
+        walkers = np.arange(len(states)) if walkers is None else np.asarray(walkers)
+        if self.top_k is not None and len(walkers) > self.top_k:
+            ahead = np.argpartition(-states[walkers, H_DISTANCE], self.top_k)[:self.top_k]
+            walkers = np.sort(walkers[ahead])
+        efforts = np.asarray(efforts).reshape(-1, len(EFFORT_FIELDS))
+
+        done = 0
+        while done < len(walkers):
+            if not self._make_room():
+                self.dropped += len(walkers) - done
+                return
+            count = min(len(walkers) - done, self.chunk_rows - self.position)
+            rows = walkers[done:done + count]
+            keys = self.keys[self.current, self.position:self.position + count]
+            keys[:, PID] = self.pid
+            keys[:, EPISODE] = self.episode
+            keys[:, STEP] = step
+            keys[:, WALKER] = rows
+            keys[:, GENOME_KEY] = self.genome_keys[rows]
+            block = self.chunks[self.current, self.position:self.position + count]
+            block[:, :EFFORT_START] = states[rows]
+            block[:, EFFORT_START:] = efforts[rows]
+            self.position += count
+            self.rows += count
+            done += count
+
+    def close(self):
+        """ Writes what is left and waits for the writer. """
+        if self.thread is None:
+            return
+        if self.current is not None and self.position:
+            self.filled.put((self.current, self.position))
+            self.current = None
+        self.filled.put(None)
+        self.thread.join()
+        self.thread = None
+
+
+_recorder = None
+
+def telemetry_recorder(directory, every=1, top_k=None):
+    """ Returns this process' TelemetryRecorder, started on first use and closed when the process exits. """
+    global _recorder
+    if _recorder is None:
+        _recorder = TelemetryRecorder(directory, every, top_k)
+        # Pool workers leave through os._exit, which skips atexit but runs these
+        util.Finalize(_recorder, _recorder.close, exitpriority=10)
+    return _recorder
+
+
+def _forget_recorder():
+    # A forked worker starts its own recorder, the parent's writer thread is not running in it
+    global _recorder
+    _recorder = None
+
+
+os.register_at_fork(after_in_child=_forget_recorder)
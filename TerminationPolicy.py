@@ -0,0 +1,38 @@
+class TerminationPolicy:
+    """ Decides when a walker's episode is over.
+
+    min_head_height: the walker is dead once its head drops below this height (see Walker.is_dead)
+    stall_steps: steps without min_progress meters of forward progress before giving up, None disables it
+    max_torso_angle: tilt of the torso in radians that counts as tipped over, None disables it
+    """
+
+    def __init__(self, min_head_height=0.025, stall_steps=None, min_progress=0.05, max_torso_angle=None):
+        self.min_head_height = min_head_height
+        self.stall_steps = stall_steps
+        self.min_progress = min_progress
+        self.max_torso_angle = max_torso_angle
+
+    def should_terminate(self, walker, steps=1):
+        """ Called before the walker is controlled for the next steps physics steps;
+        also updates its progress tracking. """
+        if walker.terminated:
+            return True
+
+        if walker.is_dead(self.min_head_height):
+            return True
+
+        info = walker.info()
+        if self.max_torso_angle is not None and abs(info.torsoAngle) > self.max_torso_angle:
+            return True
+
+        if self.stall_steps is not None:
+            if info.hDistance >= walker.best_distance + self.min_progress:
+                walker.best_distance = info.hDistance
+                walker.steps_since_progress = 0
+            else:
+                walker.steps_since_progress += steps
+            if walker.steps_since_progress > self.stall_steps:
+                return True
+
+        return False
+
@@ -0,0 +1,157 @@
+import math
+import random
+from functools import lru_cache
+
+from Box2D import b2PolygonShape
+
+GROUND_COLOR = (0, 150, 255)
+# How far the segments reach below the lower of their two corners
+DEPTH = 0.5
+
+
+class TerrainProfile:
+    """ The ground's surface as segments of segment_length meters, generated from a seed.
+
+    The first flat_start meters are flat at height 0 like the old ground box, and so is
+    everything behind x = 0. After that every segment climbs or falls with a slope of up
+    to max_slope, and starts up to max_step higher or lower than the last one ended.
+    Segments are generated in order and kept, so the terrain only depends on the seed and
+    the parameters, not on which segments were asked for first.
+    """
+
+    def __init__(self, seed=0, segment_length=2.0, max_slope=0.0, max_step=0.0, flat_start=10.0):
+        self.seed = seed
+        self.segment_length = segment_length
+        self.max_slope = max_slope
+        self.max_step = max_step
+        self.flat_start = flat_start
+        self.random = random.Random(seed)
+        # (height at the start, height at the end) of every segment generated so far
+        self.heights = []
+
+    def _generate(self):
+        index = len(self.heights)
+        if (index + 1) * self.segment_length <= self.flat_start:
+            self.heights.append((0.0, 0.0))
+            return
+        start = self.heights[-1][1] if self.heights else 0.0
+        start += self.random.uniform(-self.max_step, self.max_step)
+        self.heights.append((start, start + self.segment_length * self.random.uniform(-self.max_slope, self.max_slope)))
+
+    def index(self, x):
+        """ The segment under x. """
+        return math.floor(x / self.segment_length)
+
+    def segment(self, index):
+        """ The segment's center x and its corners relative to (center x, 0), counter-clockwise. """
+        if index < 0:
+            start, end = 0.0, 0.0
+        else:
+            while len(self.heights) <= index:
+                self._generate()
+            start, end = self.heights[index]
+        half = self.segment_length / 2
+        bottom = min(start, end) - DEPTH
+        return (index + 0.5) * self.segment_length, ((-half, bottom), (half, bottom), (half, end), (-half, start))
+
+
+@lru_cache(maxsize=None)
+def terrain_profile(seed=0, segment_length=2.0, max_slope=0.0, max_step=0.0, flat_start=10.0):
+    """ This process' TerrainProfile for the parameters; every simulation in the process shares it. """
+    return TerrainProfile(seed, segment_length, max_slope, max_step, flat_start)
+
+
+class Terrain:
+    """ Keeps the segments of a TerrainProfile in a world as fixtures of one static body,
+    from behind the rearmost running walker to ahead of the walker furthest ahead.
+
+    reset() builds the segments from behind + ahead meters behind the spawn to reach meters
+    ahead of it, and they stay unchanged as long as every walker is within them. The ground
+    is then a fixed set of fixtures of a body rebuilt at every reset like the old ground box,
+    and a walker's episode is the same whoever shares the world. Segments of their own
+    bodies would not do: continuous collision keeps per-body state that the other walkers'
+    impacts move along, and contacts with a segment created or destroyed mid-episode are
+    found in an order that depends on when the other walkers got there.
+
+    Once a walker needs ground outside of them, update() streams: it creates the segments
+    that came within ahead meters of the front and destroys the ones more than behind meters
+    behind the back, so the world holds a bounded number of ground fixtures however far the
+    walkers go. From then on the episode depends on the other walkers, like the ground box's
+    end would have. All walkers of the world share the segments.
+    """
+
+    def __init__(self, world, profile, ahead=10.0, behind=4.0, reach=100.0, friction=0.5, restitution=0.8):
+        self.world = world
+        self.profile = profile
+        self.ahead = ahead
+        self.behind = behind
+        # As far as the ground box went
+        self.reach = reach
+        self.friction = friction
+        self.restitution = restitution
+        self.body = None
+        self.segments = {}
+        # (color and shapes, position, radius) of every segment, the way Simulation draws bodies
+        self.outlines = {}
+        self.first = 0
+        self.last = -1
+        # Whether update() created or destroyed segments since the last reset()
+        self.streamed = False
+
+    def _create(self, index):
+        x, vertices = self.profile.segment(index)
+        self.segments[index] = self.body.CreateFixture(
+            shape=b2PolygonShape(vertices=[(vx + x, vy) for vx, vy in vertices]),
+            friction=self.friction, restitution=self.restitution)
+        # Nothing of the segment is further from its center than the radius, for culling
+        self.outlines[index] = ((GROUND_COLOR, (('polygon', vertices),)), (x, 0.0),
+                                max(math.hypot(vx, vy) for vx, vy in vertices))
+
+    def _destroy(self, index):
+        self.body.DestroyFixture(self.segments.pop(index))
+        del self.outlines[index]
+
+    def clear(self):
+        if self.body is not None:
+            self.world.DestroyBody(self.body)
+            self.body = None
+        self.segments = {}
+        self.outlines = {}
+        self.first = 0
+        self.last = -1
+
+    def reset(self, x):
+        """ Builds the ground for an episode starting at x anew, in index order, like for a new world. """
+        self.clear()
+        self.body = self.world.CreateStaticBody(position=(0, 0), userData={'terrain': True})
+        # A walker's rearmost point starts out just behind x, and may fall back a bit further
+        self.first = self.profile.index(x - self.behind - self.ahead)
+        self.last = self.profile.index(x + max(self.ahead, self.reach))
+        for index in range(self.first, self.last + 1):
+            self._create(index)
+        self.streamed = False
+
+    def update(self, back_x, front_x):
+        """ Streams the segments for walkers between back_x and front_x, returns whether any was destroyed. """
+        first = self.profile.index(back_x - self.behind)
+        last = max(first, self.profile.index(front_x + self.ahead))
+        if first == self.first and last == self.last:
+            return False
+        if not self.streamed and self.first <= first and last <= self.last:
+            # Everyone is still on the segments reset() built
+            return False
+        self.streamed = True
+        destroyed = self.first < first or self.last > last
+        while self.last < last:
+            self.last += 1
+            self._create(self.last)
+        while self.first > first:
+            self.first -= 1
+            self._create(self.first)
+        while self.first < first:
+            self._destroy(self.first)
+            self.first += 1
+        while self.last > last:
+            self._destroy(self.last)
+            self.last -= 1
+        return destroyed
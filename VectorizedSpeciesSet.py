@@ -0,0 +1,212 @@
+import numpy as np
+import neat
+from neat.species import Species
+
+
+class _GeneTable:
+    """ One kind of gene (nodes or connections) of every genome, sorted by gene key.
+
+    For every gene key, genomes[ptr[g]:ptr[g + 1]] are the indices of the genomes that
+    have it and values[:, ptr[g]:ptr[g + 1]] their attributes; counts holds how many
+    genes of the kind every genome has.
+    """
+
+    def __init__(self, genes_per_genome, attributes, num_attributes):
+        self.ids = {}
+        rows = []
+        for index, genes in enumerate(genes_per_genome):
+            for key, gene in genes.items():
+                gid = self.ids.setdefault(key, len(self.ids))
+                rows.append((gid, index) + attributes(gene))
+
+        self.counts = np.array([len(genes) for genes in genes_per_genome], dtype=np.float64)
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), 2 + num_attributes)
+        order = np.argsort(table[:, 0], kind='stable')
+        table = table[order]
+        self.ptr = np.searchsorted(table[:, 0], np.arange(len(self.ids) + 1))
+        self.genomes = table[:, 1].astype(np.intp)
+        self.values = table[:, 2:].T.copy()
+
+    def distance(self, genes, attributes, gene_distance, disjoint_coefficient):
+        """ Stock DefaultGenome.distance's share of this gene kind, from a genome with the given
+        genes to all genomes, summed in the order of genes like the stock loop does. """
+        total = np.zeros(len(self.counts))
+        shared = np.zeros(len(self.counts))
+        for key, gene in genes.items():
+            gid = self.ids.get(key)
+            if gid is None:
+                continue
+            start, stop = self.ptr[gid], self.ptr[gid + 1]
+            genomes = self.genomes[start:stop]
+            total[genomes] += gene_distance(attributes(gene), self.values[:, start:stop])
+            shared[genomes] += 1
+
+        disjoint = len(genes) + self.counts - 2 * shared
+        most = np.maximum(len(genes), self.counts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            distance = (total + disjoint_coefficient * disjoint) / most
+        # Nothing to compare when neither genome has genes of the kind
+        return np.where(most > 0, distance, 0.0)
+
+
+class VectorizedSpeciesSet(neat.DefaultSpeciesSet):
+    """
+    DefaultSpeciesSet whose speciate() computes the genome distances in vectorized batches.
+
+    The population is encoded once per generation as gene tables sorted by gene key, and
+    a representative's distance to every genome takes one pass over its own genes, with
+    compatibility_disjoint_coefficient and compatibility_weight_coefficient applied like
+    DefaultGenome.distance does. Every distance is bit-identical to the stock one: the
+    terms are added in the same order, and a pair that the stock GenomeDistanceCache would
+    have answered from the other direction gets the value of that direction. The genomes
+    are visited in the same order as well, so the species assignments are the same.
+
+    Needs the stock DefaultGenome with its node and connection gene attributes.
+    """
+
+    def __getstate__(self):
+        # The gene tables are rebuilt every generation, keep them out of the checkpoints
+        state = dict(self.__dict__)
+        for name in ('codes', 'nodes', 'connections'):
+            state.pop(name, None)
+        return state
+
+    def _encode(self, genome_config, population):
+        self.codes = {}
+        genomes = list(population.values())
+        self.nodes = _GeneTable([g.nodes for g in genomes], self._node_attributes, 4)
+        self.connections = _GeneTable([g.connections for g in genomes], self._connection_attributes, 2)
+        self.weight_coefficient = genome_config.compatibility_weight_coefficient
+        self.disjoint_coefficient = genome_config.compatibility_disjoint_coefficient
+
+    def _code(self, name):
+        return self.codes.setdefault(name, len(self.codes))
+
+    def _node_attributes(self, gene):
+        return gene.bias, gene.response, self._code(gene.activation), self._code(gene.aggregation)
+
+    def _connection_attributes(self, gene):
+        return gene.weight, float(gene.enabled)
+
+    def _node_distance(self, a, b):
+        d = np.abs(a[0] - b[0]) + np.abs(a[1] - b[1])
+        d += a[2] != b[2]
+        d += a[3] != b[3]
+        return d * self.weight_coefficient
+
+    def _connection_distance(self, a, b):
+        d = np.abs(a[0] - b[0])
+        d += a[1] != b[1]
+        return d * self.weight_coefficient
+
+    def distances(self, genome):
+        """ genome.distance(other, genome_config) to every genome of the encoded population. """
+        return (self.nodes.distance(genome.nodes, self._node_attributes, self._node_distance,
+                                    self.disjoint_coefficient) +
+                self.connections.distance(genome.connections, self._connection_attributes,
+                                          self._connection_distance, self.disjoint_coefficient))
+
+    def speciate(self, config, population, generation):
+        """ Same as DefaultSpeciesSet.speciate, see the class documentation. """
+        assert isinstance(population, dict)
+
+        compatibility_threshold = self.species_set_config.compatibility_threshold
+        keys = list(population)
+        index = dict((gid, i) for i, gid in enumerate(keys))
+        self._encode(config.genome_config, population)
+
+        # The stock GenomeDistanceCache keeps the value of a pair from its first computation,
+        # made from either side. The old representatives' rows are kept with their order and
+        # the genomes they covered, for the pairs whose first computation was the other way
+        old_rows = {}
+        visited = []
+
+        # Find the best representatives for each existing species.
+        unspeciated = set(population)
+        new_representatives = {}
+        new_members = {}
+        for order, (sid, s) in enumerate(self.species.items()):
+            rep_key = s.representative.key
+            candidates = [index[gid] for gid in unspeciated]
+            row = self.distances(s.representative)
+            if rep_key in index:
+                for old_key, (old_order, values, covered) in old_rows.items():
+                    if old_key in unspeciated and covered[index[rep_key]]:
+                        row[index[old_key]] = values[index[rep_key]]
+            covered = np.zeros(len(keys), dtype=bool)
+            covered[candidates] = True
+            old_rows[rep_key] = (order, row, covered)
+            visited.append(row[candidates])
+
+            # The new representative is the genome closest to the current representative.
+            new_rep = keys[candidates[int(np.argmin(row[candidates]))]]
+            new_representatives[sid] = new_rep
+            new_members[sid] = [new_rep]
+            unspeciated.remove(new_rep)
+
+        # Distances from every representative, in new_representatives' order, to every genome
+        rep_sids = list(new_representatives)
+        matrix = np.empty((max(16, 2 * len(rep_sids)), len(keys)))
+        for r, rid in enumerate(new_representatives.values()):
+            matrix[r] = self.distances(population[rid])
+
+        # Partition population into species based on genetic similarity.
+        while unspeciated:
+            gid = unspeciated.pop()
+            g = index[gid]
+
+            column = matrix[:len(rep_sids), g].copy()
+            if gid in old_rows:
+                order, values, covered = old_rows[gid]
+                for r, rid in enumerate(new_representatives.values()):
+                    # Unless the representative's own old row reached this genome before
+                    if covered[index[rid]] and not (rid in old_rows and old_rows[rid][0] < order):
+                        column[r] = values[index[rid]]
+            visited.append(column)
+
+            close = np.flatnonzero(column < compatibility_threshold)
+            if len(close):
+                sid = rep_sids[close[int(np.argmin(column[close]))]]
+                new_members[sid].append(gid)
+            else:
+                # No species is similar enough, create a new species, using
+                # this genome as its representative.
+                sid = next(self.indexer)
+                new_representatives[sid] = gid
+                new_members[sid] = [gid]
+                if len(rep_sids) == len(matrix):
+                    matrix = np.concatenate([matrix, np.empty_like(matrix)])
+                matrix[len(rep_sids)] = self.distances(population[gid])
+                rep_sids.append(sid)
+
+        # Update species collection based on new speciation.
+        self.genome_to_species = {}
+        for sid, rid in new_representatives.items():
+            s = self.species.get(sid)
+            if s is None:
+                s = Species(sid, generation)
+                self.species[sid] = s
+
+            members = new_members[sid]
+            for gid in members:
+                self.genome_to_species[gid] = sid
+
+            member_dict = dict((gid, population[gid]) for gid in members)
+            s.update(population[rid], member_dict)
+
+        # Over every distance looked at, the stock mean counts each pair once
+        distances = np.concatenate(visited)
+        if len(distances):
+            self.reporters.info('Mean genetic distance {0:.3f}, standard deviation {1:.3f}'.format(
+                distances.mean(), distances.std()))
+
+
+def use_vectorized_speciation(population):
+    """ Moves a neat.Population, also one restored from a checkpoint, to VectorizedSpeciesSet. """
+    old = population.species
+    species_set = VectorizedSpeciesSet(old.species_set_config, old.reporters)
+    species_set.indexer = old.indexer
+    species_set.species = old.species
+    species_set.genome_to_species = old.genome_to_species
+    population.species = species_set
+    population.config.species_set_type = VectorizedSpeciesSet
@@ -1,8 +1,10 @@
 from Box2D import b2PolygonShape, b2CircleShape, b2RevoluteJoint
-from WalkerInfo import WalkerInfo
+from WalkerInfo import WalkerInfo, STATE_SIZE, HEAD_ALTITUDE, H_DISTANCE
+import numpy as np
 import math
 
 BRAKE_ON_NO_INPUT = False
+SPAWN_DETOUR = 1000.0
 max_height_score = 0.0
 
 class Walker:
@@ -10,34 +12,59 @@ class Walker:
     MAX_JOINT_TORQUE = 12
     global max_height_score
 
-    def __init__(self, position, simulation):
+    def __init__(self, position, simulation, state=None):
         self.simulation = simulation
+        self._reset_episode()
+        self._build(position)
+        self.bind_state(np.zeros(STATE_SIZE) if state is None else state)
+
+    # The simulation owns one (n_walkers, STATE_SIZE) buffer and hands every
+    # walker its row; refresh_state() fills it once per physics step
+    def bind_state(self, state):
+        self.state = state
+        self._info = WalkerInfo(state)
+        self.refresh_state()
+
+    def _reset_episode(self):
         self.dead = False
+        self.terminated = False
+        self.final_fitness = None
 
         self.energySpent = 0.0
-        self._build(position)
+        self._height_score = 0.0
+        self._total_time = 0.0
+
+        # Progress tracking for TerminationPolicy
+        self.best_distance = 0.0
+        self.steps_since_progress = 0
 
         self.left_leg_forward = 1
         self.right_leg_forward = 1
 
-    def is_dead(self):
+    def is_dead(self, min_head_height=0.025):
         if self.dead:
             return True
 
-        info = self.info()
-        head_height = (info.headAltitude - 0.3)
-        if head_height < 0.025:
+        head_height = (self.state[HEAD_ALTITUDE] - 0.3)
+        if head_height < min_head_height:
             self.dead = True
         
         return self.dead
 
+    # Ends the walker's episode: its fitness is frozen and its bodies are put
+    # to sleep, so the world stops simulating them
+    def terminate(self):
+        if self.terminated:
+            return
+        self.final_fitness = self.fitness()
+        self.terminated = True
+        for body in self._bodies():
+            body.awake = False
+
     def _build(self, position):
         x, y = position
         self.startX = x
 
-        self._height_score = 0.0
-        self._total_time = 0.0
-
         HEAD_POS = (x, y + 1)
 
         HIP_RADIUS = 0.0
@@ -106,6 +133,11 @@ class Walker:
             upperAngle=KNEE_FORWARD_LIMIT,
         )
 
+        self._reset_motors()
+
+        self._spawn_pose = [(tuple(body.position), body.angle) for body in self._bodies()]
+
+    def _reset_motors(self):
         for joint in self._joints():
             joint.motorEnabled = True
             joint.motorSpeed = 0
@@ -114,6 +146,33 @@ class Walker:
             else:
                 joint.maxMotorTorque = 0
 
+    # Puts the walker back into its spawn pose, reusing its bodies and joints.
+    # The simulation has to step the next frame without warm starting for the
+    # result to match a freshly built walker (see SimulationForParallel.update).
+    def reset(self):
+        self._reset_episode()
+
+        for body, (position, angle) in zip(self._bodies(), self._spawn_pose):
+            # Going to sleep zeroes velocities, forces and the sleep timer
+            body.awake = False
+            # Jumping far away first makes the broadphase re-fit the proxies'
+            # fat AABBs around the spawn pose, just like fresh proxies
+            body.transform = ((position[0], position[1] + SPAWN_DETOUR), angle)
+            body.transform = (position, angle)
+            body.awake = True
+
+        self._reset_motors()
+        self.refresh_state()
+
+    # Takes the walker out of the episode: it sleeps away from the others and
+    # costs nothing per step until the next reset()
+    def park(self):
+        self.dead = True
+        self.terminated = True
+        for body, (position, angle) in zip(self._bodies(), self._spawn_pose):
+            body.awake = False
+            body.transform = ((position[0], position[1] + SPAWN_DETOUR), angle)
+
     def _create_limb(self, posA, posB, radius=0.1, width=0.1, friction=0.5, color=(0, 150, 255)):
         dx, dy = posB[0] - posA[0], posB[1] - posA[1]
         length = math.sqrt(dx * dx + dy * dy)
@@ -160,25 +219,29 @@ class Walker:
             joint.motorSpeed = self.MAX_JOINT_SPEED * (1 if clamped_effort > 0 else -1)
             joint.maxMotorTorque = abs(float(clamped_effort)) * self.MAX_JOINT_TORQUE
 
-    def info(self):
+    def refresh_state(self):
         distance = min(b.position[0] for b in self._bodies())
         # distance = self.torso.position[0]
-        return WalkerInfo(
-            headAltitude=self.torso.position[1],
-            hDistance=distance-self.startX,
-            hSpeed=self.torso.linearVelocity[0],
-            torsoAngle=self.torso.angle,
-            lHipAngle=self.left_hip_joint.angle,
-            rHipAngle=self.right_hip_joint.angle,
-            lKneeAngle=self.left_knee_joint.angle,
-            rKneeAngle=self.right_knee_joint.angle,
-            energySpent=self.energySpent,
-            lHipSpeed=self.left_hip_joint.speed,
-            rHipSpeed=self.right_hip_joint.speed,
-            lKneeSpeed=self.left_knee_joint.speed,
-            rKneeSpeed=self.right_knee_joint.speed,
+        torso = self.torso
+        self.state[:] = (
+            torso.position[1],
+            distance-self.startX,
+            torso.linearVelocity[0],
+            torso.angle,
+            self.left_hip_joint.angle,
+            self.right_hip_joint.angle,
+            self.left_knee_joint.angle,
+            self.right_knee_joint.angle,
+            self.left_hip_joint.speed,
+            self.right_hip_joint.speed,
+            self.left_knee_joint.speed,
+            self.right_knee_joint.speed,
+            self.energySpent,
         )
 
+    def info(self):
+        return self._info
+
     # def fitness(self):
     #     info = self.info()
 
@@ -192,12 +255,13 @@ class Walker:
 
     #     return fitness
     def fitness(self):
-            is_tipped_over = self.torso.position[1] < 0.5
+            if self.final_fitness is not None:
+                return self.final_fitness
+
+            is_tipped_over = self.state[HEAD_ALTITUDE] < 0.5
             is_left_knee_on_ground = self.left_upper.position[1] < 0.2
             is_right_knee_on_ground = self.right_upper.position[1] < 0.2
 
-            info = self.info()
-
             multiplier = 1.0
             if is_tipped_over:
                 multiplier = 0.05
@@ -207,7 +271,7 @@ class Walker:
                 multiplier = 0.5
 
             # lead_deviation = abs(info.leftLegLead - 0.5)
-            fitness = multiplier * info.hDistance  + 0.05 * info.energySpent # - 0.5 * lead_deviation
+            fitness = multiplier * self.state[H_DISTANCE]  + 0.05 * self.energySpent # - 0.5 * lead_deviation
             return fitness
 
     # If possible just create new world for walkers    
@@ -1,33 +1,61 @@
-from dataclasses import dataclass
+FIELDS = (
+    'headAltitude',
+    'hDistance',
+    'hSpeed',
+    'torsoAngle',
+    'lHipAngle',
+    'rHipAngle',
+    'lKneeAngle',
+    'rKneeAngle',
+    'lHipSpeed',
+    'rHipSpeed',
+    'lKneeSpeed',
+    'rKneeSpeed',
+    'energySpent',
+)
+
+(HEAD_ALTITUDE, H_DISTANCE, H_SPEED, TORSO_ANGLE,
+ L_HIP_ANGLE, R_HIP_ANGLE, L_KNEE_ANGLE, R_KNEE_ANGLE,
+ L_HIP_SPEED, R_HIP_SPEED, L_KNEE_SPEED, R_KNEE_SPEED,
+ ENERGY_SPENT) = range(len(FIELDS))
+
+STATE_SIZE = len(FIELDS)
+# The network sees every channel except energySpent, which is kept last
+OBSERVATION_SIZE = ENERGY_SPENT
+
+
+def _field(index):
+    return property(lambda self: self.row[index])
+
 
-@dataclass
 class WalkerInfo:
-    headAltitude: float
-    hDistance: float
-    hSpeed: float
-    torsoAngle: float
-    lHipAngle: float
-    rHipAngle: float
-    lKneeAngle: float
-    rKneeAngle: float
-    energySpent: float
-    lHipSpeed: float
-    rHipSpeed: float
-    lKneeSpeed: float
-    rKneeSpeed: float
+    """ Zero-copy view over one walker's row of the simulation's state buffer.
+
+    The row is refreshed after every physics step, so the values always describe the
+    current state; copy the row to keep a snapshot.
+    """
+    __slots__ = ('row',)
+
+    headAltitude = _field(HEAD_ALTITUDE)
+    hDistance = _field(H_DISTANCE)
+    hSpeed = _field(H_SPEED)
+    torsoAngle = _field(TORSO_ANGLE)
+    lHipAngle = _field(L_HIP_ANGLE)
+    rHipAngle = _field(R_HIP_ANGLE)
+    lKneeAngle = _field(L_KNEE_ANGLE)
+    rKneeAngle = _field(R_KNEE_ANGLE)
+    lHipSpeed = _field(L_HIP_SPEED)
+    rHipSpeed = _field(R_HIP_SPEED)
+    lKneeSpeed = _field(L_KNEE_SPEED)
+    rKneeSpeed = _field(R_KNEE_SPEED)
+    energySpent = _field(ENERGY_SPENT)
+
+    def __init__(self, row):
+        self.row = row
 
     def as_array(self):
-        return (
-            self.headAltitude,
-            self.hDistance,
-            self.hSpeed,
-            self.torsoAngle,
-            self.lHipAngle,
-            self.rHipAngle,
-            self.lKneeAngle,
-            self.rKneeAngle,
-            self.lHipSpeed,
-            self.rHipSpeed,
-            self.lKneeSpeed,
-            self.rKneeSpeed,
-        )
\ No newline at end of file
+        return self.row[:OBSERVATION_SIZE]
+
+    def __repr__(self):
+        return 'WalkerInfo({0})'.format(', '.join('{0}={1:.4f}'.format(name, value) for name, value in zip(FIELDS, self.row)))
+
@@ -0,0 +1,80 @@
+""" Compares neat.Checkpointer with AsyncCheckpointer: how long the training thread is blocked
+per checkpoint and how much disk a checkpoint takes, and checks the restored state.
+
+Run from the repository root: python -m benchmarks.checkpointing
+"""
+import os
+import random
+import tempfile
+import time
+import neat
+
+from AsyncCheckpointer import AsyncCheckpointer
+from benchmarks.common import load_config
+
+POP_SIZE = 300
+NUM_GENERATIONS = 10
+SEED = 1000
+
+
+def fake_fitness(genomes, config):
+    # Checkpointing doesn't care about the fitness, the physics would only slow the benchmark down
+    for genome_id, genome in genomes:
+        genome.fitness = sum(cg.weight for cg in genome.connections.values())
+
+
+class TimedCheckpointer(neat.Checkpointer):
+    blocked = []
+
+    def save_checkpoint(self, *args):
+        start = time.perf_counter()
+        super().save_checkpoint(*args)
+        self.blocked.append(time.perf_counter() - start)
+
+
+class TimedAsyncCheckpointer(AsyncCheckpointer):
+    blocked = []
+
+    def save_checkpoint(self, *args):
+        start = time.perf_counter()
+        filename = super().save_checkpoint(*args)
+        self.blocked.append(time.perf_counter() - start)
+        return filename
+
+
+def run(checkpointer, directory):
+    random.seed(SEED)
+    population = neat.Population(load_config(POP_SIZE))
+    population.add_reporter(neat.StatisticsReporter())
+    population.add_reporter(checkpointer)
+    population.run(fake_fitness, NUM_GENERATIONS)
+    if isinstance(checkpointer, AsyncCheckpointer):
+        checkpointer.wait()
+
+    blocked = checkpointer.blocked
+    files = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return population, sum(blocked) / len(blocked), sum(map(os.path.getsize, files)) / len(files)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as neat_dir, tempfile.TemporaryDirectory() as async_dir:
+        neat_population, neat_blocked, neat_size = run(
+            TimedCheckpointer(1, None, os.path.join(neat_dir, 'checkpoint-')), neat_dir)
+        async_population, async_blocked, async_size = run(
+            TimedAsyncCheckpointer(1, None, os.path.join(async_dir, 'checkpoint-')), async_dir)
+
+        last = os.path.join(async_dir, 'checkpoint-{0}'.format(NUM_GENERATIONS - 1))
+        restored = AsyncCheckpointer.restore_checkpoint(last)
+        assert sorted(restored.population) == sorted(async_population.population)
+        for key, genome in restored.population.items():
+            original = async_population.population[key]
+            assert list(genome.connections) == list(original.connections)
+            assert [cg.weight for cg in genome.connections.values()] == [cg.weight for cg in original.connections.values()]
+        # New species and nodes must not take the key of one in the restored population
+        assert next(restored.species.indexer) > max(restored.species.species)
+        node_keys = [key for genome in restored.population.values() for key in genome.nodes]
+        assert next(restored.config.genome_config.node_indexer) > max(node_keys)
+        restored.run(fake_fitness, 2)
+
+    print(f"neat.Checkpointer:  {neat_blocked * 1e3:7.1f} ms blocked, {neat_size / 1024:7.1f} KiB per checkpoint")
+    print(f"AsyncCheckpointer:  {async_blocked * 1e3:7.1f} ms blocked, {async_size / 1024:7.1f} KiB per checkpoint")
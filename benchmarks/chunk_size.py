@@ -0,0 +1,53 @@
+""" Checks that sharing a world between K walkers gives the same fitnesses as one walker
+per world and sweeps the chunk size K for throughput.
+
+Run from the repository root: python -m benchmarks.chunk_size [num_workers]
+"""
+import sys
+import time
+import multiprocessing as mp
+import neat
+
+from ChunkedEvaluator import ChunkedEvaluator
+from main import eval_genome, eval_genome_chunk
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZE = 300
+CHUNK_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def check_matches(config, genomes):
+    # Compared against single-walker chunks rather than eval_genome, because
+    # PopulationNetwork and FeedForwardNetwork may round the last bit differently
+    expected = [eval_genome_chunk([genome], config)[0] for genome in genomes]
+    for chunk_size in (3, 8):
+        chunked = []
+        for i in range(0, len(genomes), chunk_size):
+            chunked.extend(eval_genome_chunk(genomes[i:i + chunk_size], config))
+        assert chunked == expected, "chunks of {0} differ from single walkers".format(chunk_size)
+
+
+def throughput(evaluator, genomes, config):
+    start = time.perf_counter()
+    evaluator.evaluate(list(enumerate(genomes)), config)
+    return len(genomes) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else mp.cpu_count()
+    config = load_config(POP_SIZE)
+    genomes = grown_genomes(config, POP_SIZE)
+    check_matches(config, genomes[:24])
+
+    pe = neat.ParallelEvaluator(num_workers, eval_genome)
+    print(f"ParallelEvaluator, {num_workers} workers: {throughput(pe, genomes, config):.0f} genomes/s")
+
+    results = {}
+    for chunk_size in CHUNK_SIZES:
+        evaluator = ChunkedEvaluator(num_workers, eval_genome_chunk, chunk_size)
+        results[chunk_size] = throughput(evaluator, genomes, config)
+        print(f"ChunkedEvaluator K={chunk_size}: {results[chunk_size]:.0f} genomes/s")
+        del evaluator
+
+    best = max(results, key=results.get)
+    print(f"best chunk size: {best}")
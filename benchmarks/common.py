@@ -0,0 +1,28 @@
+import os
+import random
+import neat
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(ROOT_DIR, 'neat-config.ini')
+
+
+def load_config(pop_size=None):
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         CONFIG_FILE)
+    if pop_size is not None:
+        config.pop_size = pop_size
+    return config
+
+
+def grown_genomes(config, num_genomes, mutations=40, seed=1000):
+    """ Creates genomes and mutates them for a while so they have hidden nodes and connections. """
+    random.seed(seed)
+    genomes = []
+    for key in range(num_genomes):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(mutations):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes
@@ -0,0 +1,62 @@
+""" Checks CompiledNetwork against neat's FeedForwardNetwork and times building and
+activating both, and getting a network from the cache.
+
+Run from the repository root: python -m benchmarks.compiled_network
+"""
+import time
+import neat
+import numpy as np
+
+from CompiledNetwork import CompiledNetwork, NetworkCache
+from WalkerInfo import OBSERVATION_SIZE
+from benchmarks.common import load_config, grown_genomes
+
+NUM_GENOMES = 300
+ACTIVATIONS = 2000
+SEED = 1000
+
+
+def check_matches(config, genomes, num_observations=100):
+    """ Every compiled network must give FeedForwardNetwork's outputs bit for bit. """
+    observations = np.random.default_rng(SEED).normal(size=(num_observations, OBSERVATION_SIZE))
+    for genome in genomes:
+        ffn = neat.nn.FeedForwardNetwork.create(genome, config)
+        net = CompiledNetwork.create(genome, config)
+        for row in observations:
+            assert net.activate(row) == ffn.activate(row), "compiled network differs from FeedForwardNetwork"
+
+
+def per_second(count, function):
+    start = time.perf_counter()
+    function()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    config = load_config()
+    genomes = grown_genomes(config, NUM_GENOMES)
+    rng = np.random.default_rng(SEED)
+    observations = rng.normal(size=(ACTIVATIONS, OBSERVATION_SIZE))
+
+    check_matches(config, genomes)
+    print("Outputs bit-identical to FeedForwardNetwork")
+    reference = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    compiled = [CompiledNetwork.create(genome, config) for genome in genomes]
+
+    enabled = sum(1 for genome in genomes for cg in genome.connections.values() if cg.enabled)
+    total = sum(len(genome.connections) for genome in genomes)
+    hidden = sum(len(genome.nodes) for genome in genomes)
+    evaluated = sum(net.num_nodes for net in compiled)
+    print(f"Evaluated nodes: {evaluated} of {hidden}, from {enabled} enabled of {total} connections")
+
+    cache = NetworkCache(NUM_GENOMES)
+    print(f"{'build':>24} {'networks/s':>12}")
+    print(f"{'FeedForwardNetwork':>24} {per_second(NUM_GENOMES, lambda: [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]):12.0f}")
+    print(f"{'CompiledNetwork':>24} {per_second(NUM_GENOMES, lambda: [CompiledNetwork.create(g, config) for g in genomes]):12.0f}")
+    [cache.get(genome, config) for genome in genomes]
+    print(f"{'NetworkCache hit':>24} {per_second(NUM_GENOMES, lambda: [cache.get(g, config) for g in genomes]):12.0f}")
+
+    rows = list(observations[:ACTIVATIONS // 10])
+    print(f"{'activate':>24} {'calls/s':>12}")
+    for name, nets in (('FeedForwardNetwork', reference), ('CompiledNetwork', compiled)):
+        print(f"{name:>24} {per_second(len(nets) * len(rows), lambda: [net.activate(row) for net in nets for row in rows]):12.0f}")
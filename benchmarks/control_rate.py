@@ -0,0 +1,52 @@
+""" Runs the network once every 1, 2, 4 and 8 physics steps (main.CONTROL_DECIMATION):
+evaluation throughput on the same genomes, and the fitness a short evolution reaches.
+The physics stays at TARGET_FPS, so every episode covers the same simulated time.
+
+Run from the repository root: python -m benchmarks.control_rate
+"""
+import random
+import time
+import neat
+import numpy as np
+
+import main
+from Simulation import TARGET_FPS
+from benchmarks.common import load_config, grown_genomes
+
+DECIMATIONS = (1, 2, 4, 8)
+POP_SIZE = 300
+CHUNK_SIZE = 50
+EVOLUTION_POP_SIZE = 50
+EVOLUTION_GENERATIONS = 10
+SEED = 1000
+
+
+def evaluate_chunks(genomes, config):
+    for i in range(0, len(genomes), CHUNK_SIZE):
+        chunk = genomes[i:i + CHUNK_SIZE]
+        for (genome_id, genome), fitness in zip(chunk, main.eval_genome_chunk([genome for genome_id, genome in chunk], config)):
+            genome.fitness = fitness
+
+
+if __name__ == "__main__":
+    config = load_config(POP_SIZE)
+    genomes = list(enumerate(grown_genomes(config, POP_SIZE)))
+
+    print(f"{'control rate':>14} {'evaluation':>12} {'mean fitness':>13} {'best after':>11} {'time':>7}")
+    print(f"{'':>14} {'genomes/s':>12} {'':>13} {f'{EVOLUTION_GENERATIONS} gens':>11} {'':>7}")
+    for decimation in DECIMATIONS:
+        main.CONTROL_DECIMATION = decimation
+
+        start = time.perf_counter()
+        evaluate_chunks(genomes, config)
+        throughput = len(genomes) / (time.perf_counter() - start)
+        mean_fitness = np.mean([genome.fitness for genome_id, genome in genomes])
+
+        random.seed(SEED)
+        population = neat.Population(load_config(EVOLUTION_POP_SIZE))
+        start = time.perf_counter()
+        winner = population.run(evaluate_chunks, EVOLUTION_GENERATIONS)
+        seconds = time.perf_counter() - start
+
+        rate = f"{TARGET_FPS / decimation:g} Hz"
+        print(f"{rate:>14} {throughput:12.1f} {mean_fitness:13.3f} {winner.fitness:11.3f} {seconds:6.1f}s")
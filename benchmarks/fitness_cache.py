@@ -0,0 +1,43 @@
+""" Runs a few generations with every cache hit re-simulated to prove the episodes are
+deterministic, then reports the hit rate and the time saved by the cache.
+
+Run from the repository root: python -m benchmarks.fitness_cache
+"""
+import random
+import time
+import neat
+
+from FitnessCache import FitnessCache
+from main import eval_genome, NUM_ITERATIONS, TERMINATION_POLICY
+from benchmarks.common import load_config
+
+POP_SIZE = 150
+NUM_GENERATIONS = 8
+SEED = 1000
+
+
+def run(cache):
+    random.seed(SEED)
+    config = load_config(POP_SIZE)
+    population = neat.Population(config)
+    pe = neat.ParallelEvaluator(1, eval_genome)
+    evaluate = cache.wrap(pe.evaluate) if cache is not None else pe.evaluate
+
+    start = time.perf_counter()
+    best = population.run(evaluate, NUM_GENERATIONS)
+    return time.perf_counter() - start, best.fitness
+
+
+if __name__ == "__main__":
+    settings = (NUM_ITERATIONS, vars(TERMINATION_POLICY), False)
+
+    checked = FitnessCache(settings=settings, check_rate=1.0)
+    run(checked)
+    print(f"determinism check: {checked.hits} cache hits re-simulated, all identical")
+
+    uncached_time, uncached_best = run(None)
+    cache = FitnessCache(settings=settings)
+    cached_time, cached_best = run(cache)
+    assert cached_best == uncached_best
+    hit_rate = cache.hits / (cache.hits + cache.misses)
+    print(f"hit rate {hit_rate:.1%}, {uncached_time:.2f} s without cache, {cached_time:.2f} s with cache")
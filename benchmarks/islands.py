@@ -0,0 +1,75 @@
+""" Measures how IslandEvolution scales with the number of islands, each evolving a
+population of the same size, and checks that migration keeps genome keys unique within
+an island and node keys apart between islands.
+
+Scaling is reported as island CPU seconds per wall second; it can only approach the
+number of islands with at least as many CPUs.
+
+Run from the repository root: python -m benchmarks.islands
+"""
+import copy
+import time
+import random
+import multiprocessing as mp
+
+import main
+from IslandEvolution import IslandEvolution, _Island
+from benchmarks.common import load_config
+
+ISLAND_COUNTS = (1, 2, 4)
+POP_SIZE = 100
+NUM_GENERATIONS = 6
+MIGRATION_INTERVAL = 2
+EPISODE_STEPS = 100
+
+
+def random_fitness(genomes, config):
+    for genome_id, genome in genomes:
+        genome.fitness = random.random()
+
+
+def check_migration(num_islands=3, rounds=5):
+    """ Evolves islands in this process and migrates along a ring, checking the keys as it goes.
+    Returns how many genomes carry hidden nodes from another island's key stride. """
+    config = load_config(POP_SIZE)
+    # Copies like the ones the island processes get through their pipes
+    islands = [_Island(index, num_islands, copy.deepcopy(config), random_fitness, 5, 1000)
+               for index in range(num_islands)]
+    output_keys = set(config.genome_config.output_keys)
+    for _ in range(rounds):
+        emigrants = [copy.deepcopy(island.run(MIGRATION_INTERVAL)[1]) for island in islands]
+        for index, island in enumerate(islands):
+            island.immigrate(emigrants[index - 1])
+            population = island.population.population
+            assert all(gid == g.key for gid, g in population.items()), "genome keys differ from population keys"
+            assert len(population) == config.pop_size, "population size changed"
+
+    foreign = 0
+    for index, island in enumerate(islands):
+        for genome in island.population.population.values():
+            hidden = [k for k in genome.nodes if k not in output_keys]
+            foreign += any(k % num_islands != index for k in hidden)
+    return foreign
+
+
+if __name__ == "__main__":
+    foreign = check_migration()
+    print(f"Migration on 3 islands kept genome keys unique, {foreign} genomes carry nodes from other islands")
+
+    # The islands are forked, they see the shortened episode as well
+    main.NUM_ITERATIONS = EPISODE_STEPS
+    print(f"{mp.cpu_count()} CPUs, {POP_SIZE} genomes per island, {NUM_GENERATIONS} generations, "
+          f"migration every {MIGRATION_INTERVAL}")
+    print(f"{'islands':>8} {'seconds':>8} {'genomes/s':>10} {'CPU s/s':>8} {'best':>7} {'species':>8}")
+    for num_islands in ISLAND_COUNTS:
+        config = load_config(POP_SIZE)
+        start = time.perf_counter()
+        islands = IslandEvolution(config, num_islands, main.eval_island_genomes, MIGRATION_INTERVAL, report=False)
+        winner = islands.run(NUM_GENERATIONS)
+        seconds = time.perf_counter() - start
+        islands.close()
+
+        busy = sum(b for wall, b in islands.history)
+        species = len(islands.statistics.generation_statistics[-1])
+        print(f"{num_islands:>8} {seconds:8.2f} {num_islands * POP_SIZE * NUM_GENERATIONS / seconds:10.1f} "
+              f"{busy / seconds:8.2f} {winner.fitness:7.3f} {species:>8}")
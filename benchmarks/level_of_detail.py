@@ -0,0 +1,50 @@
+""" Measures the time per drawn frame as the number of walkers grows, drawing every walker
+body by body (detail_walkers=None) and with the default level of detail: the 10 walkers
+furthest ahead in full, up to 200 others in view as ghost markers, everything out of view
+culled. Only capture_frame() and render_frame() are timed, not the physics.
+
+Runs offscreen. Run from the repository root: python -m benchmarks.level_of_detail
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import time
+import numpy as np
+
+from Simulation import Simulation
+
+WALKER_COUNTS = (10, 100, 300, 1000)
+NUM_STEPS = 60
+DRAW_EVERY = 4
+SEED = 1000
+
+
+def frame_times(num_walkers, **options):
+    """ Milliseconds per frame and bodies per frame over an episode of random efforts. """
+    sim = Simulation(real_time=False, headless=True, **options)
+    sim.make_walkers(num_walkers)
+    efforts = np.random.default_rng(SEED).random((NUM_STEPS, num_walkers, 4))
+
+    seconds = 0.0
+    bodies = 0
+    frames = 0
+    for step, effort in enumerate(efforts):
+        sim.update(effort)
+        if step % DRAW_EVERY:
+            continue
+        start = time.perf_counter()
+        frame = sim.capture_frame()
+        sim.render_frame(frame)
+        seconds += time.perf_counter() - start
+        bodies += len(frame[2]) + len(frame[4])
+        frames += 1
+    sim.close()
+    return 1000 * seconds / frames, bodies / frames
+
+
+if __name__ == "__main__":
+    print(f"{'walkers':>8} {'all bodies ms':>14} {'drawn':>6} {'level of detail ms':>19} {'drawn':>6}")
+    for num_walkers in WALKER_COUNTS:
+        full_ms, full_drawn = frame_times(num_walkers, detail_walkers=None)
+        lod_ms, lod_drawn = frame_times(num_walkers)
+        print(f"{num_walkers:>8} {full_ms:14.2f} {full_drawn:6.0f} {lod_ms:19.2f} {lod_drawn:6.0f}")
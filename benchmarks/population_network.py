@@ -0,0 +1,52 @@
+""" Checks PopulationNetwork against neat's FeedForwardNetwork and times both.
+
+Run from the repository root: python -m benchmarks.population_network
+"""
+import time
+import neat
+import numpy as np
+
+from PopulationNetwork import PopulationNetwork
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZES = (300, 3000)
+NUM_STEPS = 50
+
+
+def check_matches(config, genomes, num_samples=20):
+    rng = np.random.default_rng(0)
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batched = PopulationNetwork.create(genomes, config)
+    for _ in range(num_samples):
+        inputs = rng.normal(scale=2.0, size=(len(genomes), 12))
+        expected = np.array([net.activate(row) for net, row in zip(nets, inputs)])
+        assert np.allclose(batched.activate(inputs), expected, rtol=1e-12, atol=1e-12), "PopulationNetwork differs from FeedForwardNetwork"
+
+
+def time_per_genome(genomes, config, inputs):
+    start = time.perf_counter()
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    for step in inputs:
+        [net.activate(row) for net, row in zip(nets, step)]
+    return time.perf_counter() - start
+
+
+def time_batched(genomes, config, inputs):
+    start = time.perf_counter()
+    net = PopulationNetwork.create(genomes, config)
+    for step in inputs:
+        net.activate(step)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for pop_size in POP_SIZES:
+        config = load_config(pop_size)
+        genomes = grown_genomes(config, pop_size)
+        check_matches(config, genomes)
+
+        inputs = np.random.default_rng(1).normal(size=(NUM_STEPS, pop_size, 12))
+        per_genome = time_per_genome(genomes, config, inputs)
+        batched = time_batched(genomes, config, inputs)
+        print(f"pop_size {pop_size}: per-genome {per_genome / NUM_STEPS * 1e3:.2f} ms/step, "
+              f"batched {batched / NUM_STEPS * 1e3:.2f} ms/step, speedup {per_genome / batched:.1f}x")
@@ -0,0 +1,67 @@
+""" Measures how much drawing slows the rendered simulation down in each render mode, and
+checks that frames rendered on the background thread equal the ones drawn in line.
+
+Runs offscreen. Run from the repository root: python -m benchmarks.rendering
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import tempfile
+import time
+import numpy as np
+import pygame
+
+from Simulation import Simulation
+
+NUM_WALKERS = 20
+NUM_STEPS = 600
+SEED = 1000
+
+MODES = {
+    'no drawing': None,
+    'every step': dict(),
+    'frame skip 4': dict(frame_skip=4),
+    'threaded': dict(threaded=True),
+    # BMP, encoding PNG costs more than all the rest of the simulation
+    'export, skip 4': dict(frame_skip=4, output='export/frame-{:05d}.bmp'),
+}
+
+
+def run_episode(efforts, draw=True, **options):
+    sim = Simulation(real_time=False, headless=True, **options)
+    sim.make_walkers(NUM_WALKERS)
+
+    start = time.perf_counter()
+    for effort in efforts:
+        sim.update(effort)
+        if draw:
+            sim.draw()
+    sim.close()
+    return time.perf_counter() - start
+
+
+def exported_frames(efforts, directory, **options):
+    run_episode(efforts, output=directory, **options)
+    return [pygame.surfarray.array3d(pygame.image.load(os.path.join(directory, name)))
+            for name in sorted(os.listdir(directory))]
+
+
+if __name__ == "__main__":
+    efforts = np.random.default_rng(SEED).random((NUM_STEPS, NUM_WALKERS, 4))
+
+    with tempfile.TemporaryDirectory() as directory:
+        inline = exported_frames(efforts[:100], os.path.join(directory, 'inline'), frame_skip=10)
+        threaded = exported_frames(efforts[:100], os.path.join(directory, 'threaded'), frame_skip=10, threaded=True)
+        assert len(inline) == len(threaded) == 10
+        assert all(np.array_equal(a, b) for a, b in zip(inline, threaded)), "threaded frames differ"
+        print("Threaded rendering writes the same frames as inline rendering")
+
+        for name, options in MODES.items():
+            if options is None:
+                seconds = run_episode(efforts, draw=False)
+            else:
+                options = dict(options)
+                if 'output' in options:
+                    options['output'] = os.path.join(directory, options['output'])
+                seconds = run_episode(efforts, **options)
+            print(f"{name:>16}: {NUM_STEPS / seconds:8.1f} steps/s")
@@ -0,0 +1,82 @@
+""" Records an episode, checks that the replay holds the simulated values and draws like
+the live simulation, and compares playing it back with simulating it again.
+
+Runs offscreen. Run from the repository root: python -m benchmarks.replay
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import tempfile
+import time
+import numpy as np
+import pygame
+
+from Simulation import Simulation
+from ReplayRecorder import ReplayRecorder, load_replay, POSE_COLUMNS
+from ReplayPlayer import ReplayPlayer
+
+NUM_WALKERS = 20
+NUM_STEPS = 1500
+CHECKED_STEPS = (0, 99, 750, NUM_STEPS - 1)
+SEED = 1000
+TEXT_HEIGHT = 80
+
+
+def screen_pixels(sim):
+    return pygame.surfarray.array3d(sim.screen).copy()
+
+
+if __name__ == "__main__":
+    efforts = np.random.default_rng(SEED).random((NUM_STEPS, NUM_WALKERS, 4))
+    sim = Simulation(real_time=False, headless=True)
+    sim.make_walkers(NUM_WALKERS)
+    recorder = ReplayRecorder(sim)
+
+    live_states = []
+    live_frames = {}
+    start = time.perf_counter()
+    for step, effort in enumerate(efforts):
+        sim.update(effort)
+        recorder.record()
+        live_states.append(sim.states.copy())
+        if step in CHECKED_STEPS:
+            sim.render_frame(sim.capture_frame())
+            live_frames[step] = screen_pixels(sim)
+    print(f"Recording: {NUM_STEPS / (time.perf_counter() - start):8.1f} steps/s while simulating")
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'episode.replay')
+        recorder.save(filename)
+        size = os.path.getsize(filename)
+        print(f"Replay file: {size / 1024:.1f} KiB, {size / NUM_STEPS / NUM_WALKERS:.0f} bytes per walker and step")
+
+        header, data = load_replay(filename)
+        assert np.array_equal(data[len(POSE_COLUMNS):], np.stack(live_states, axis=1).transpose(2, 1, 0).astype(np.float32))
+        print("The replay holds the simulated WalkerInfo channels")
+
+        player = ReplayPlayer([filename], sim)
+        for step in CHECKED_STEPS:
+            sim.render_frame(player.frame(step))
+            # Below the text lines, where the replay adds its position
+            assert np.array_equal(screen_pixels(sim)[:, TEXT_HEIGHT:], live_frames[step][:, TEXT_HEIGHT:])
+        print("Replay frames draw like the live simulation")
+
+        start = time.perf_counter()
+        for step in range(NUM_STEPS):
+            sim.render_frame(player.frame(step))
+        replayed = NUM_STEPS / (time.perf_counter() - start)
+
+        sim.reset()
+        sim.make_walkers(NUM_WALKERS)
+        start = time.perf_counter()
+        for effort in efforts:
+            sim.update(effort)
+            sim.render_frame(sim.capture_frame())
+        simulated = NUM_STEPS / (time.perf_counter() - start)
+        print(f"Playback, unpaced: {simulated:8.1f} frames/s simulating again, {replayed:8.1f} frames/s from the replay")
+
+        player = ReplayPlayer([filename, filename, filename], sim)
+        start = time.perf_counter()
+        for step in range(0, NUM_STEPS, 10):
+            player.frame(step)
+        print(f"Three replays side by side: {NUM_STEPS / 10 / (time.perf_counter() - start):8.1f} frames/s, without drawing")
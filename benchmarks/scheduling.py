@@ -0,0 +1,63 @@
+""" Compares neat.ParallelEvaluator with CostAwareEvaluator on a generation whose parents
+were evaluated before, so the cost predictions have something to work with. Also checks
+that both produce the same fitness values, how well the predicted costs match, and that
+the first generation, with nothing measured yet, is still split into many tasks.
+
+Run from the repository root: python -m benchmarks.scheduling
+"""
+import random
+import time
+import multiprocessing as mp
+import neat
+import numpy as np
+
+from CostAwareEvaluator import CostAwareEvaluator
+from main import eval_genome, simulate_genome, NUM_ITERATIONS
+from benchmarks.common import load_config
+
+POP_SIZE = 300
+WARMUP_GENERATIONS = 4
+NUM_WORKERS = max(4, mp.cpu_count())
+SEED = 1000
+
+busy_time = mp.Value('d', 0.0)
+
+
+def timed_eval_genome(genome, config):
+    start = time.perf_counter()
+    fitness = eval_genome(genome, config)
+    with busy_time.get_lock():
+        busy_time.value += time.perf_counter() - start
+    return fitness
+
+
+if __name__ == "__main__":
+    random.seed(SEED)
+    config = load_config(POP_SIZE)
+    population = neat.Population(config)
+    scheduler = CostAwareEvaluator(NUM_WORKERS, simulate_genome, population.reproduction.ancestors, NUM_ITERATIONS)
+    population.run(scheduler.evaluate, WARMUP_GENERATIONS)
+    first_tasks = scheduler.history[0][2]
+    assert first_tasks >= POP_SIZE / scheduler.max_task_genomes, "the first generation went out in a few big tasks"
+    print(f"First generation, nothing measured yet: {first_tasks} tasks for {POP_SIZE} genomes")
+    genomes = list(population.population.items())
+
+    pe = neat.ParallelEvaluator(NUM_WORKERS, timed_eval_genome)
+    start = time.perf_counter()
+    pe.evaluate(genomes, config)
+    seconds = time.perf_counter() - start
+    del pe
+    expected = [genome.fitness for genome_id, genome in genomes]
+    print(f"ParallelEvaluator: {seconds:.2f} sec, workers idle "
+          f"{100 * max(0.0, 1 - busy_time.value / (seconds * NUM_WORKERS)):.1f}% of the time, {len(genomes)} tasks")
+
+    for genome_id, genome in genomes:
+        genome.fitness = None
+    print("CostAwareEvaluator: ", end='')
+    scheduler.evaluate(genomes, config)
+    assert [genome.fitness for genome_id, genome in genomes] == expected
+    print("Same fitness values from both")
+
+    predicted, measured = np.array(scheduler.last_predictions).T
+    print(f"Predicted against measured seconds per genome: correlation {np.corrcoef(predicted, measured)[0, 1]:.2f}")
+    scheduler.close()
@@ -0,0 +1,79 @@
+""" Compares neat.ParallelEvaluator, which pickles every genome into its task, with
+SharedNetworkEvaluator, which passes index ranges into a shared memory block. Episodes
+are cut short so the transfer overhead shows; both must give the same fitness values.
+
+Run from the repository root: python -m benchmarks.shared_networks
+"""
+import pickle
+import time
+from functools import partial
+import neat
+
+import main
+from SharedNetworkEvaluator import SharedNetworkEvaluator
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZES = (300, 3000)
+NUM_WORKERS = 4
+EPISODE_STEPS = 20
+
+
+def episode_fitness(genome, config, num_iterations, stock=True):
+    """ main.eval_genome over num_iterations steps, with neat's own FeedForwardNetwork
+    unless stock is False, then with main's CompiledNetwork as in the shared workers. """
+    if stock:
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+    else:
+        net = main.compiled_network(genome, config, main.NETWORK_CACHE_SIZE)
+    return main.run_episode(net, genome.key, num_iterations)[0]
+
+
+def check_matches(config, genomes, num_workers=2):
+    """ SharedNetworkEvaluator must give the fitness values of a stock ParallelEvaluator
+    with FeedForwardNetwork, over shortened episodes. """
+    parallel = neat.ParallelEvaluator(num_workers, partial(episode_fitness, num_iterations=EPISODE_STEPS))
+    shared = SharedNetworkEvaluator(num_workers, partial(main.run_episode, num_iterations=EPISODE_STEPS))
+    try:
+        genomes = list(enumerate(genomes))
+        parallel.evaluate(genomes, config)
+        expected = [genome.fitness for genome_id, genome in genomes]
+        for genome_id, genome in genomes:
+            genome.fitness = None
+        shared.evaluate(genomes, config)
+        assert [genome.fitness for genome_id, genome in genomes] == expected, "SharedNetworkEvaluator fitness differs"
+    finally:
+        shared.close()
+        parallel.pool.close()
+        parallel.pool.join()
+
+
+if __name__ == "__main__":
+    config = load_config()
+    # Both run the same CompiledNetwork, so only the transfer differs
+    parallel = neat.ParallelEvaluator(NUM_WORKERS, partial(episode_fitness, num_iterations=EPISODE_STEPS, stock=False))
+    shared = SharedNetworkEvaluator(NUM_WORKERS, partial(main.run_episode, num_iterations=EPISODE_STEPS))
+
+    print(f"{'genomes':>8} {'evaluator':>24} {'seconds':>8} {'task bytes':>11}")
+    for pop_size in POP_SIZES:
+        genomes = list(enumerate(grown_genomes(config, pop_size)))
+
+        start = time.perf_counter()
+        parallel.evaluate(genomes, config)
+        seconds = time.perf_counter() - start
+        expected = [genome.fitness for genome_id, genome in genomes]
+        task_bytes = sum(len(pickle.dumps((genome, config))) for genome_id, genome in genomes)
+        print(f"{pop_size:>8} {'ParallelEvaluator':>24} {seconds:8.2f} {task_bytes:11d}")
+
+        for genome_id, genome in genomes:
+            genome.fitness = None
+        # The first call starts the pool, time the second one
+        shared.evaluate(genomes, config)
+        start = time.perf_counter()
+        shared.evaluate(genomes, config)
+        seconds = time.perf_counter() - start
+        assert [genome.fitness for genome_id, genome in genomes] == expected, "fitness differs"
+        task_bytes = NUM_WORKERS * shared.tasks_per_worker * len(pickle.dumps((shared.block.name, (0, 0, 0, 0), ('sigmoid',), ('sum',), 0, 0)))
+        print(f"{pop_size:>8} {'SharedNetworkEvaluator':>24} {seconds:8.2f} {task_bytes:11d}")
+
+    shared.close()
+    print("Same fitness values from both")
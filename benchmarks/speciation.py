@@ -0,0 +1,66 @@
+""" Compares speciation with the stock neat.DefaultSpeciesSet and VectorizedSpeciesSet.
+Populations are grown, then go through a few generations of reproduction with random
+fitness; every generation both species sets start from the same state and must assign
+every genome to the same species, with the same representatives.
+
+Run from the repository root: python -m benchmarks.speciation
+"""
+import copy
+import time
+import random
+import itertools
+import neat
+
+from VectorizedSpeciesSet import VectorizedSpeciesSet
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZES = (300, 3000, 10000)
+NUM_GENERATIONS = 3
+SEED = 1000
+
+
+def clone(species_set, species_set_type, config):
+    """ A species set of the given type in the same state; speciate() replaces what it changes. """
+    result = species_set_type(config.species_set_config, species_set.reporters)
+    result.indexer = copy.deepcopy(species_set.indexer)
+    result.species = dict((sid, copy.copy(s)) for sid, s in species_set.species.items())
+    result.genome_to_species = dict(species_set.genome_to_species)
+    return result
+
+
+def speciate(species_set, config, population, generation):
+    start = time.perf_counter()
+    species_set.speciate(config, population, generation)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"{'genomes':>8} {'species':>8} {'stock s':>8} {'vectorized s':>13} {'speedup':>8}")
+    for pop_size in POP_SIZES:
+        config = load_config(pop_size)
+        reporters = neat.reporting.ReporterSet()
+        stagnation = config.stagnation_type(config.stagnation_config, reporters)
+        reproduction = config.reproduction_type(config.reproduction_config, reporters, stagnation)
+        reproduction.genome_indexer = itertools.count(pop_size)
+        population = dict((genome.key, genome) for genome in grown_genomes(config, pop_size))
+        species_set = config.species_set_type(config.species_set_config, reporters)
+        random.seed(SEED)
+
+        stock_seconds = vectorized_seconds = 0.0
+        for generation in range(NUM_GENERATIONS):
+            stock = clone(species_set, neat.DefaultSpeciesSet, config)
+            vectorized = clone(species_set, VectorizedSpeciesSet, config)
+            stock_seconds += speciate(stock, config, population, generation)
+            vectorized_seconds += speciate(vectorized, config, population, generation)
+            assert stock.genome_to_species == vectorized.genome_to_species, "species assignments differ"
+            assert ([(sid, s.representative.key) for sid, s in stock.species.items()] ==
+                    [(sid, s.representative.key) for sid, s in vectorized.species.items()]), "representatives differ"
+
+            species_set = stock
+            for genome in population.values():
+                genome.fitness = random.random()
+            population = reproduction.reproduce(config, species_set, pop_size, generation)
+
+        print(f"{pop_size:>8} {len(species_set.species):>8} {stock_seconds / NUM_GENERATIONS:8.3f} "
+              f"{vectorized_seconds / NUM_GENERATIONS:13.3f} {stock_seconds / vectorized_seconds:7.1f}x")
+    print("Same species assignments from both")
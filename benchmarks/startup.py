@@ -0,0 +1,60 @@
+""" Measures what importing main costs: in a fresh interpreter, and in spawned worker
+processes, which import it again to find the evaluation function. Also lists which of
+the rendering and plotting packages got loaded along the way.
+
+Run from the repository root: python -m benchmarks.startup
+"""
+import sys
+import json
+import time
+import resource
+import statistics
+import subprocess
+import multiprocessing as mp
+
+from benchmarks.common import ROOT_DIR
+
+REPEATS = 5
+NUM_WORKERS = 4
+HEAVY_MODULES = ('pygame', 'matplotlib', 'graphviz')
+
+IMPORT_MAIN = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+print(json.dumps([time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  [name for name in {0!r} if name in sys.modules]]))
+""".format(HEAVY_MODULES)
+
+
+def import_main(results):
+    start = time.perf_counter()
+    import main
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                 [name for name in HEAVY_MODULES if name in sys.modules]))
+
+
+if __name__ == "__main__":
+    runs = []
+    for _ in range(REPEATS):
+        output = subprocess.run([sys.executable, '-c', IMPORT_MAIN], cwd=ROOT_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    seconds, rss, loaded = zip(*runs)
+    print(f"Fresh interpreter: import main {1000 * statistics.median(seconds):.0f} ms, "
+          f"peak RSS {statistics.median(rss):.1f} MB, loaded {', '.join(loaded[0]) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+    sys.path.insert(0, ROOT_DIR)
+    context = mp.get_context('spawn')
+    results = context.Queue()
+    start = time.perf_counter()
+    processes = [context.Process(target=import_main, args=(results,)) for _ in range(NUM_WORKERS)]
+    for process in processes:
+        process.start()
+    workers = [results.get() for _ in processes]
+    pool_seconds = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    seconds, rss, loaded = zip(*workers)
+    print(f"Spawned workers: {NUM_WORKERS} ready in {pool_seconds:.2f} s, import main {1000 * statistics.mean(seconds):.0f} ms, "
+          f"peak RSS {statistics.mean(rss):.1f} MB each, loaded {', '.join(loaded[0]) or 'none of ' + ', '.join(HEAVY_MODULES)}")
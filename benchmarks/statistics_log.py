@@ -0,0 +1,98 @@
+""" Compares neat.StatisticsReporter with StatisticsLogReporter over a long run: the memory
+each keeps, and what refreshing the plot data costs once the run is long. Generations are
+synthetic (random fitness and species) so thousands of them take seconds. StatisticsLog
+must give the same curves StatisticsReporter does.
+
+Run from the repository root: python -m benchmarks.statistics_log
+"""
+import os
+import time
+import random
+import tempfile
+import tracemalloc
+
+import neat
+
+from StatisticsLog import StatisticsLogReporter, StatisticsLog
+from benchmarks.common import load_config, grown_genomes
+
+NUM_GENERATIONS = 3000
+POP_SIZE = 150
+NUM_SPECIES = 8
+SEED = 1000
+
+
+class FakeSpecies:
+    def __init__(self):
+        self.members = {}
+
+
+class FakeSpeciesSet:
+    def __init__(self, population):
+        self.species = dict((sid, FakeSpecies()) for sid in range(1, NUM_SPECIES + 1))
+        for gid, genome in population.items():
+            self.species[random.randint(1, NUM_SPECIES)].members[gid] = genome
+
+
+def evolve(reporter, config, population, generations, first_generation=0):
+    """ Feeds the reporter generations of random fitness, returns the memory it grew by in MB. """
+    random.seed(SEED + first_generation)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for generation in range(first_generation, first_generation + generations):
+        reporter.start_generation(generation)
+        for genome in population.values():
+            genome.fitness = random.gauss(generation / 100, 1.0)
+        species = FakeSpeciesSet(population)
+        best = max(population.values(), key=lambda g: g.fitness)
+        reporter.post_evaluate(config, population, species, best)
+    grown = (tracemalloc.get_traced_memory()[0] - start) / 2 ** 20
+    tracemalloc.stop()
+    return grown
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return 1000 * (time.perf_counter() - start), result
+
+
+if __name__ == "__main__":
+    config = load_config()
+    population = dict((genome.key, genome) for genome in grown_genomes(config, POP_SIZE))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'statistics.jsonl')
+        in_memory = neat.StatisticsReporter()
+        in_memory.start_generation = lambda generation: None
+        memory_reporter = evolve(in_memory, config, population, NUM_GENERATIONS)
+        log_reporter = StatisticsLogReporter(filename)
+        memory_log = evolve(log_reporter, config, population, NUM_GENERATIONS)
+
+        log = StatisticsLog(filename)
+        assert log.get_best_fitness() == [g.fitness for g in in_memory.most_fit_genomes], "best fitness differs"
+        assert log.get_fitness_mean() == in_memory.get_fitness_mean(), "mean differs"
+        assert log.get_fitness_stdev() == in_memory.get_fitness_stdev(), "stdev differs"
+        assert log.get_species_sizes() == in_memory.get_species_sizes(), "species sizes differ"
+
+        # One more generation, then the plot data again
+        evolve(log_reporter, config, population, 1, NUM_GENERATIONS)
+        evolve(in_memory, config, population, 1, NUM_GENERATIONS)
+        update_ms, read = timed(log.update)
+        assert read == 1 and len(log) == NUM_GENERATIONS + 1
+        reread_ms, _ = timed(lambda: StatisticsLog(filename))
+        rebuild_ms, _ = timed(lambda: (in_memory.get_fitness_mean(), in_memory.get_fitness_stdev(),
+                                       in_memory.get_species_sizes()))
+        log_bytes = os.path.getsize(filename)
+
+        # A job restored from an older checkpoint writes those generations again
+        evolve(log_reporter, config, population, 10, NUM_GENERATIONS - 50)
+        log.update()
+        assert log.generations[-1] == NUM_GENERATIONS - 41 and len(log) == NUM_GENERATIONS - 40, "restore not followed"
+
+    print(f"{NUM_GENERATIONS} generations of {POP_SIZE} genomes")
+    print(f"Memory kept: StatisticsReporter {memory_reporter:.2f} MB, StatisticsLogReporter {memory_log:.3f} MB "
+          f"(log file {log_bytes / 1024:.0f} kB)")
+    print(f"Refresh after one more generation: StatisticsLog.update {update_ms:.2f} ms, reading the whole log "
+          f"{reread_ms:.1f} ms, StatisticsReporter curves {rebuild_ms:.1f} ms")
+    print("Same curves from both; a restored job's generations replace the old ones")
@@ -0,0 +1,80 @@
+""" Compares the generational loop with SteadyStateEvolution: how busy the workers are kept
+and how the best fitness develops over wall-clock time, for the same number of evaluations.
+
+Worker busy time is measured inside the workers, so with more workers than cores the
+utilization still shows how often a worker had nothing to do.
+
+Run from the repository root: python -m benchmarks.steady_state
+"""
+import random
+import time
+import multiprocessing as mp
+import neat
+from neat.reporting import BaseReporter
+
+from SteadyStateEvolution import SteadyStateEvolution
+from main import eval_genome
+from benchmarks.common import load_config
+
+POP_SIZE = 150
+NUM_GENERATIONS = 10
+NUM_WORKERS = max(4, mp.cpu_count())
+SEED = 1000
+
+busy_time = mp.Value('d', 0.0)
+
+
+def timed_eval_genome(genome, config):
+    start = time.perf_counter()
+    fitness = eval_genome(genome, config)
+    with busy_time.get_lock():
+        busy_time.value += time.perf_counter() - start
+    return fitness
+
+
+class ProgressReporter(BaseReporter):
+    """ Remembers (seconds since start, best fitness so far) after every generation. """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.best = None
+        self.progress = []
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best is None or best_genome.fitness > self.best:
+            self.best = best_genome.fitness
+        self.progress.append((time.perf_counter() - self.start, self.best))
+
+
+def run(steady_state):
+    random.seed(SEED)
+    population = neat.Population(load_config(POP_SIZE))
+    population.add_reporter(neat.StatisticsReporter())
+    reporter = ProgressReporter()
+    population.add_reporter(reporter)
+    busy_time.value = 0.0
+
+    start = time.perf_counter()
+    if steady_state:
+        with SteadyStateEvolution(population, NUM_WORKERS, timed_eval_genome) as evolution:
+            evolution.run(NUM_GENERATIONS)
+    else:
+        pe = neat.ParallelEvaluator(NUM_WORKERS, timed_eval_genome)
+        population.run(pe.evaluate, NUM_GENERATIONS)
+    seconds = time.perf_counter() - start
+    return seconds, busy_time.value / (seconds * NUM_WORKERS), reporter.progress
+
+
+if __name__ == "__main__":
+    results = {
+        'generational': run(False),
+        'steady-state': run(True),
+    }
+
+    print(f"{POP_SIZE * NUM_GENERATIONS} evaluations, {NUM_WORKERS} workers, {mp.cpu_count()} CPUs")
+    for name, (seconds, utilization, progress) in results.items():
+        print(f"{name:>14}: {seconds:6.1f} s, workers busy {100 * utilization:5.1f}% of the time")
+
+    print("Best fitness over wall-clock time:")
+    for name, (seconds, utilization, progress) in results.items():
+        print(f"{name:>14}: " + "  ".join(f"{t:5.1f}s {fitness:6.2f}" for t, fitness in progress))
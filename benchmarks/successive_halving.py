@@ -0,0 +1,60 @@
+""" Compares full 1500-step episodes with SuccessiveHalvingEvaluator on the same genomes:
+physics steps, run time, and whether the genomes that reach the last horizon end up with
+the same fitness as in a full episode (they resume rather than restart, so they should),
+whether the dropped ones rank below all of them, and whether small cohorts change anything.
+
+Run from the repository root: python -m benchmarks.successive_halving
+"""
+import numpy as np
+
+from SuccessiveHalvingEvaluator import SuccessiveHalvingEvaluator
+from main import NUM_ITERATIONS, TERMINATION_POLICY
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZE = 300
+NUM_WORKERS = 4
+HORIZONS = (150, 500, NUM_ITERATIONS)
+KEEP_FRACTION = 1 / 3
+SMALL_COHORTS = 30
+
+
+if __name__ == "__main__":
+    config = load_config(POP_SIZE)
+    genomes = list(enumerate(grown_genomes(config, POP_SIZE)))
+
+    # A single horizon runs plain full episodes
+    print("Full episodes: ", end='')
+    full = SuccessiveHalvingEvaluator(NUM_WORKERS, HORIZONS[-1:], policy=TERMINATION_POLICY)
+    full.evaluate(genomes, config)
+    full.close()
+    expected = np.array([genome.fitness for genome_id, genome in genomes])
+
+    print("Successive halving: ", end='')
+    halving = SuccessiveHalvingEvaluator(NUM_WORKERS, HORIZONS, KEEP_FRACTION, TERMINATION_POLICY)
+    halving.evaluate(genomes, config)
+    halving.close()
+    fitness = np.array([genome.fitness for genome_id, genome in genomes])
+
+    walker_steps = full.history[-1][1] / halving.history[-1][1]
+    print(f"{walker_steps:.1f}x fewer walker steps, {full.history[-1][0] / halving.history[-1][0]:.1f}x faster")
+
+    finalists = np.argsort(-fitness, kind='stable')[:halving.history[-1][3]]
+    assert np.array_equal(fitness[finalists], expected[finalists]), "resumed episodes differ from full ones"
+    assert np.delete(fitness, finalists).max() < fitness[finalists].min(), "a dropped genome ties with a finalist"
+    print(f"The {len(finalists)} genomes that reached {HORIZONS[-1]} steps have their full-episode fitness, "
+          f"every dropped genome ranks below them")
+
+    print(f"Cohorts of {SMALL_COHORTS}: ", end='')
+    small = SuccessiveHalvingEvaluator(NUM_WORKERS, HORIZONS, KEEP_FRACTION, TERMINATION_POLICY, cohort_size=SMALL_COHORTS)
+    small.evaluate(genomes, config)
+    small.close()
+    # Continuous collision against the shared ground lets the other walkers of a world move
+    # a rare episode by some 1e-8 m, in chunks of eval_genome_chunk as much as here
+    small_fitness = np.array([genome.fitness for genome_id, genome in genomes])
+    assert np.allclose(small_fitness, fitness, rtol=0, atol=1e-6), "cohort size changes fitness"
+    print(f"same fitness as cohorts of {POP_SIZE // NUM_WORKERS}, "
+          f"{np.count_nonzero(small_fitness != fitness)} of {POP_SIZE} off by up to {np.abs(small_fitness - fitness).max():.1g}")
+
+    best = np.argsort(-expected)[:len(finalists)]
+    print(f"{len(np.intersect1d(best, finalists))} of the {len(finalists)} best genomes by full episodes "
+          f"reached the last horizon, best fitness {fitness.max():.3f} against {expected.max():.3f}")
@@ -0,0 +1,208 @@
+""" Headless throughput suite for the simulation and the evolution loop.
+
+Run from the repository root:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.1
+    python -m benchmarks.suite --checks-only
+
+Correctness checks run first: the faster code paths must give the results of the ones
+they replace. The run fails (exit code 1) if any check fails, and with --baseline also if
+any metric got worse than the baseline by more than the threshold fraction. Every number
+is written to the JSON file together with the machine it was measured on.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+import multiprocessing as mp
+import neat
+import numpy as np
+
+from SimulationForParallel import SimulationForParallel
+from main import eval_genome
+from benchmarks.common import load_config, grown_genomes
+from benchmarks import population_network, chunk_size, compiled_network, shared_networks, terrain
+
+SEED = 1000
+PHYSICS_STEPS = 20000
+SERIAL_GENOMES = 100
+PARALLEL_GENOMES = 300
+GENERATION_POP_SIZES = (300, 3000)
+CHECK_GENOMES = 40
+
+
+# Every module's check_matches(config, genomes) raises AssertionError when the results differ
+CHECKS = (population_network.check_matches, chunk_size.check_matches, compiled_network.check_matches,
+          shared_networks.check_matches, terrain.check_matches)
+
+
+def run_checks():
+    """ Runs every check on the same grown genomes, returns the names of the ones that failed. """
+    config = load_config()
+    failed = []
+    for check in CHECKS:
+        name = check.__module__.rsplit('.', 1)[-1]
+        genomes = grown_genomes(config, CHECK_GENOMES, seed=SEED)
+        try:
+            check(config, genomes)
+        except AssertionError as error:
+            print(f"{name:>40}: FAILED {error}", flush=True)
+            failed.append(name)
+        else:
+            print(f"{name:>40}: ok", flush=True)
+    return failed
+
+
+def physics_steps_per_second(num_steps=PHYSICS_STEPS):
+    """ Steps a single walker driven by seeded random efforts, rebuilding it when it falls. """
+    rng = np.random.default_rng(SEED)
+    efforts = rng.random((num_steps, 4))
+    sim = SimulationForParallel()
+    sim.make_walker()
+
+    start = time.perf_counter()
+    for effort in efforts:
+        if sim.walker.is_dead():
+            sim.reset_walkers(1)
+        sim.update(effort)
+    return num_steps / (time.perf_counter() - start)
+
+
+def serial_evaluations_per_second(config, genomes):
+    start = time.perf_counter()
+    for genome in genomes:
+        eval_genome(genome, config)
+    return len(genomes) / (time.perf_counter() - start)
+
+
+def _peak_rss(barrier=None):
+    # A worker waiting at the barrier takes no other task, so with one task per worker
+    # every worker answers exactly once
+    if barrier is not None:
+        barrier.wait(timeout=60)
+    # ru_maxrss is in kilobytes on Linux
+    return os.getpid(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parallel_evaluations_per_second(config, genomes, num_workers):
+    """ Returns the throughput and the highest peak RSS (MB) among the workers. """
+    pe = neat.ParallelEvaluator(num_workers, eval_genome)
+    start = time.perf_counter()
+    pe.evaluate(list(enumerate(genomes)), config)
+    throughput = len(genomes) / (time.perf_counter() - start)
+
+    with mp.Manager() as manager:
+        barrier = manager.Barrier(num_workers)
+        peaks = dict(pe.pool.map(_peak_rss, [barrier] * num_workers, chunksize=1))
+    assert len(peaks) == num_workers, "not every worker was sampled"
+    del pe
+    return throughput, max(peaks.values())
+
+
+def generations_per_minute(pop_size, num_generations, num_workers):
+    random.seed(SEED)
+    config = load_config(pop_size)
+    population = neat.Population(config)
+    pe = neat.ParallelEvaluator(num_workers, eval_genome)
+
+    start = time.perf_counter()
+    population.run(pe.evaluate, num_generations)
+    minutes = (time.perf_counter() - start) / 60
+    del pe
+    return num_generations / minutes
+
+
+def run_suite(worker_counts, num_generations):
+    metrics = {}
+
+    def record(name, value, unit, better='higher'):
+        metrics[name] = {'value': value, 'unit': unit, 'better': better}
+        print(f"{name:>40}: {value:12.2f} {unit}", flush=True)
+
+    record('physics_steps_per_s', physics_steps_per_second(), 'steps/s')
+
+    config = load_config()
+    genomes = grown_genomes(config, PARALLEL_GENOMES, seed=SEED)
+    record('serial_evals_per_s', serial_evaluations_per_second(config, genomes[:SERIAL_GENOMES]), 'genomes/s')
+
+    for num_workers in worker_counts:
+        throughput, peak_rss = parallel_evaluations_per_second(config, genomes, num_workers)
+        record(f'parallel_evals_per_s_{num_workers}_workers', throughput, 'genomes/s')
+        record(f'worker_peak_rss_{num_workers}_workers', peak_rss, 'MB', better='lower')
+
+    for pop_size in GENERATION_POP_SIZES:
+        record(f'generations_per_min_pop_{pop_size}',
+               generations_per_minute(pop_size, num_generations, max(worker_counts)), 'generations/min')
+
+    record('main_peak_rss', _peak_rss()[1], 'MB', better='lower')
+    return metrics
+
+
+def regressions(metrics, baseline, threshold):
+    """ Lists the metrics that got worse than the baseline by more than threshold (a fraction). """
+    found = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], metric['value']
+        if metric['better'] == 'higher':
+            worse = new < old * (1 - threshold)
+        else:
+            worse = new > old * (1 + threshold)
+        if worse:
+            found.append(f"{name}: {old:.2f} -> {new:.2f} {metric['unit']}")
+    return found
+
+
+def default_worker_counts():
+    cpus = mp.cpu_count()
+    return sorted(set([1, max(1, cpus // 2), cpus]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help="results JSON of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    parser.add_argument('--generations', type=int, default=2, help="generations timed per population size")
+    parser.add_argument('--checks-only', action='store_true', help="run the correctness checks, no timings")
+    args = parser.parse_args()
+
+    failed = run_checks()
+    if args.checks_only:
+        sys.exit(1 if failed else 0)
+
+    metrics = run_suite(args.workers, args.generations)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': mp.cpu_count(),
+            'seed': SEED,
+        },
+        'metrics': metrics,
+        'failed_checks': failed,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    found = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        found = regressions(metrics, baseline, args.threshold)
+        for line in found:
+            print("REGRESSION " + line)
+    for name in failed:
+        print("CHECK FAILED " + name)
+    if found or failed:
+        sys.exit(1)
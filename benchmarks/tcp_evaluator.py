@@ -0,0 +1,121 @@
+""" Runs TcpEvaluator with worker processes on localhost: checks the fitness values against
+serial evaluation, also when a worker is killed or hangs mid-generation, and compares its
+throughput with neat.ParallelEvaluator. Also checks that an exception in a worker reaches
+evaluate() and that a genome crashing every worker fails the run instead of hanging it.
+
+Run from the repository root: python -m benchmarks.tcp_evaluator
+"""
+import os
+import signal
+import threading
+import time
+import multiprocessing as mp
+import neat
+
+from TcpEvaluator import TcpEvaluator, run_worker
+from CostAwareEvaluator import RemoteTraceback
+from main import eval_genome
+from benchmarks.common import load_config, grown_genomes
+
+NUM_GENOMES = 60
+NUM_WORKERS = 3
+HEARTBEAT_TIMEOUT = 3.0
+BAD_GENOME = 7
+
+
+def failing_eval(genome, config):
+    if genome.key == BAD_GENOME:
+        raise ValueError("genome {0} cannot walk".format(genome.key))
+    return eval_genome(genome, config)
+
+
+def crashing_eval(genome, config):
+    if genome.key == BAD_GENOME:
+        os._exit(1)
+    return eval_genome(genome, config)
+
+
+def evaluate(evaluator, genomes, config):
+    for genome in genomes:
+        genome.fitness = None
+    start = time.perf_counter()
+    evaluator.evaluate(list(enumerate(genomes)), config)
+    return [genome.fitness for genome in genomes], time.perf_counter() - start
+
+
+def start_worker(address, eval_function=eval_genome):
+    process = mp.Process(target=run_worker, args=(address, eval_function))
+    process.start()
+    return process
+
+
+if __name__ == "__main__":
+    config = load_config()
+    genomes = grown_genomes(config, NUM_GENOMES)
+    expected = [eval_genome(genome, config) for genome in genomes]
+
+    evaluator = TcpEvaluator(('127.0.0.1', 0), chunk_size=4, heartbeat_timeout=HEARTBEAT_TIMEOUT)
+    workers = [start_worker(evaluator.address) for _ in range(NUM_WORKERS)]
+
+    fitnesses, seconds = evaluate(evaluator, genomes, config)
+    assert fitnesses == expected
+    print(f"TcpEvaluator, {NUM_WORKERS} workers: {NUM_GENOMES / seconds:7.1f} genomes/s, same fitness as serial")
+
+    pe = neat.ParallelEvaluator(NUM_WORKERS, eval_genome)
+    fitnesses, seconds = evaluate(pe, genomes, config)
+    del pe
+    print(f"ParallelEvaluator, {NUM_WORKERS} workers: {NUM_GENOMES / seconds:7.1f} genomes/s")
+
+    # A worker that crashes closes its connection
+    threading.Timer(0.5, os.kill, (workers[0].pid, signal.SIGKILL)).start()
+    fitnesses, seconds = evaluate(evaluator, genomes, config)
+    assert fitnesses == expected and evaluator.requeued_tasks > 0
+    print(f"Killed worker: tasks requeued, same fitness, {seconds:.1f} s")
+    workers[0] = start_worker(evaluator.address)
+
+    # A worker that hangs keeps its connection but stops sending heartbeats
+    requeued = evaluator.requeued_tasks
+    threading.Timer(0.5, os.kill, (workers[1].pid, signal.SIGSTOP)).start()
+    fitnesses, seconds = evaluate(evaluator, genomes, config)
+    assert fitnesses == expected and evaluator.requeued_tasks > requeued
+    print(f"Hung worker: dropped after its heartbeats stopped, same fitness, {seconds:.1f} s")
+    os.kill(workers[1].pid, signal.SIGCONT)
+
+    evaluator.close()
+    for worker in workers:
+        worker.join(timeout=10)
+    assert not any(worker.is_alive() for worker in workers)
+
+    # An exception in the evaluation comes back with the worker's traceback, the worker stays up
+    evaluator = TcpEvaluator(('127.0.0.1', 0), chunk_size=4, heartbeat_timeout=HEARTBEAT_TIMEOUT)
+    workers = [start_worker(evaluator.address, failing_eval) for _ in range(NUM_WORKERS)]
+    bad = [genome for genome in genomes if genome.key == BAD_GENOME]
+    assert bad, "no genome to fail on"
+    for _ in range(2):
+        try:
+            evaluate(evaluator, genomes, config)
+        except ValueError as error:
+            assert isinstance(error.__cause__, RemoteTraceback) and 'failing_eval' in str(error.__cause__)
+        else:
+            raise AssertionError("the worker's exception was swallowed")
+    good = [genome for genome in genomes if genome.key != BAD_GENOME]
+    assert evaluate(evaluator, good, config)[0] == [f for genome, f in zip(genomes, expected) if genome.key != BAD_GENOME]
+    assert all(worker.is_alive() for worker in workers) and evaluator.requeued_tasks == 0
+    print("Worker exception: raised by evaluate() with the worker's traceback, workers kept running")
+    evaluator.close()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    # A genome that kills every worker it reaches fails the run once max_requeues is used up
+    evaluator = TcpEvaluator(('127.0.0.1', 0), chunk_size=4, heartbeat_timeout=HEARTBEAT_TIMEOUT, max_requeues=2)
+    workers = [start_worker(evaluator.address, crashing_eval) for _ in range(NUM_WORKERS)]
+    try:
+        evaluate(evaluator, genomes, config)
+    except RuntimeError as error:
+        print(f"Crashing genome: {error}")
+    else:
+        raise AssertionError("evaluate() finished with a genome crashing every worker")
+    evaluator.close()
+    for worker in workers:
+        worker.join(timeout=10)
+    assert not any(worker.is_alive() for worker in workers)
@@ -0,0 +1,119 @@
+""" Measures what telemetry costs the evaluation: main.simulate_genome with telemetry off,
+recording every step and every 4th step, and eval_genome_chunk recording the 8 walkers
+furthest ahead. Checks that the fitness stays the same, that every recorded row reaches the
+disk with its genome's key, and that ParallelEvaluator workers write their chunks as well.
+
+Run from the repository root: python -m benchmarks.telemetry
+"""
+import os
+import time
+import tempfile
+import neat
+import numpy as np
+
+import main
+import Telemetry
+from Telemetry import load_telemetry, telemetry_files, KEY_COLUMNS
+from benchmarks.common import load_config, grown_genomes
+
+NUM_GENOMES = 60
+CHUNK_SIZE = 30
+NUM_WORKERS = 2
+EPISODE_STEPS = 1000
+
+
+def set_telemetry(directory, every=1, top_k=None):
+    """ Switches main's telemetry, closing this process' recorder so the next episode starts a new one. """
+    if Telemetry._recorder is not None:
+        Telemetry._recorder.close()
+        Telemetry._recorder = None
+    main.TELEMETRY_DIRECTORY = directory
+    main.TELEMETRY_EVERY = every
+    main.TELEMETRY_TOP_K = top_k
+
+
+def run_serial(genomes, config):
+    start = time.perf_counter()
+    results = [main.simulate_genome(genome, config) for genome in genomes]
+    return time.perf_counter() - start, results
+
+
+def run_chunks(genomes, config):
+    start = time.perf_counter()
+    fitness = []
+    for i in range(0, len(genomes), CHUNK_SIZE):
+        fitness.extend(main.eval_genome_chunk(genomes[i:i + CHUNK_SIZE], config))
+    return time.perf_counter() - start, fitness
+
+
+def check_keys(directory, genomes):
+    """ Checks that the rows on disk carry exact integer keys, returns the data. """
+    data = load_telemetry(directory)
+    for column in KEY_COLUMNS:
+        assert data[column].dtype == np.int64, "{0} is {1}".format(column, data[column].dtype)
+    assert set(data['genome_key'].tolist()) <= set(genome.key for genome in genomes), "unknown genome keys"
+    # Chunk files are named after the process that wrote them
+    names = telemetry_files(directory)
+    for file, pid in set(zip(data['file'].tolist(), data['pid'].tolist())):
+        assert names[file].startswith('telemetry-{0}-'.format(pid)), "{0} holds rows of {1}".format(names[file], pid)
+    return data
+
+
+def recorded_rows(directory, genomes):
+    recorder = Telemetry._recorder
+    rows, dropped = recorder.rows, recorder.dropped
+    set_telemetry(None)
+    data = check_keys(directory, genomes)
+    on_disk = len(data['step'])
+    assert on_disk == rows, "{0} rows recorded, {1} on disk".format(rows, on_disk)
+    assert set(data['pid'].tolist()) == {os.getpid()}, "rows of other processes"
+    return rows, dropped
+
+
+if __name__ == "__main__":
+    main.NUM_ITERATIONS = EPISODE_STEPS
+    config = load_config()
+    genomes = grown_genomes(config, NUM_GENOMES)
+
+    print(f"{'run':>26} {'seconds':>8} {'genomes/s':>10} {'overhead':>9} {'rows':>8} {'dropped':>8}")
+    set_telemetry(None)
+    baseline, expected = run_serial(genomes, config)
+    print(f"{'single, off':>26} {baseline:8.2f} {NUM_GENOMES / baseline:10.1f}")
+    for every in (1, 4):
+        with tempfile.TemporaryDirectory() as directory:
+            set_telemetry(directory, every)
+            seconds, results = run_serial(genomes, config)
+            assert results == expected, "telemetry changed the episodes"
+            rows, dropped = recorded_rows(directory, genomes)
+            if every == 1:
+                assert rows == sum(steps for fitness, steps in expected), "not every step was recorded"
+        print(f"{'single, every ' + str(every) + ' steps':>26} {seconds:8.2f} {NUM_GENOMES / seconds:10.1f} "
+              f"{100 * (seconds / baseline - 1):8.1f}% {rows:8d} {dropped:8d}")
+
+    set_telemetry(None)
+    baseline, expected_chunks = run_chunks(genomes, config)
+    print(f"{'chunks of 30, off':>26} {baseline:8.2f} {NUM_GENOMES / baseline:10.1f}")
+    with tempfile.TemporaryDirectory() as directory:
+        set_telemetry(directory, 1, 8)
+        seconds, fitness = run_chunks(genomes, config)
+        assert fitness == expected_chunks, "telemetry changed the episodes"
+        rows, dropped = recorded_rows(directory, genomes)
+    print(f"{'chunks of 30, top 8':>26} {seconds:8.2f} {NUM_GENOMES / seconds:10.1f} "
+          f"{100 * (seconds / baseline - 1):8.1f}% {rows:8d} {dropped:8d}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        set_telemetry(directory)
+        evaluator = neat.ParallelEvaluator(NUM_WORKERS, main.eval_genome)
+        evaluator.evaluate(list(enumerate(genomes)), config)
+        # The workers write what they have left when they exit
+        evaluator.pool.close()
+        evaluator.pool.join()
+        set_telemetry(None)
+        data = check_keys(directory, genomes)
+        on_disk = len(data['step'])
+        assert on_disk == sum(steps for fitness, steps in expected), "worker rows missing"
+        # Every genome walked once, in one of the workers
+        for genome, (fitness, steps) in zip(genomes, expected):
+            assert np.count_nonzero(data['genome_key'] == genome.key) == steps, "rows of genome {0}".format(genome.key)
+        workers = len(set(data['pid'].tolist()))
+    print(f"ParallelEvaluator with {NUM_WORKERS} workers wrote all {on_disk} rows from {workers} processes")
@@ -0,0 +1,46 @@
+""" Measures how much of a 1500-step generation the termination triggers save on the
+in-process Simulation path (drawing is skipped, it is capped at real time).
+
+Run from the repository root: python -m benchmarks.termination
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import math
+import time
+
+from Simulation import Simulation
+from PopulationNetwork import PopulationNetwork
+from TerminationPolicy import TerminationPolicy
+from benchmarks.common import load_config, grown_genomes
+
+POP_SIZE = 300
+NUM_ITERATIONS = 1500
+POLICIES = {
+    'never': TerminationPolicy(min_head_height=-math.inf),
+    'head': TerminationPolicy(),
+    'head+stall+tip': TerminationPolicy(stall_steps=300, max_torso_angle=math.radians(60)),
+}
+
+
+def run_generation(sim, genomes, config, policy):
+    sim.reset()
+    sim.make_walkers(len(genomes))
+    net = PopulationNetwork.create(genomes, config)
+
+    start = time.perf_counter()
+    steps = 0
+    while steps < NUM_ITERATIONS and not sim.terminate_walkers(policy):
+        sim.update(net.activate(sim.infos_array()))
+        steps += 1
+    return steps, time.perf_counter() - start, [walker.fitness() for walker in sim.walkers]
+
+
+if __name__ == "__main__":
+    config = load_config(POP_SIZE)
+    genomes = grown_genomes(config, POP_SIZE)
+    sim = Simulation()
+
+    for name, policy in POLICIES.items():
+        steps, seconds, fitnesses = run_generation(sim, genomes, config, policy)
+        print(f"{name:>16}: {steps:5d} steps, {seconds:6.2f} s, best fitness {max(fitnesses):.3f}")
@@ -0,0 +1,137 @@
+""" Checks the streamed ground: a walker dragged 10 km along uneven terrain keeps the
+number of ground segments and the step time flat once it left the segments built at
+reset, every worker process generates the same segments, and episodes on it stay
+deterministic: the same in the pooled world whatever ran before, in a newly built world,
+in ParallelEvaluator workers and in a chunk as alone. Also compares the evaluation speed
+with the old ground box.
+
+Run from the repository root: python -m benchmarks.terrain
+"""
+import time
+import multiprocessing as mp
+import neat
+
+import main
+import SimulationForParallel as simulation_module
+from SimulationForParallel import SimulationForParallel
+from Terrain import terrain_profile, TerrainProfile
+from benchmarks import chunk_size
+from benchmarks.common import load_config, grown_genomes
+
+TERRAIN = dict(seed=1, max_slope=0.1, max_step=0.05)
+FLAT = dict(seed=1)
+DRAG_DISTANCE = 10000.0
+DRAG_SPEED = 0.1  # meters per step
+NUM_SEGMENTS = 5000
+NUM_GENOMES = 60
+CHUNK_SIZE = 30
+NUM_WORKERS = 2
+
+
+def check_matches(config, genomes):
+    """ On uneven terrain, a genome must walk the same in a chunk as alone. """
+    terrain = main.TERRAIN
+    main.TERRAIN = TERRAIN
+    try:
+        chunk_size.check_matches(config, genomes)
+    finally:
+        main.TERRAIN = terrain
+
+
+def drag(terrain):
+    """ Pulls a walker along the ground, returns the segment counts seen before and after it
+    left the segments built at reset, and the ms per step over the first and the last
+    thousand steps. """
+    sim = SimulationForParallel(terrain_profile(**terrain))
+    sim.reset_walkers(1)
+    walker = sim.walker
+    built, counts = set(), set()
+    times = []
+    steps = int(DRAG_DISTANCE / DRAG_SPEED)
+    for step in range(steps):
+        start = time.perf_counter()
+        for body in walker._bodies():
+            (x, y), angle = body.position, body.angle
+            body.transform = ((x + DRAG_SPEED, y), angle)
+        sim.step()
+        times.append(time.perf_counter() - start)
+        (counts if sim.terrain.streamed else built).add(len(sim.terrain.segments))
+    return built, counts, walker.info().hDistance, 1000 * sum(times[:1000]) / 1000, 1000 * sum(times[-1000:]) / 1000
+
+
+def segments(terrain):
+    profile = terrain_profile(**terrain)
+    return [profile.segment(i) for i in range(NUM_SEGMENTS)]
+
+
+def run_serial(genomes, config):
+    start = time.perf_counter()
+    fitness = [main.eval_genome(genome, config) for genome in genomes]
+    return time.perf_counter() - start, fitness
+
+
+def run_fresh(genomes, config):
+    """ eval_genome in a newly built world every time. """
+    fitness = []
+    for genome in genomes:
+        simulation_module._pooled_simulation = None
+        fitness.append(main.eval_genome(genome, config))
+    return fitness
+
+
+def run_chunks(genomes, config):
+    fitness = []
+    for i in range(0, len(genomes), CHUNK_SIZE):
+        fitness.extend(main.eval_genome_chunk(genomes[i:i + CHUNK_SIZE], config))
+    return fitness
+
+
+if __name__ == "__main__":
+    built, counts, travelled, first_ms, last_ms = drag(TERRAIN)
+    print(f"Dragged {travelled:.0f} m: {max(built)} segments in the world as built at reset, "
+          f"{min(counts)}-{max(counts)} once streaming, "
+          f"{first_ms:.3f} ms per step over the first 1000 steps, {last_ms:.3f} ms over the last")
+    assert len(built) == 1, "segments changed before the walker left the ones built at reset"
+    assert max(counts) - min(counts) <= 2, "the segment count grew with the distance"
+
+    # Asked for in another order, and in other processes: the same segments
+    expected = segments(TERRAIN)
+    profile = TerrainProfile(**TERRAIN)
+    assert [profile.segment(i) for i in reversed(range(NUM_SEGMENTS))][::-1] == expected, "terrain depends on order"
+    assert terrain_profile(**TERRAIN) is terrain_profile(**TERRAIN), "profile not cached"
+    with mp.Pool(NUM_WORKERS) as pool:
+        for worker_segments in pool.map(segments, [TERRAIN] * NUM_WORKERS):
+            assert worker_segments == expected, "a worker generated other terrain"
+    assert segments(dict(TERRAIN, seed=2)) != expected, "the seed changes nothing"
+    print(f"The first {NUM_SEGMENTS} segments are the same in every process and access order")
+
+    config = load_config()
+    genomes = grown_genomes(config, NUM_GENOMES)
+    print(f"{'ground':>22} {'seconds':>8} {'genomes/s':>10}")
+    for name, terrain in (('box', None), ('flat segments', FLAT), ('slopes and steps', TERRAIN)):
+        main.TERRAIN = terrain
+        seconds, fitness = run_serial(genomes, config)
+        print(f"{name:>22} {seconds:8.2f} {NUM_GENOMES / seconds:10.1f}")
+        if terrain is None:
+            on_box = fitness
+            continue
+        # The pooled world evaluated other genomes in between
+        again = run_serial(genomes[::-1], config)[1][::-1]
+        assert again == fitness, "episodes depend on the ones before"
+        assert run_fresh(genomes, config) == fitness, "the pooled world walks differently from a new one"
+        if terrain is FLAT:
+            same = sum(a == b for a, b in zip(fitness, on_box))
+            print(f"{'':>22} {same}/{NUM_GENOMES} fitnesses equal to the box's")
+
+    evaluator = neat.ParallelEvaluator(NUM_WORKERS, main.eval_genome)
+    evaluator.evaluate(list(enumerate(genomes)), config)
+    evaluator.pool.close()
+    evaluator.pool.join()
+    assert [genome.fitness for genome in genomes] == fitness, "ParallelEvaluator workers walk on other terrain"
+    print(f"ParallelEvaluator with {NUM_WORKERS} workers gives the same fitness")
+
+    # Compared against chunks of one, eval_genome's FeedForwardNetwork may round the last bit differently
+    alone = [main.eval_genome_chunk([genome], config)[0] for genome in genomes]
+    assert run_chunks(genomes, config) == alone, "a genome walks differently with chunk partners"
+    check_matches(config, genomes)
+    print(f"Chunks of {CHUNK_SIZE}, 3 and 8: same fitness as walking alone")
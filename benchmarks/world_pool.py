@@ -0,0 +1,58 @@
+""" Checks that a pooled, reset simulation replays episodes bit-identically to a freshly
+built one and measures the setup cost per genome of both.
+
+Run from the repository root: python -m benchmarks.world_pool
+"""
+import time
+import neat
+import numpy as np
+
+from SimulationForParallel import SimulationForParallel, pooled_simulation
+from benchmarks.common import load_config, grown_genomes
+
+NUM_GENOMES = 40
+NUM_ITERATIONS = 1500
+SETUP_REPEATS = 2000
+
+
+def fresh_simulation():
+    sim = SimulationForParallel()
+    sim.make_walker()
+    return sim
+
+
+def trajectory(sim, net):
+    states = []
+    for _ in range(NUM_ITERATIONS):
+        if sim.walker.is_dead():
+            break
+        states.append(sim.walker.state.copy())
+        sim.update(net.activate(sim.walker.info().as_array()))
+    return np.array(states), sim.walker.fitness()
+
+
+def check_identical(genomes, config):
+    for genome in genomes:
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        fresh_states, fresh_fitness = trajectory(fresh_simulation(), net)
+        pooled_states, pooled_fitness = trajectory(pooled_simulation(), net)
+        assert fresh_fitness == pooled_fitness, (genome.key, fresh_fitness, pooled_fitness)
+        assert np.array_equal(fresh_states, pooled_states), genome.key
+
+
+def time_setup(make):
+    start = time.perf_counter()
+    for _ in range(SETUP_REPEATS):
+        make()
+    return (time.perf_counter() - start) / SETUP_REPEATS
+
+
+if __name__ == "__main__":
+    config = load_config()
+    check_identical(grown_genomes(config, NUM_GENOMES), config)
+    print(f"{NUM_GENOMES} episodes bit-identical between fresh and pooled worlds")
+
+    fresh = time_setup(fresh_simulation)
+    pooled = time_setup(pooled_simulation)
+    print(f"setup per genome: fresh {fresh * 1e6:.1f} us, pooled {pooled * 1e6:.1f} us, "
+          f"speedup {fresh / pooled:.1f}x")
@@ -1,90 +1,261 @@
-from Simulation import Simulation
-from SimulationForParallel import SimulationForParallel
+# Workers (spawned ones import this file again) only need Box2D, neat and the walker code;
+# Simulation (pygame), ReplayRecorder, ReplayPlayer and visualize (matplotlib, graphviz)
+# are imported where rendering or plotting is actually requested
+from SimulationForParallel import pooled_simulation
+from Terrain import terrain_profile
+from PopulationNetwork import PopulationNetwork
+from CompiledNetwork import compiled_network
+from ChunkedEvaluator import ChunkedEvaluator
+from CostAwareEvaluator import CostAwareEvaluator
+from TcpEvaluator import TcpEvaluator
+from SuccessiveHalvingEvaluator import SuccessiveHalvingEvaluator
+from SharedNetworkEvaluator import SharedNetworkEvaluator
+from SteadyStateEvolution import SteadyStateEvolution
+from IslandEvolution import IslandEvolution
+from VectorizedSpeciesSet import VectorizedSpeciesSet, use_vectorized_speciation
+from TerminationPolicy import TerminationPolicy
+from FitnessCache import FitnessCache
+from StatisticsLog import StatisticsLogReporter
+from Telemetry import telemetry_recorder
+from AsyncCheckpointer import AsyncCheckpointer
+from PhaseTimingReporter import PhaseTimingReporter, enable_phase_timing, flush_phase_timings, phase_timing_initializer
 import neat
 import random
 import time
 import multiprocessing as mp
-import visualize
 
 EPOCHS_WITHOUT_RENDER = 1
 EPOCHS_WITH_RENDER = 0
 
+# Genomes simulated together in one world per worker task, 1 sends single genomes
+EVALUATION_CHUNK_SIZE = 1
+
+# Hand out the genomes by their predicted episode cost, longest first, and let idle
+# workers steal from busy ones; replaces EVALUATION_CHUNK_SIZE
+COST_AWARE_SCHEDULING = False
+
+# Walk every genome for the first horizon, then only the best third on to the next ones,
+# resuming where they stopped; the last horizon should be NUM_ITERATIONS. None runs full episodes
+SUCCESSIVE_HALVING_HORIZONS = None
+# SUCCESSIVE_HALVING_HORIZONS = (150, 500, 1500)
+SUCCESSIVE_HALVING_KEEP = 1 / 3
+
+# Put each generation's networks into shared memory once and send the workers only
+# indices, instead of pickling every genome; for big populations of small networks
+SHARED_MEMORY_NETWORKS = False
+
+# Evaluate on other machines: set to ('0.0.0.0', 5555) and start workers on every
+# machine with: python TcpEvaluator.py THIS_HOST:5555 --processes N
+DISTRIBUTED_ADDRESS = None
+# Genomes per task sent to a distributed worker
+DISTRIBUTED_TASK_SIZE = 4
+
+# Replace one genome at a time instead of whole generations, so no worker waits for the
+# slowest walker; EPOCHS_WITHOUT_RENDER then counts pop_size evaluations per epoch
+STEADY_STATE = False
+
+# Evolve this many separate populations of pop_size, one per process, instead of one
+# population; every MIGRATION_INTERVAL generations each sends its best MIGRANTS genomes to
+# another island ('ring' or 'random'). Islands start new populations, no checkpoints
+ISLANDS = None
+# ISLANDS = mp.cpu_count()
+MIGRATION_INTERVAL = 10
+MIGRANTS = 2
+MIGRATION_TOPOLOGY = 'ring'
+
+# When a walker's episode ends; the stall and tip-over triggers are off unless set
+TERMINATION_POLICY = TerminationPolicy(min_head_height=0.025, stall_steps=None, max_torso_angle=None)
+NUM_ITERATIONS = 1500
+# Stream the ground in segments from a seed around the walkers instead of the 100 m box,
+# so long episodes never run off its end; slopes and steps make it uneven. Every worker
+# generates the same terrain for the same settings. Chunk partners change a genome's fitness
+# no more than on the box (a rare 1e-8 m from continuous collision) until a walker leaves the
+# first 100 m (Terrain.reach), from then on they do. None keeps the box
+TERRAIN = None
+# TERRAIN = dict(seed=1, max_slope=0.1, max_step=0.05)
+# Physics steps per network activation, the motor targets are held in between;
+# 4 runs the controller at 25 Hz against the 100 Hz physics (TARGET_FPS)
+CONTROL_DECIMATION = 1
+
+# Reuse the fitness of genomes that were simulated before (elites, clones)
+CACHE_FITNESS = True
+FITNESS_CACHE_SIZE = 10000
+# Fraction of cache hits simulated again to make sure the episode is deterministic
+FITNESS_CACHE_CHECK_RATE = 0.0
+
+# Compiled networks kept per process, elites and parents are not compiled again
+NETWORK_CACHE_SIZE = 1000
+
+# Speciate with genome distances computed in numpy batches; same species as the stock
+# DefaultSpeciesSet, pays off from a few thousand genomes
+VECTORIZED_SPECIATION = False
+
+# Copy every walker's state and joint efforts at every control step into .npz chunks in
+# this directory, written by a background thread in each worker; None turns it off
+TELEMETRY_DIRECTORY = None
+# Only every Nth step, and only the TOP_K walkers furthest ahead of a chunk's world
+TELEMETRY_EVERY = 1
+TELEMETRY_TOP_K = None
+
 # Checkpoints
 LOAD_FROM_CHECKPOINT = True
 CHECKPOINT_RESTORE_FILE = 'test_results/test4/checkpoints/checkpoint-2999'
 # CHECKPOINT_RESTORE_FILE = 'test_results/test8/checkpoints/checkpoint-2999'
 CHECKPOINT_SAVE_FILE = 'checkpoints/checkpoint-'
 CHECKPOINT_STEP = 20
+# Every Nth checkpoint is a full snapshot, the others only store genomes new since then
+CHECKPOINT_FULL_INTERVAL = 10
 SAVE_CHECKPOINTS = False
 
 # Learning reports
+# Append per-generation fitness and species sizes to this file instead of keeping every
+# generation in memory; watch it live with: python visualize.py statistics.jsonl
+# A restored run appends to its log, so give every new run a file of its own
+STATISTICS_LOG = None
+# STATISTICS_LOG = 'statistics.jsonl'
 REPORT_LEARNING_INFO = False
+REPORT_PHASE_TIMINGS = False
+PHASE_TIMINGS_FILE = 'phase-timings.csv'
 DRAW_RESULTS_GRAPHS = False
 
 # Render results
 DISPLAY_POPULATION_AT_FINISH = False
 DISPLAY_WINNER_IN_LOOP = True
+# Simulate the winner once and loop over the recording instead of re-simulating every loop
+REPLAY_WINNER = True
+REPLAY_FILE = 'winner.replay'
+# Draw every Nth physics step only; without real time pacing physics runs at full speed
+RENDER_FRAME_SKIP = 1
+RENDER_REAL_TIME = True
+RENDER_THREADED = False
+# Video file ('winner.mp4', needs ffmpeg) or image sequence ('frames/frame-{:05d}.png') to save frames to
+RENDER_OUTPUT = None
+# No window, the winner is played once; meant for servers together with RENDER_OUTPUT
+RENDER_HEADLESS = False
+# Walkers furthest ahead drawn body by body (None draws all), and at most how many of the
+# others in view are drawn as markers; keeps frames cheap for big populations
+RENDER_DETAIL_WALKERS = 10
+RENDER_GHOST_WALKERS = 200
 
 def eval_genome(genome, config):
     genome.fitness = 0.0
-    sim = SimulationForParallel()
-    sim.make_walker()
-    
-    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    return simulate_genome(genome, config)[0]
+
+def simulate_genome(genome, config):
+    """ Runs the episode of eval_genome, returns the fitness and how many steps it lasted. """
+    return run_episode(compiled_network(genome, config, NETWORK_CACHE_SIZE), genome.key)
 
-    NUM_ITERATIONS = 1500
-    for _ in range(NUM_ITERATIONS):
-        if (sim.walker.is_dead()):
+def run_episode(net, genome_key=-1, num_iterations=None):
+    """ simulate_genome for a network that is already built; the key only labels telemetry.
+    The episode lasts NUM_ITERATIONS steps unless num_iterations is given. """
+    num_iterations = NUM_ITERATIONS if num_iterations is None else num_iterations
+    sim = pooled_simulation(terrain=TERRAIN)
+    telemetry = None
+    if TELEMETRY_DIRECTORY is not None:
+        telemetry = telemetry_recorder(TELEMETRY_DIRECTORY, TELEMETRY_EVERY, TELEMETRY_TOP_K)
+        telemetry.begin_episode((genome_key,))
+
+    steps = 0
+    while steps < num_iterations:
+        substeps = min(CONTROL_DECIMATION, num_iterations - steps)
+        if TERMINATION_POLICY.should_terminate(sim.walker, substeps):
             break
         inputs = sim.walker.info().as_array()
         outputs = net.activate(inputs)
-        sim.update(outputs)
+        if telemetry is not None:
+            telemetry.record(steps, sim.states[:1], outputs)
+        sim.update(outputs, substeps)
+        steps += substeps
     
-    return sim.walker.fitness()
+    flush_phase_timings()
+    return sim.walker.fitness(), steps
+
+def eval_island_genomes(genomes, config):
+    """ An island's fitness function, the island's own process walks its genomes one by one. """
+    for genome_id, genome in genomes:
+        genome.fitness = eval_genome(genome, config)
+
+def eval_genome_chunk(genomes, config):
+    sim = pooled_simulation(len(genomes), TERRAIN)
+    net = PopulationNetwork.create(genomes, config)
+    alive = list(range(len(genomes)))
+    telemetry = None
+    if TELEMETRY_DIRECTORY is not None:
+        telemetry = telemetry_recorder(TELEMETRY_DIRECTORY, TELEMETRY_EVERY, TELEMETRY_TOP_K)
+        telemetry.begin_episode([genome.key for genome in genomes])
+
+    for step in range(0, NUM_ITERATIONS, CONTROL_DECIMATION):
+        substeps = min(CONTROL_DECIMATION, NUM_ITERATIONS - step)
+        for i in alive:
+            walker = sim.walkers[i]
+            if TERMINATION_POLICY.should_terminate(walker, substeps):
+                walker.terminate()
+
+        alive = [i for i in alive if not sim.walkers[i].terminated]
+        if not alive:
+            break
+        efforts = net.activate(sim.infos_array())
+        if telemetry is not None:
+            telemetry.record(step, sim.states[:len(genomes)], efforts, alive)
+        sim.update_walkers(efforts, substeps)
+
+    flush_phase_timings()
+    return [walker.fitness() for walker in sim.walkers]
 
 def eval_genomes(genomes, config):
     sim.reset()
     sim.make_walkers(len(genomes))
     
-    nets = []
     for genome_id, genome in genomes:
         genome.fitness = 0.0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        nets.append(net)
+    net = PopulationNetwork.create([genome for genome_id, genome in genomes], config)
 
     # NUM_ITERATIONS = int(min(1500, 300 + (epoch / 15) * 100))
-    NUM_ITERATIONS = 1500
-    for _ in range(NUM_ITERATIONS):
-        inputs = sim.infos_array()
-        
-        all_outputs = []
-        for i, net in enumerate(nets):
-            outputs = net.activate(inputs[i])
-            all_outputs.append(outputs)
+    for step in range(NUM_ITERATIONS):
+        # Every physics step is drawn, the network only runs on control steps
+        if step % CONTROL_DECIMATION == 0:
+            substeps = min(CONTROL_DECIMATION, NUM_ITERATIONS - step)
+            if sim.terminate_walkers(TERMINATION_POLICY, substeps):
+                break
+            sim.control(net.activate(sim.infos_array()), substeps)
         
         sim.handle_events()
         if not sim.running:
             exit(1)
 
-        sim.update(all_outputs)
+        sim.step()
         sim.draw()
     
     for i, (genome_id, genome) in enumerate(genomes):
         genome.fitness = sim.walkers[i].fitness()
 
+def rendered_simulation():
+    from Simulation import Simulation
+    return Simulation(RENDER_FRAME_SKIP, RENDER_REAL_TIME, RENDER_THREADED, RENDER_OUTPUT, RENDER_HEADLESS,
+                      RENDER_DETAIL_WALKERS, RENDER_GHOST_WALKERS, terrain_profile(**TERRAIN) if TERRAIN else None)
+
+def cached(evaluate, batched):
+    if not CACHE_FITNESS:
+        return evaluate
+    # PopulationNetwork may round differently from CompiledNetwork, so the two don't share entries
+    settings = (NUM_ITERATIONS, CONTROL_DECIMATION, vars(TERMINATION_POLICY), TERRAIN, batched)
+    return FitnessCache(FITNESS_CACHE_SIZE, settings, FITNESS_CACHE_CHECK_RATE).wrap(evaluate)
+
 def playback_genome(simulation, genome, playback_iterations=1500):
     simulation.reset()
     simulation.make_walkers(1)
-    best_genome = neat.nn.FeedForwardNetwork.create(winner, config)
+    best_genome = compiled_network(winner, config)
     
 
     total_angle = 0.0
-    for _ in range(playback_iterations):
-        inputs = simulation.walkers[0].info().as_array()
-        outputs = best_genome.activate(inputs)
+    for step in range(playback_iterations):
+        if step % CONTROL_DECIMATION == 0:
+            inputs = simulation.walkers[0].info().as_array()
+            outputs = best_genome.activate(inputs)
+            simulation.control([outputs], min(CONTROL_DECIMATION, playback_iterations - step))
         simulation.handle_events()
         
-        simulation.update([outputs])
+        simulation.step()
         simulation.draw()
 
         simulation.handle_events()
@@ -95,12 +266,35 @@ def playback_genome(simulation, genome, playback_iterations=1500):
 
 
         if simulation.walkers[0].info().headAltitude < 0.4:
-            time.sleep(3)
+            if simulation.real_time:
+                time.sleep(3)
             print("Walker fell down, stopping simulation.")
             return
         
     print(f"Walked distance: {simulation.walkers[0].info().hDistance}\t Average angle: {(total_angle / playback_iterations) * 180 / 3.14159}")
 
+def record_genome(genome, config, filename, playback_iterations=1500):
+    """ Simulates the genome like playback_genome, without drawing, and saves the episode as a replay. """
+    from ReplayRecorder import ReplayRecorder
+    simulation = pooled_simulation(terrain=TERRAIN)
+    net = compiled_network(genome, config, NETWORK_CACHE_SIZE)
+    recorder = ReplayRecorder(simulation)
+
+    for step in range(playback_iterations):
+        if step % CONTROL_DECIMATION == 0:
+            outputs = net.activate(simulation.walker.info().as_array())
+            simulation.control([outputs], min(CONTROL_DECIMATION, playback_iterations - step))
+        # Stepped one by one so the replay has every physics step
+        simulation.step()
+        recorder.record()
+
+        if simulation.walker.info().headAltitude < 0.4:
+            print("Walker fell down, stopping simulation.")
+            break
+
+    print(f"Walked distance: {simulation.walker.info().hDistance}")
+    recorder.save(filename)
+
 if __name__ == "__main__":
     global sim
     random.seed(1000)
@@ -112,50 +306,116 @@ if __name__ == "__main__":
     config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
                             neat.DefaultSpeciesSet, neat.DefaultStagnation,
                             'neat-config.ini')
+    # Read from the [DefaultSpeciesSet] section, the config names sections after the types
+    if VECTORIZED_SPECIATION:
+        config.species_set_type = VectorizedSpeciesSet
     
     if LOAD_FROM_CHECKPOINT:
-        population = neat.Checkpointer.restore_checkpoint(CHECKPOINT_RESTORE_FILE)
+        population = AsyncCheckpointer.restore_checkpoint(CHECKPOINT_RESTORE_FILE)
+        if VECTORIZED_SPECIATION:
+            use_vectorized_speciation(population)
     else:
         population = neat.Population(config)
     
-    # Add stats reporter to the population
-    stats = neat.StatisticsReporter()
-    population.add_reporter(stats)
+    # Add stats reporter to the population, the plots read the log file
+    if STATISTICS_LOG is not None:
+        population.add_reporter(StatisticsLogReporter(STATISTICS_LOG))
+        stats = STATISTICS_LOG
+    else:
+        stats = neat.StatisticsReporter()
+        population.add_reporter(stats)
 
     if REPORT_LEARNING_INFO:
         out_reporter = neat.StdOutReporter(True)
         population.add_reporter(out_reporter)
 
+    if REPORT_PHASE_TIMINGS:
+        if EPOCHS_WITH_RENDER > 0:
+            # Drawing is only timed if Simulation is loaded before the timers are set up
+            import Simulation
+        enable_phase_timing()
+        population.add_reporter(PhaseTimingReporter(PHASE_TIMINGS_FILE))
+
     if SAVE_CHECKPOINTS:
-        checkpointer = neat.Checkpointer(CHECKPOINT_STEP, filename_prefix=CHECKPOINT_SAVE_FILE)
+        checkpointer = AsyncCheckpointer(CHECKPOINT_STEP, filename_prefix=CHECKPOINT_SAVE_FILE,
+                                         full_interval=CHECKPOINT_FULL_INTERVAL)
         population.add_reporter(checkpointer)
 
-    if EPOCHS_WITHOUT_RENDER > 0:
-        pe = neat.ParallelEvaluator(mp.cpu_count(), eval_genome)
-        winner = population.run(pe.evaluate, EPOCHS_WITHOUT_RENDER)
+    if EPOCHS_WITHOUT_RENDER > 0 and ISLANDS is not None:
+        islands = IslandEvolution(config, ISLANDS, cached(eval_island_genomes, False), MIGRATION_INTERVAL,
+                                  MIGRANTS, MIGRATION_TOPOLOGY)
+        winner = islands.run(EPOCHS_WITHOUT_RENDER)
+        islands.close()
+        stats = islands.statistics
+    elif EPOCHS_WITHOUT_RENDER > 0 and STEADY_STATE:
+        with SteadyStateEvolution(population, mp.cpu_count(), eval_genome) as evolution:
+            winner = evolution.run(EPOCHS_WITHOUT_RENDER)
+    elif EPOCHS_WITHOUT_RENDER > 0:
+        batched = EVALUATION_CHUNK_SIZE > 1
+        evaluate = None
+        if DISTRIBUTED_ADDRESS is not None:
+            # The workers run eval_genome unless they are started with --function and --batched
+            pe = TcpEvaluator(DISTRIBUTED_ADDRESS, DISTRIBUTED_TASK_SIZE)
+            batched = False
+        elif SUCCESSIVE_HALVING_HORIZONS is not None:
+            pe = SuccessiveHalvingEvaluator(mp.cpu_count(), SUCCESSIVE_HALVING_HORIZONS, SUCCESSIVE_HALVING_KEEP,
+                                            TERMINATION_POLICY, CONTROL_DECIMATION, TERRAIN)
+            # The genomes dropped early get a fitness relative to the rest of their generation,
+            # which would break the ranking if a later generation reused it: never cached
+            evaluate = pe.evaluate
+        elif SHARED_MEMORY_NETWORKS:
+            pe = SharedNetworkEvaluator(mp.cpu_count(), run_episode)
+            batched = False
+        elif COST_AWARE_SCHEDULING:
+            pe = CostAwareEvaluator(mp.cpu_count(), simulate_genome, population.reproduction.ancestors, NUM_ITERATIONS)
+            batched = False
+        elif batched:
+            pe = ChunkedEvaluator(mp.cpu_count(), eval_genome_chunk, EVALUATION_CHUNK_SIZE)
+        else:
+            pe = neat.ParallelEvaluator(mp.cpu_count(), eval_genome)
+            if REPORT_PHASE_TIMINGS:
+                # neat starts its pool without an initializer, spawned workers would not be timed
+                pe.pool.terminate()
+                pe.pool = mp.Pool(mp.cpu_count(), *phase_timing_initializer())
+        if evaluate is None:
+            evaluate = cached(pe.evaluate, batched)
+        winner = population.run(evaluate, EPOCHS_WITHOUT_RENDER)
 
     if EPOCHS_WITH_RENDER > 0:
-        sim = Simulation()
-        winner = population.run(eval_genomes, EPOCHS_WITH_RENDER)
+        sim = rendered_simulation()
+        winner = population.run(cached(eval_genomes, True), EPOCHS_WITH_RENDER)
+
+    if SAVE_CHECKPOINTS:
+        # The last checkpoints are written in the background; an error writing any of them is raised here
+        checkpointer.wait()
 
     if DRAW_RESULTS_GRAPHS:
+        import visualize
         visualize.draw_net(config, winner, True, filename='best_network')
         visualize.plot_stats(stats, view=True, filename='fitness.svg', ylog=False)
         visualize.plot_species(stats, view=True, filename='speciation.svg')
 
     if DISPLAY_POPULATION_AT_FINISH:
-        sim = Simulation()
+        sim = rendered_simulation()
         population.run(eval_genomes, 1)
 
     if DISPLAY_WINNER_IN_LOOP:
-        sim = Simulation()
+        sim = rendered_simulation()
         if winner is None:
             print("No winner found!")
+        elif REPLAY_WINNER:
+            from ReplayPlayer import ReplayPlayer
+            record_genome(winner, config, REPLAY_FILE)
+            ReplayPlayer([REPLAY_FILE], sim).play(loop=not RENDER_HEADLESS)
+            sim.close()
+        elif RENDER_HEADLESS:
+            playback_genome(sim, compiled_network(winner, config))
+            sim.close()
         else:
             while True:
                 sim.handle_events()
                 if not sim.running:
                     exit(0)
 
-                best_genome = neat.nn.FeedForwardNetwork.create(winner, config)
+                best_genome = compiled_network(winner, config)
                 playback_genome(sim, best_genome)
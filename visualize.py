@@ -1,3 +1,4 @@
+import sys
 import warnings
 
 import matplotlib.pyplot as plt
@@ -5,16 +6,35 @@ import numpy as np
 
 import graphviz
 
+from StatisticsLog import StatisticsLog
+
+
+def _statistics(statistics):
+    """ A StatisticsLog for the name of a log file, anything else as it is. """
+    if isinstance(statistics, str):
+        return StatisticsLog(statistics)
+    return statistics
+
+
+def _fitness_curves(statistics):
+    """ The generations and the best, average and standard deviation of their fitness. """
+    if isinstance(statistics, StatisticsLog):
+        generation = statistics.generations
+        best_fitness = statistics.get_best_fitness()
+    else:
+        generation = range(len(statistics.most_fit_genomes))
+        best_fitness = [c.fitness for c in statistics.most_fit_genomes]
+    return generation, best_fitness, np.array(statistics.get_fitness_mean()), np.array(statistics.get_fitness_stdev())
+
+
 def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
-    """ Plots the population's average and best fitness. """
+    """ Plots the population's average and best fitness; statistics is a neat.StatisticsReporter,
+    a StatisticsLog or the name of a StatisticsLogReporter log. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
-    generation = range(len(statistics.most_fit_genomes))
-    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
-    avg_fitness = np.array(statistics.get_fitness_mean())
-    stdev_fitness = np.array(statistics.get_fitness_stdev())
+    generation, best_fitness, avg_fitness, stdev_fitness = _fitness_curves(_statistics(statistics))
 
     plt.plot(generation, avg_fitness, 'b-', label="average")
     plt.plot(generation, avg_fitness - stdev_fitness, 'g-.', label="-1 sd")
@@ -85,18 +105,25 @@ def plot_spikes(spikes, view=False, filename=None, title=None):
     return fig
 
 
+def _species_curves(statistics):
+    species_sizes = statistics.get_species_sizes()
+    if isinstance(statistics, StatisticsLog):
+        generation = statistics.generations
+    else:
+        generation = range(len(species_sizes))
+    return generation, np.array(species_sizes).T
+
+
 def plot_species(statistics, view=False, filename='speciation.svg'):
-    """ Visualizes speciation throughout evolution. """
+    """ Visualizes speciation throughout evolution; statistics as for plot_stats. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
-    species_sizes = statistics.get_species_sizes()
-    num_generations = len(species_sizes)
-    curves = np.array(species_sizes).T
+    generation, curves = _species_curves(_statistics(statistics))
 
     fig, ax = plt.subplots()
-    ax.stackplot(range(num_generations), *curves)
+    ax.stackplot(generation, *curves)
 
     plt.title("Speciation")
     plt.ylabel("Size per Species")
@@ -110,6 +137,49 @@ def plot_species(statistics, view=False, filename='speciation.svg'):
     plt.close()
 
 
+def watch_statistics(filename, interval=5.0, ylog=False):
+    """ Shows the fitness and species of a running job, from its StatisticsLogReporter log, until
+    the window is closed. Every interval seconds only the newly appended lines are read; the
+    fitness lines get their data replaced, only the species plot is drawn again. """
+    if plt is None:
+        warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
+        return
+
+    log = StatisticsLog(filename)
+    fig, (fitness_ax, species_ax) = plt.subplots(2, 1, sharex=True)
+    lines = [fitness_ax.plot([], [], 'b-', label="average")[0],
+             fitness_ax.plot([], [], 'g-.', label="-1 sd")[0],
+             fitness_ax.plot([], [], 'g-.', label="+1 sd")[0],
+             fitness_ax.plot([], [], 'r-', label="best")[0]]
+    fitness_ax.set_title("Population's average and best fitness")
+    fitness_ax.set_ylabel("Fitness")
+    fitness_ax.grid()
+    fitness_ax.legend(loc="best")
+    if ylog:
+        fitness_ax.set_yscale('symlog')
+    species_ax.set_ylabel("Size per Species")
+    species_ax.set_xlabel("Generations")
+
+    changed = True
+    while plt.fignum_exists(fig.number):
+        if changed and len(log):
+            generation, best_fitness, avg_fitness, stdev_fitness = _fitness_curves(log)
+            for line, values in zip(lines, (avg_fitness, avg_fitness - stdev_fitness,
+                                            avg_fitness + stdev_fitness, best_fitness)):
+                line.set_data(generation, values)
+            fitness_ax.relim()
+            fitness_ax.autoscale_view()
+
+            generation, curves = _species_curves(log)
+            species_ax.clear()
+            species_ax.stackplot(generation, *curves)
+            species_ax.set_ylabel("Size per Species")
+            species_ax.set_xlabel("Generations")
+            fig.canvas.draw_idle()
+        plt.pause(interval)
+        changed = log.update() != 0
+
+
 def draw_net(config, genome, view=False, filename=None, node_names=None, show_disabled=True, prune_unused=False,
              node_colors=None, fmt='svg'):
     """ Receives a genome and draws a neural network with arbitrary topology. """
@@ -178,4 +248,9 @@ def draw_net(config, genome, view=False, filename=None, node_names=None, show_di
 
     dot.render(filename, view=view)
 
-    return dot
\ No newline at end of file
+    return dot
+
+
+if __name__ == "__main__":
+    # python visualize.py statistics.jsonl [seconds between refreshes]
+    watch_statistics(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 5.0)